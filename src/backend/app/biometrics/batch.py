@@ -0,0 +1,216 @@
+"""
+Cadastro biométrico em lote (onboarding de departamentos inteiros).
+
+Recebe pares ``username -> imagem`` (zip ou multipart) e os processa em
+pipeline:
+
+1. Resolve todos os usernames em consultas ``IN`` (usuários inexistentes
+   são rejeitados sem gastar CPU com detecção)
+2. Decodifica/detecta/codifica as imagens no pool biométrico, mantendo no
+   máximo ``BATCH_CONCURRENCY`` tarefas em andamento (o restante do pool
+   fica livre para os logins)
+3. Acumula os embeddings aceitos e grava a cada ``BATCH_CHUNK_SIZE`` itens,
+   numa transação por bloco (``add_templates_bulk``)
+4. Produz um resultado por item assim que ele é decidido, e um resumo final
+
+Formato do zip: ``<username>.jpg`` ou ``<username>/<qualquer>.jpg`` (várias
+fotos por usuário). No multipart o nome do arquivo segue a mesma regra.
+"""
+import asyncio
+import os
+import time
+import zipfile
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.biometrics.executor import biometric_executor, BiometricBusyError, BiometricTimeoutError
+from app.biometrics.gallery import gallery_upsert_many
+from app.biometrics.pipeline import extract_faces
+from app.biometrics.profiles import DetectionProfile
+from app.biometrics.quality import QUALITY_ERRORS
+from app.biometrics.templates import add_templates_bulk
+from app.config import AsyncSessionLocal
+from app.models.user import User
+from app.services.metrics import observe_pipeline
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(max(1, biometric_executor.max_pending // 2))))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "200"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "20000"))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+_LOOKUP_CHUNK = 500
+_BUSY_RETRY_S = 0.05
+
+# Item do lote: (username, nome do arquivo, função que devolve os bytes da imagem)
+BatchItem = Tuple[str, str, object]
+
+
+def username_from_path(path: str) -> Optional[str]:
+    """``ana.luiza.jpg`` ou ``ana.luiza/frente.jpg`` -> ``ana.luiza``; None se não for imagem."""
+    path = path.replace("\\", "/").strip("/")
+    parts = path.split("/")
+    if not path.lower().endswith(IMAGE_EXTENSIONS):
+        return None
+    if any(p.startswith(".") or p == "__MACOSX" for p in parts):
+        return None
+    if len(parts) >= 2:
+        return parts[-2]
+    return os.path.splitext(parts[-1])[0]
+
+
+def iter_zip_items(archive: zipfile.ZipFile) -> List[BatchItem]:
+    """Lista os itens do zip; as imagens são lidas sob demanda."""
+    items = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        username = username_from_path(info.filename)
+        if username:
+            items.append((username, info.filename, lambda name=info.filename: archive.read(name)))
+    return items
+
+
+async def _resolve_users(usernames: Iterable[str]) -> Dict[str, int]:
+    names = sorted(set(usernames))
+    resolved = {}
+    async with AsyncSessionLocal() as db:
+        for i in range(0, len(names), _LOOKUP_CHUNK):
+            rows = await db.execute(
+                select(User.username, User.id).where(User.username.in_(names[i:i + _LOOKUP_CHUNK]))
+            )
+            resolved.update(rows.all())
+    return resolved
+
+
+async def _extract(image_bytes: bytes, profile: DetectionProfile) -> dict:
+    # Fila cheia: o lote espera em vez de falhar (logins têm prioridade)
+    while True:
+        try:
+            start = time.perf_counter()
+            faces = await biometric_executor.run(extract_faces, image_bytes, profile)
+            observe_pipeline("enroll_batch", faces, time.perf_counter() - start)
+            return faces
+        except BiometricBusyError:
+            await asyncio.sleep(_BUSY_RETRY_S)
+
+
+def _single_face(faces: dict) -> Tuple[Optional[list], Optional[str]]:
+    quality = faces.get("quality")
+    if quality and quality["rejected"]:
+        return None, QUALITY_ERRORS[quality["error"]]
+    if not faces["locations"]:
+        return None, "Nenhum rosto detectado"
+    if len(faces["locations"]) > 1:
+        return None, "Múltiplos rostos detectados"
+    if not faces["encodings"]:
+        return None, "Não foi possível processar a face detectada"
+    return faces["encodings"][0], None
+
+
+async def _process_item(user_id: int, username: str, filename: str, read, profile: DetectionProfile) -> dict:
+    result = {"username": username, "file": filename}
+    try:
+        image_bytes = await asyncio.to_thread(read)
+        faces = await _extract(image_bytes, profile)
+    except BiometricTimeoutError:
+        return {**result, "status": "rejected", "detail": "Tempo limite do processamento biométrico excedido"}
+    except Exception as e:
+        return {**result, "status": "rejected", "detail": f"Imagem inválida: {e}"}
+    encoding, detail = _single_face(faces)
+    if encoding is None:
+        quality = faces.get("quality")
+        if quality and quality["rejected"]:
+            result["quality"] = quality["error"]
+        return {**result, "status": "rejected", "detail": detail}
+    return {**result, "status": "accepted", "user_id": user_id, "encoding": encoding}
+
+
+async def _flush(accepted: List[dict]) -> List[dict]:
+    """Grava um bloco numa transação e devolve os resultados finais dos itens."""
+    by_user: Dict[int, list] = {}
+    for item in accepted:
+        by_user.setdefault(item["user_id"], []).append(item.pop("encoding"))
+    try:
+        async with AsyncSessionLocal() as db:
+            written = await add_templates_bulk(db, by_user)
+            await db.commit()
+    except Exception as e:
+        print(f"❌ Erro ao gravar bloco do cadastro em lote: {e}")
+        return [
+            {"username": item["username"], "file": item["file"], "status": "error", "detail": "Erro ao gravar no banco"}
+            for item in accepted
+        ]
+    await gallery_upsert_many((user_id, centroid) for user_id, (centroid, _) in written.items())
+    return [
+        {"username": item["username"], "file": item["file"], "status": "enrolled",
+         "templates_total": written[item["user_id"]][1]}
+        for item in accepted
+    ]
+
+
+async def run_batch(items: List[BatchItem], profile: DetectionProfile,
+                    concurrency: int = BATCH_CONCURRENCY, chunk_size: int = BATCH_CHUNK_SIZE) -> AsyncIterator[dict]:
+    """
+    Processa o lote e produz um dict por item (``enrolled``, ``rejected`` ou
+    ``error``), na ordem em que são decididos, seguido de ``{"summary": ...}``.
+    """
+    start = time.perf_counter()
+    counts = {"enrolled": 0, "rejected": 0, "error": 0}
+    users = await _resolve_users(username for username, _, _ in items)
+    pending = iter(items)
+    inflight = set()
+    accepted: List[dict] = []
+
+    try:
+        while True:
+            # Mantém até ``concurrency`` imagens em processamento
+            while len(inflight) < concurrency:
+                item = next(pending, None)
+                if item is None:
+                    break
+                username, filename, read = item
+                user_id = users.get(username)
+                if user_id is None:
+                    counts["rejected"] += 1
+                    yield {"username": username, "file": filename, "status": "rejected",
+                           "detail": "Usuário não encontrado"}
+                    continue
+                inflight.add(asyncio.ensure_future(_process_item(user_id, username, filename, read, profile)))
+            if not inflight:
+                break
+
+            done, _ = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+            inflight.difference_update(done)
+            for task in done:
+                result = task.result()
+                if result["status"] == "accepted":
+                    accepted.append(result)
+                else:
+                    counts[result["status"]] += 1
+                    yield result
+
+            if len(accepted) >= chunk_size:
+                for result in await _flush(accepted):
+                    counts[result["status"]] += 1
+                    yield result
+                accepted = []
+
+        if accepted:
+            for result in await _flush(accepted):
+                counts[result["status"]] += 1
+                yield result
+    finally:
+        # Cliente desconectou: não deixa tarefas órfãs ocupando o pool
+        for task in inflight:
+            task.cancel()
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"📦 Cadastro em lote: {total} item(ns) em {elapsed:.1f}s ({counts})")
+    yield {"summary": {
+        "total": total,
+        **counts,
+        "elapsed_s": round(elapsed, 3),
+        "items_per_s": round(total / elapsed, 2) if elapsed > 0 else None,
+    }}
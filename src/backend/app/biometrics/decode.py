@@ -0,0 +1,46 @@
+"""
+Decodificação das imagens recebidas (executada nos workers do pool biométrico).
+
+- JPEG: o modo draft do PIL decodifica direto numa escala reduzida (1/2,
+  1/4 ou 1/8, feita pelo próprio decodificador DCT) quando a imagem passa
+  de ``DECODE_MAX_SIDE``, e já em RGB (sem ``convert`` depois). Uma foto de
+  12 MP vira ~1/16 dos pixels sem nunca existir em resolução cheia.
+- Orientação EXIF aplicada (fotos de celular chegam deitadas sem isso).
+- Outros formatos: decodificados normalmente e convertidos para RGB só se
+  necessário.
+
+``DECODE_MAX_SIDE`` deve ficar acima do ``max_side`` dos perfis de detecção:
+a detecção reduz de novo a imagem e os landmarks/encodings usam esta
+resolução. As caixas devolvidas pelo pipeline estão nas coordenadas da
+imagem decodificada.
+"""
+import io
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+DECODE_MAX_SIDE = int(os.getenv("DECODE_MAX_SIDE", "1600"))
+
+
+def decode_rgb(image_bytes: bytes, max_side: int = DECODE_MAX_SIDE) -> Image.Image:
+    """Imagem RGB com o maior lado reduzido (no decodificador) para perto de ``max_side``."""
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.format == "JPEG":
+        width, height = img.size
+        if max_side and max(width, height) > max_side:
+            scale = max_side / max(width, height)
+            # O draft escolhe a maior redução que ainda fica >= ao tamanho pedido
+            img.draft("RGB", (max(1, int(width * scale)), max(1, int(height * scale))))
+        else:
+            img.draft("RGB", img.size)
+    # in_place: sem orientação a corrigir a imagem não é copiada
+    ImageOps.exif_transpose(img, in_place=True)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+
+def to_array(img: Image.Image) -> np.ndarray:
+    """Array uint8 (altura, largura, 3) contíguo: uma única cópia dos pixels do PIL."""
+    return np.asarray(img)
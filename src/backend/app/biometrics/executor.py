@@ -0,0 +1,143 @@
+"""
+Executor dedicado para o processamento biométrico (dlib).
+
+A detecção e o encoding facial são CPU-bound e levam centenas de
+milissegundos por imagem; executá-los direto nos endpoints ``async``
+bloqueia o event loop do uvicorn. Este módulo mantém um pool de processos
+limitado, com modelos pré-carregados em cada worker, fila de tamanho máximo
+(rejeição imediata quando cheia) e deadline por tarefa.
+
+Configuração:
+- ``BIOMETRIC_WORKERS``: número de processos (padrão: 2)
+- ``BIOMETRIC_MAX_PENDING``: tarefas em andamento + na fila antes de rejeitar
+- ``BIOMETRIC_TASK_TIMEOUT``: deadline em segundos (inclui o tempo na fila)
+- ``BIOMETRIC_START_METHOD``: ``spawn`` (padrão), ``forkserver`` ou ``fork``
+"""
+import asyncio
+import ctypes
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from app.biometrics import pipeline
+
+BIOMETRIC_WORKERS = int(os.getenv("BIOMETRIC_WORKERS", "2"))
+BIOMETRIC_MAX_PENDING = int(os.getenv("BIOMETRIC_MAX_PENDING", str(BIOMETRIC_WORKERS * 4)))
+BIOMETRIC_TASK_TIMEOUT = float(os.getenv("BIOMETRIC_TASK_TIMEOUT", "10"))
+BIOMETRIC_START_METHOD = os.getenv("BIOMETRIC_START_METHOD", "spawn")
+
+
+class BiometricBusyError(Exception):
+    """Fila do executor cheia."""
+
+
+class BiometricTimeoutError(Exception):
+    """Tarefa não concluída dentro do deadline."""
+
+
+def _init_worker() -> None:
+    # Com fork o worker herdaria os handlers do uvicorn e ignoraria o SIGTERM
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Linux: o worker morre junto com o processo que criou o pool, mesmo que
+    # este seja morto (SIGKILL/OOM) ou saia com os._exit (workers do start.py)
+    try:
+        ctypes.CDLL("libc.so.6", use_errno=True).prctl(1, signal.SIGTERM)  # PR_SET_PDEATHSIG
+    except (OSError, AttributeError):
+        pass
+    pipeline.warm_up()
+
+
+class BiometricExecutor:
+    """Pool de processos limitado para tarefas do ``app.biometrics.pipeline``."""
+
+    def __init__(self, workers: int, max_pending: int, timeout: float, start_method: str):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.start_method = start_method
+        self.pending = 0
+        self.warm = False
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker,
+                    )
+        return self._pool
+
+    def start(self) -> None:
+        """Cria o pool; os workers carregam os modelos no initializer, fora do event loop."""
+        pool = self._get_pool()
+        if self.start_method == "fork":
+            # Com fork todos os workers nascem na primeira tarefa: cria-os já, antes de
+            # outras threads existirem, herdando os modelos pré-carregados (start.py)
+            pool.submit(int)
+
+    async def warm_up(self) -> None:
+        """Aguarda o aquecimento dos modelos em todos os workers (readiness)."""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        await asyncio.gather(*(loop.run_in_executor(pool, pipeline.warm_up) for _ in range(self.workers)))
+        self.warm = True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _release(self) -> None:
+        self.pending -= 1
+
+    async def run(self, fn, *args, timeout: Optional[float] = None):
+        """
+        Executa ``fn(*args)`` num worker e aguarda o resultado sem bloquear o loop.
+        A vaga em ``pending`` só é liberada quando a tarefa termina de fato: depois
+        de um timeout o worker continua ocupado com ela.
+        """
+        if self.pending >= self.max_pending:
+            raise BiometricBusyError()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            task = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+
+        def done(_):
+            # Thread de gerenciamento do pool: o contador só é alterado no event loop
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # loop já encerrado (shutdown)
+
+        task.add_done_callback(done)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(task), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # Tarefas ainda na fila são canceladas; uma já em execução termina no worker
+            raise BiometricTimeoutError()
+        except BrokenProcessPool:
+            # Um worker morreu (ex.: OOM); recria o pool na próxima tarefa
+            print("⚠️ Pool biométrico quebrado, recriando")
+            self.shutdown()
+            raise
+
+
+biometric_executor = BiometricExecutor(
+    workers=BIOMETRIC_WORKERS,
+    max_pending=BIOMETRIC_MAX_PENDING,
+    timeout=BIOMETRIC_TASK_TIMEOUT,
+    start_method=BIOMETRIC_START_METHOD,
+)
@@ -0,0 +1,223 @@
+"""
+Galeria biométrica do processo para identificação 1:N.
+
+Mantém o índice configurado em ``BIOMETRIC_INDEX`` (ver
+``app.biometrics.index``) sincronizado com ``biometric_templates``:
+cada usuário é representado pelo centróide dos seus templates
+(``biometric_centroids``). O índice é carregado na primeira busca,
+atualizado incrementalmente no cadastro e na remoção, e salvo em disco (``BIOMETRIC_INDEX_PATH``) para que um restart
+não precise reconstruí-lo a partir do banco. No carregamento o snapshot é
+conferido com o banco: os centróides alterados depois da gravação
+(``updated_at``), os removidos e os que faltam são reaplicados.
+
+Com ``BIOMETRIC_INDEX=mmap`` o índice é o próprio arquivo compartilhado
+pelos workers do host: no carregamento ele é sincronizado com o banco só
+nos centróides alterados desde a última gravação, e não há snapshot. As
+alterações nele fazem I/O e esperam o lock de outros processos, por isso
+rodam numa thread (os índices em memória são alterados no próprio event
+loop, que é quem faz as buscas). O treino do IVF, quando as inserções
+atingem ``IVF_TRAIN_MIN``, roda numa thread em background; até terminar, as
+buscas continuam na força bruta.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.biometrics.index import BIOMETRIC_INDEX, EmbeddingIndex, create_index, load_index, save_index
+from app.biometrics.storage import unpack_embedding
+from app.models.biometric_centroid import BiometricCentroid
+
+BIOMETRIC_INDEX_PATH = os.getenv("BIOMETRIC_INDEX_PATH", "biometric_index.npz")
+# Snapshot em disco a cada N alterações (além do snapshot no shutdown)
+SNAPSHOT_EVERY = int(os.getenv("BIOMETRIC_INDEX_SNAPSHOT_EVERY", "100"))
+
+_index: EmbeddingIndex = create_index()
+_load_lock = asyncio.Lock()
+_snapshot_lock = threading.Lock()
+_pending_changes = 0
+
+
+async def get_gallery(db: AsyncSession) -> EmbeddingIndex:
+    """Retorna o índice do processo, carregando-o na primeira chamada."""
+    global _index
+    if not _index.loaded:
+        async with _load_lock:
+            if not _index.loaded:
+                _index = await _load(db)
+                _schedule_training()
+    return _index
+
+
+async def _load(db: AsyncSession) -> EmbeddingIndex:
+    # Leitura do snapshot e construção do índice rodam em thread (CPU/disco)
+    if _index.shared:
+        return await _sync_shared(db, _index)
+    if BIOMETRIC_INDEX_PATH and os.path.exists(BIOMETRIC_INDEX_PATH):
+        try:
+            index = await asyncio.to_thread(load_index, BIOMETRIC_INDEX_PATH)
+            if index.kind == BIOMETRIC_INDEX:
+                db_ids, upserts, removals = await _changes_since(db, index, index.saved_at)
+                await asyncio.to_thread(_apply, index, upserts, removals)
+                if len(index) == len(db_ids):
+                    print(f"🧠 Índice biométrico '{index.kind}' carregado do disco: {len(index)} template(s), "
+                          f"{len(upserts) + len(removals)} alteração(ões)")
+                    return index
+            print("⚠️ Snapshot do índice desatualizado, reconstruindo a partir do banco")
+        except Exception as e:
+            print(f"⚠️ Erro ao ler snapshot do índice: {e}")
+
+    rows = (await db.execute(select(BiometricCentroid.user_id, BiometricCentroid.embedding))).all()
+    index = await asyncio.to_thread(_build, rows)
+    print(f"🧠 Índice biométrico '{index.kind}' construído: {len(index)} template(s)")
+    await asyncio.to_thread(_write_snapshot, index)
+    return index
+
+
+async def _sync_shared(db: AsyncSession, index: EmbeddingIndex) -> EmbeddingIndex:
+    """
+    Abre o arquivo compartilhado e aplica só o que mudou no banco desde a
+    última gravação; reconstrói por completo se o arquivo não existe ou
+    não confere com o banco.
+    """
+    try:
+        opened = await asyncio.to_thread(index.open)
+    except Exception as e:
+        print(f"⚠️ Erro ao abrir galeria compartilhada: {e}")
+        opened = False
+
+    if opened:
+        db_ids, upserts, removals = await _changes_since(db, index, index.built_at)
+        applied = await asyncio.to_thread(index.apply, upserts, removals)
+        if len(index) == len(db_ids):
+            print(f"🧠 Galeria compartilhada '{index.path}' sincronizada: {len(index)} template(s), {applied} alteração(ões)")
+            return index
+        print("⚠️ Galeria compartilhada divergente do banco, reconstruindo")
+
+    rows = (await db.execute(select(BiometricCentroid.user_id, BiometricCentroid.embedding))).all()
+    await asyncio.to_thread(index.build, ((user_id, unpack_embedding(blob)) for user_id, blob in rows))
+    print(f"🧠 Galeria compartilhada '{index.path}' construída: {len(index)} template(s)")
+    return index
+
+
+async def _changes_since(db: AsyncSession, index: EmbeddingIndex, timestamp: float):
+    """
+    Diferença entre o índice e o banco: ``(ids no banco, {user_id: centróide}
+    a gravar, ids a remover)``. Reaplica os centróides alterados a partir de
+    ``timestamp`` e os que faltam no índice.
+    """
+    db_ids = set((await db.execute(select(BiometricCentroid.user_id))).scalars())
+    index_ids = set(index.get_state()["ids"].tolist())
+    # Margem para relógios diferentes entre app e banco
+    since = datetime.fromtimestamp(timestamp, tz=timezone.utc) - timedelta(minutes=1)
+    changed = select(BiometricCentroid.user_id, BiometricCentroid.embedding).where(
+        BiometricCentroid.updated_at >= since
+    )
+    upserts = {user_id: unpack_embedding(blob) for user_id, blob in (await db.execute(changed)).all()}
+    missing = db_ids - index_ids - set(upserts)
+    if missing:
+        rows = (await db.execute(
+            select(BiometricCentroid.user_id, BiometricCentroid.embedding)
+            .where(BiometricCentroid.user_id.in_(missing))
+        )).all()
+        upserts.update((user_id, unpack_embedding(blob)) for user_id, blob in rows)
+    return db_ids, upserts, index_ids - db_ids
+
+
+def _apply(index: EmbeddingIndex, upserts, removals) -> None:
+    index.upsert_many(upserts.items())
+    for user_id in removals:
+        index.remove(user_id)
+
+
+def _build(rows) -> EmbeddingIndex:
+    index = create_index()
+    index.build((user_id, unpack_embedding(blob)) for user_id, blob in rows)
+    return index
+
+
+def gallery_size():
+    """Usuários no índice (``None`` se ainda não carregado)."""
+    return len(_index) if _index.loaded else None
+
+
+def _tracking() -> bool:
+    # O arquivo compartilhado é atualizado mesmo que este worker ainda não o tenha aberto
+    return _index.loaded or (_index.shared and _index.exists)
+
+
+async def _mutate(fn, *args):
+    if _index.shared:
+        return await asyncio.to_thread(fn, *args)
+    result = fn(*args)
+    _schedule_training()
+    return result
+
+
+def _schedule_training() -> None:
+    # k-means de dezenas de milhares de vetores: nunca no event loop
+    if _index.needs_training:
+        threading.Thread(target=_train, args=(_index,), daemon=True).start()
+
+
+def _train(index: EmbeddingIndex) -> None:
+    try:
+        index.train()
+    except Exception as e:
+        print(f"⚠️ Erro ao treinar o índice biométrico: {e}")
+
+
+async def gallery_upsert(user_id: int, embedding) -> None:
+    """Propaga um cadastro/atualização para o índice (se já carregado)."""
+    if _tracking():
+        await _mutate(_index.upsert, user_id, embedding)
+        _record_change()
+
+
+async def gallery_upsert_many(items) -> None:
+    """Propaga um bloco de ``(user_id, centróide)`` (uma única escrita no índice compartilhado)."""
+    items = list(items)
+    if items and _tracking():
+        await _mutate(_index.upsert_many, items)
+        _record_change(len(items))
+
+
+async def gallery_remove(user_id: int) -> None:
+    """Propaga uma remoção para o índice (se já carregado)."""
+    if _tracking() and await _mutate(_index.remove, user_id):
+        _record_change()
+
+
+def _record_change(count: int = 1) -> None:
+    global _pending_changes
+    if _index.shared:
+        # O arquivo compartilhado já é a cópia em disco
+        return
+    _pending_changes += count
+    if SNAPSHOT_EVERY > 0 and _pending_changes >= SNAPSHOT_EVERY:
+        threading.Thread(target=save_snapshot, kwargs={"wait": False}, daemon=True).start()
+
+
+def save_snapshot(wait: bool = True) -> None:
+    """Grava o índice atual em disco (sem efeito se nunca foi carregado)."""
+    global _pending_changes
+    if _index.loaded:
+        _pending_changes = 0
+        _write_snapshot(_index, wait)
+
+
+def _write_snapshot(index: EmbeddingIndex, wait: bool = True) -> None:
+    if not BIOMETRIC_INDEX_PATH or index.shared:
+        return
+    # Snapshots periódicos não esperam uma gravação que já está em andamento
+    if not _snapshot_lock.acquire(blocking=wait):
+        return
+    try:
+        save_index(index, BIOMETRIC_INDEX_PATH)
+    except Exception as e:
+        print(f"⚠️ Erro ao salvar snapshot do índice: {e}")
+    finally:
+        _snapshot_lock.release()
@@ -0,0 +1,106 @@
+"""
+Subsistema de índices para identificação biométrica 1:N.
+
+Backends (variável de ambiente ``BIOMETRIC_INDEX``):
+- ``brute``: busca exata vetorizada sobre uma matriz contígua (padrão)
+- ``ivf``: busca aproximada IVF-Flat; ``IVF_NLIST`` define o número de
+  células e ``IVF_NPROBE`` quantas são varridas por busca (recall x latência)
+- ``mmap``: busca exata sobre um arquivo mapeado em memória
+  (``BIOMETRIC_GALLERY_PATH``) compartilhado por todos os workers do host;
+  alterações vão para um log compactado a cada ``BIOMETRIC_GALLERY_DELTA_MAX``
+  registros
+"""
+import os
+import time
+
+import numpy as np
+
+from app.biometrics.index.base import EmbeddingIndex, EMBEDDING_DIM
+from app.biometrics.index.brute_force import BruteForceIndex
+from app.biometrics.index.ivf import IVFIndex
+from app.biometrics.index.mmap_file import MmapIndex
+
+INDEX_BACKENDS = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFIndex.kind: IVFIndex,
+    MmapIndex.kind: MmapIndex,
+}
+
+BIOMETRIC_INDEX = os.getenv("BIOMETRIC_INDEX", "brute").lower()
+
+
+def index_params_from_env(kind: str) -> dict:
+    """Parâmetros de ajuste do backend lidos do ambiente."""
+    if kind == IVFIndex.kind:
+        params = {
+            "nlist": int(os.getenv("IVF_NLIST", "1024")),
+            "nprobe": int(os.getenv("IVF_NPROBE", "16")),
+        }
+        if os.getenv("IVF_TRAIN_MIN"):
+            params["train_min"] = int(os.getenv("IVF_TRAIN_MIN"))
+        return params
+    if kind == MmapIndex.kind:
+        return {
+            "path": os.getenv("BIOMETRIC_GALLERY_PATH", "biometric_gallery.bin"),
+            "delta_max": int(os.getenv("BIOMETRIC_GALLERY_DELTA_MAX", "1024")),
+        }
+    return {}
+
+
+def create_index(kind: str = None, **params) -> EmbeddingIndex:
+    kind = (kind or BIOMETRIC_INDEX).lower()
+    if kind not in INDEX_BACKENDS:
+        raise ValueError(f"Backend de índice desconhecido: {kind} (opções: {', '.join(INDEX_BACKENDS)})")
+    return INDEX_BACKENDS[kind](**{**index_params_from_env(kind), **params})
+
+
+_META_KEYS = ("kind", "saved_at")
+
+
+def save_index(index: EmbeddingIndex, path: str) -> None:
+    """
+    Grava o índice em ``.npz`` de forma atômica (arquivo temporário + rename),
+    junto com o instante da gravação (``saved_at``). O temporário tem o pid no
+    nome: vários processos podem gravar o mesmo snapshot ao mesmo tempo.
+    """
+    # Antes de ler o estado: tudo o que mudou depois disso é reaplicado no carregamento
+    saved_at = time.time()
+    state = index.get_state()
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, kind=np.array(index.kind), saved_at=np.array(saved_at), **state)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_index(path: str, **params) -> EmbeddingIndex:
+    """
+    Carrega um índice salvo por ``save_index``; ``params`` sobrescreve os knobs
+    do ambiente. ``index.saved_at`` é o instante da gravação (0 em snapshots antigos).
+    """
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data["kind"])
+        saved_at = float(data["saved_at"]) if "saved_at" in data.files else 0.0
+        state = {key: data[key] for key in data.files if key not in _META_KEYS}
+    if kind not in INDEX_BACKENDS:
+        raise ValueError(f"Backend de índice desconhecido no arquivo: {kind}")
+    index = INDEX_BACKENDS[kind].from_state(state, **{**index_params_from_env(kind), **params})
+    index.saved_at = saved_at
+    return index
+
+
+__all__ = [
+    "EmbeddingIndex",
+    "BruteForceIndex",
+    "IVFIndex",
+    "MmapIndex",
+    "EMBEDDING_DIM",
+    "BIOMETRIC_INDEX",
+    "create_index",
+    "save_index",
+    "load_index",
+]
@@ -0,0 +1,73 @@
+"""
+Interface comum dos índices de embeddings faciais.
+
+Todo backend guarda um vetor por ``user_id`` e oferece inserção/remoção
+incremental, busca dos ``k`` vizinhos mais próximos (distância euclidiana)
+e exportação do estado em arrays NumPy para persistência em disco.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+EMBEDDING_DIM = 128
+
+
+class EmbeddingIndex:
+    """Classe base dos índices de busca 1:N."""
+
+    kind = "base"
+    # True quando o índice vive num armazenamento compartilhado entre processos
+    # (alterações são gravadas mesmo que este processo ainda não o tenha carregado)
+    shared = False
+    # Instante em que o snapshot carregado foi gravado (ver ``load_index``)
+    saved_at = 0.0
+    # True quando as inserções incrementais deixaram um treino pendente (ver ``train``)
+    needs_training = False
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.loaded = False
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def build(self, rows: Iterable[Tuple[int, object]]) -> None:
+        """Reconstrói o índice inteiro a partir de pares (user_id, embedding)."""
+        rows = list(rows)
+        ids = np.fromiter((int(user_id) for user_id, _ in rows), dtype=np.int64, count=len(rows))
+        matrix = np.empty((len(rows), self.dim), dtype=np.float32)
+        for i, (_, embedding) in enumerate(rows):
+            matrix[i] = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        self.build_arrays(ids, matrix)
+
+    def build_arrays(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def upsert(self, user_id: int, embedding) -> None:
+        raise NotImplementedError
+
+    def upsert_many(self, items: Iterable[Tuple[int, object]]) -> None:
+        for user_id, embedding in items:
+            self.upsert(user_id, embedding)
+
+    def remove(self, user_id: int) -> bool:
+        raise NotImplementedError
+
+    def train(self) -> bool:
+        """Treino pendente do índice (CPU pesada, fora do event loop); True se treinou."""
+        return False
+
+    def search(self, probe, k: int = 1) -> List[Tuple[int, float]]:
+        """Retorna os ``k`` usuários mais próximos como (user_id, distância)."""
+        raise NotImplementedError
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """Arrays que representam o índice (usados por ``save_index``)."""
+        raise NotImplementedError
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray], **params) -> "EmbeddingIndex":
+        raise NotImplementedError
+
+    def _as_vector(self, embedding) -> np.ndarray:
+        return np.asarray(embedding, dtype=np.float32).reshape(self.dim)
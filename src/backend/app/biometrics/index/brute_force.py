@@ -0,0 +1,119 @@
+"""
+Índice exato (força bruta) sobre uma matriz float32 contígua.
+
+A distância do probe para todas as linhas é calculada em uma única passada
+vetorizada com as normas pré-calculadas:
+
+    ||g - p||² = ||g||² - 2·g·p + ||p||²
+"""
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.biometrics.index.base import EmbeddingIndex, EMBEDDING_DIM
+
+
+class BruteForceIndex(EmbeddingIndex):
+    """Matriz contígua de embeddings indexada por ``user_id``."""
+
+    kind = "brute"
+
+    def __init__(self, dim: int = EMBEDDING_DIM, initial_capacity: int = 1024):
+        super().__init__(dim)
+        self._lock = threading.RLock()
+        self._matrix = np.empty((initial_capacity, dim), dtype=np.float32)
+        self._sq_norms = np.empty(initial_capacity, dtype=np.float32)
+        self._user_ids = np.empty(initial_capacity, dtype=np.int64)
+        self._rows = {}  # user_id -> linha da matriz
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _ensure_capacity(self, required: int) -> None:
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+        new_capacity = max(required, capacity * 2)
+        matrix = np.empty((new_capacity, self.dim), dtype=np.float32)
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        user_ids = np.empty(new_capacity, dtype=np.int64)
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        user_ids[:self._size] = self._user_ids[:self._size]
+        self._matrix, self._sq_norms, self._user_ids = matrix, sq_norms, user_ids
+
+    def build_arrays(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        with self._lock:
+            n = len(ids)
+            self._size = 0
+            self._ensure_capacity(n)
+            self._matrix[:n] = matrix
+            self._sq_norms[:n] = np.einsum("ij,ij->i", self._matrix[:n], self._matrix[:n])
+            self._user_ids[:n] = ids
+            self._rows = {int(user_id): row for row, user_id in enumerate(ids)}
+            self._size = n
+            self.loaded = True
+
+    def upsert(self, user_id: int, embedding) -> None:
+        vector = self._as_vector(embedding)
+        user_id = int(user_id)
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                self._ensure_capacity(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._rows[user_id] = row
+                self._user_ids[row] = user_id
+            self._matrix[row] = vector
+            self._sq_norms[row] = float(vector @ vector)
+
+    def remove(self, user_id: int) -> bool:
+        """Remove um usuário movendo a última linha para o buraco (O(1))."""
+        with self._lock:
+            row = self._rows.pop(int(user_id), None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._user_ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._sq_norms[row] = self._sq_norms[last]
+                self._user_ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._size = last
+            return True
+
+    def search(self, probe, k: int = 1) -> List[Tuple[int, float]]:
+        probe = self._as_vector(probe)
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return []
+            sq_dist = self._sq_norms[:n] - 2.0 * (self._matrix[:n] @ probe)
+            user_ids = self._user_ids[:n].copy()
+        sq_dist += float(probe @ probe)
+        k = min(k, n)
+        if k == 1:
+            best = np.array([int(np.argmin(sq_dist))])
+        else:
+            best = np.argpartition(sq_dist, k - 1)[:k]
+            best = best[np.argsort(sq_dist[best])]
+        distances = np.sqrt(np.maximum(sq_dist[best], 0.0))
+        return [(int(user_ids[i]), float(d)) for i, d in zip(best, distances)]
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            return {
+                "ids": self._user_ids[:self._size].copy(),
+                "matrix": self._matrix[:self._size].copy(),
+            }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray], **params) -> "BruteForceIndex":
+        matrix = state["matrix"]
+        index = cls(dim=matrix.shape[1], initial_capacity=max(len(matrix), 1024))
+        index.build_arrays(state["ids"], matrix)
+        return index
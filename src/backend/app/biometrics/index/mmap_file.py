@@ -0,0 +1,339 @@
+"""
+Galeria em arquivo mapeado em memória, compartilhada entre processos.
+
+Com vários workers uvicorn, cada índice em memória (``brute``/``ivf``) é uma
+cópia própria de todos os embeddings. Aqui os workers do host abrem o mesmo
+arquivo com ``np.memmap``: uma única cópia no page cache do kernel.
+
+Layout do arquivo (little-endian)::
+
+    header (32 bytes): magic "BGAL", versão, dim, count, geração, built_at
+    ids      int64   [count]
+    matrix   float32 [count, dim]
+    sq_norms float32 [count]
+
+Cadastros e remoções não reescrevem o arquivo: são acrescentados ao log
+``<path>.delta`` (registros de tamanho fixo: id, operação, instante e
+embedding; a última operação de cada id vale). Quando o log passa de
+``delta_max`` registros (``BIOMETRIC_GALLERY_DELTA_MAX``) a alteração
+seguinte compacta: grava um arquivo base novo com tudo aplicado, troca com
+``os.replace`` (leitores com o mapeamento antigo continuam vendo um
+arquivo completo) e zera o log. Reaplicar um log antigo sobre a base nova
+dá o mesmo resultado, então um leitor que veja os dois no meio da troca
+continua correto.
+
+Toda escrita é feita sob ``fcntl.flock`` em ``<path>.lock`` e termina
+incrementando o contador de geração em ``<path>.gen``, um inteiro de 8
+bytes mapeado (MAP_SHARED) por todos os processos; a cada busca o leitor
+compara a geração e relê base + log se mudou, sem restart e sem syscalls
+no caminho comum. Na busca, as linhas da base alteradas pelo log são
+ignoradas e as do log entram como linhas extras.
+
+Escritas fazem I/O de disco e esperam o lock de outros processos: quem
+chama do event loop deve usar uma thread (ver ``app.biometrics.gallery``).
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.biometrics.index.base import EmbeddingIndex, EMBEDDING_DIM
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+MAGIC = b"BGAL"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQQd")  # magic, versão, dim, count, geração, built_at
+_GEN = struct.Struct("<Q")
+
+# Operações do log de alterações
+_UPSERT = 1
+_REMOVE = 0
+
+
+def _delta_dtype(dim: int) -> np.dtype:
+    return np.dtype([("id", "<i8"), ("op", "<i8"), ("ts", "<f8"), ("embedding", "<f4", (dim,))])
+
+
+class _View:
+    """Arrays mapeados de uma geração do arquivo base + estado do log de alterações."""
+
+    __slots__ = ("seen", "built_at", "ids", "matrix", "sq_norms", "mask", "touched",
+                 "extra_ids", "extra_matrix", "extra_sq_norms", "delta_count")
+
+    def __init__(self, seen: int, built_at: float, ids, matrix, sq_norms):
+        self.seen = seen  # valor do contador de geração quando o arquivo foi aberto
+        self.built_at = built_at
+        self.ids = ids
+        self.matrix = matrix
+        self.sq_norms = sq_norms
+        # Sem log: todas as linhas da base valem e não há linhas extras
+        self.mask = None  # linhas da base ainda válidas (None = todas)
+        self.touched = np.empty(0, dtype=np.int64)  # ids alterados pelo log
+        self.extra_ids = np.empty(0, dtype=np.int64)
+        self.extra_matrix = np.empty((0, matrix.shape[1]), dtype=np.float32)
+        self.extra_sq_norms = np.empty(0, dtype=np.float32)
+        self.delta_count = 0
+
+    def apply_delta(self, records: np.ndarray) -> None:
+        if len(records) == 0:
+            return
+        # Última operação de cada id (np.unique no log invertido acha a última ocorrência)
+        touched, first = np.unique(records["id"][::-1], return_index=True)
+        latest = records[len(records) - 1 - first]
+        live = latest["op"] == _UPSERT
+        self.touched = touched
+        self.extra_ids = latest["id"][live]
+        self.extra_matrix = np.ascontiguousarray(latest["embedding"][live], dtype=np.float32)
+        self.extra_sq_norms = np.einsum("ij,ij->i", self.extra_matrix, self.extra_matrix).astype(np.float32)
+        self.mask = ~np.isin(self.ids, touched)
+        self.delta_count = len(records)
+        self.built_at = max(self.built_at, float(records["ts"].max()))
+
+    def __len__(self) -> int:
+        base = len(self.ids) if self.mask is None else int(self.mask.sum())
+        return base + len(self.extra_ids)
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """Quais ``ids`` estão na galeria (o log tem precedência sobre a base)."""
+        return np.where(np.isin(ids, self.touched), np.isin(ids, self.extra_ids), np.isin(ids, self.ids))
+
+    def merged(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids e matriz com o log aplicado (cópias em memória)."""
+        if self.mask is None:
+            return np.array(self.ids), np.array(self.matrix)
+        return (np.concatenate([self.ids[self.mask], self.extra_ids]),
+                np.concatenate([self.matrix[self.mask], self.extra_matrix]))
+
+
+class MmapIndex(EmbeddingIndex):
+    """Busca exata sobre a galeria em arquivo compartilhado."""
+
+    kind = "mmap"
+    shared = True
+
+    def __init__(self, dim: int = EMBEDDING_DIM, path: str = "biometric_gallery.bin", delta_max: int = 1024):
+        super().__init__(dim)
+        self.path = path
+        self.delta_path = f"{path}.delta"
+        self.delta_max = delta_max
+        self._record = _delta_dtype(dim)
+        self._view: Optional[_View] = None
+        self._gen_mm: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()  # serializa escritores do próprio processo
+
+    def __len__(self) -> int:
+        view = self._current()
+        return 0 if view is None else len(view)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    @property
+    def built_at(self) -> float:
+        view = self._current()
+        return 0.0 if view is None else view.built_at
+
+    # ---- leitura ----
+
+    def _generation_counter(self) -> mmap.mmap:
+        if self._gen_mm is None:
+            fd = os.open(f"{self.path}.gen", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < _GEN.size:
+                    os.ftruncate(fd, _GEN.size)
+                self._gen_mm = mmap.mmap(fd, _GEN.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            finally:
+                os.close(fd)
+        return self._gen_mm
+
+    def _read_file(self, seen: int = 0) -> _View:
+        with open(self.path, "rb") as f:
+            magic, version, dim, count, _, built_at = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Arquivo de galeria inválido: {self.path}")
+        if dim != self.dim:
+            raise ValueError(f"Galeria com dimensão {dim}, esperado {self.dim}")
+        if count == 0:
+            view = _View(seen, built_at, np.empty(0, dtype=np.int64),
+                         np.empty((0, dim), dtype=np.float32), np.empty(0, dtype=np.float32))
+        else:
+            offset = _HEADER.size
+            ids = np.memmap(self.path, dtype=np.int64, mode="r", offset=offset, shape=(count,))
+            offset += ids.nbytes
+            matrix = np.memmap(self.path, dtype=np.float32, mode="r", offset=offset, shape=(count, dim))
+            offset += matrix.nbytes
+            sq_norms = np.memmap(self.path, dtype=np.float32, mode="r", offset=offset, shape=(count,))
+            view = _View(seen, built_at, ids, matrix, sq_norms)
+        view.apply_delta(self._read_delta())
+        return view
+
+    def _read_delta(self) -> np.ndarray:
+        try:
+            data = np.fromfile(self.delta_path, dtype=np.uint8)
+        except FileNotFoundError:
+            return np.empty(0, dtype=self._record)
+        # Um registro sendo acrescentado agora pode estar incompleto: fica para a próxima geração
+        usable = len(data) - len(data) % self._record.itemsize
+        return data[:usable].view(self._record)
+
+    def open(self) -> bool:
+        """Mapeia o arquivo existente; ``False`` se ainda não foi criado."""
+        if not self.exists:
+            return False
+        # Contador lido antes do arquivo: o escritor troca o arquivo e só depois incrementa
+        self._view = self._read_file(_GEN.unpack_from(self._generation_counter(), 0)[0])
+        self.loaded = True
+        return True
+
+    def _current(self) -> Optional[_View]:
+        view = self._view
+        if view is None or self._gen_mm is None:
+            return view
+        # Leitura de 8 bytes da memória compartilhada: sem syscall se nada mudou
+        seen = _GEN.unpack_from(self._gen_mm, 0)[0]
+        if seen != view.seen:
+            view = self._view = self._read_file(seen)
+        return view
+
+    def search(self, probe, k: int = 1) -> List[Tuple[int, float]]:
+        probe = self._as_vector(probe)
+        view = self._current()
+        if view is None:
+            return []
+        k = min(k, len(view))
+        if k == 0:
+            return []
+        sq_dist = view.sq_norms - 2.0 * (view.matrix @ probe)
+        if view.mask is not None:
+            # Linhas da base substituídas ou removidas pelo log
+            sq_dist[~view.mask] = np.inf
+            sq_dist = np.concatenate([sq_dist, view.extra_sq_norms - 2.0 * (view.extra_matrix @ probe)])
+        sq_dist += float(probe @ probe)
+        if k == 1:
+            best = np.array([int(np.argmin(sq_dist))])
+        else:
+            best = np.argpartition(sq_dist, k - 1)[:k]
+            best = best[np.argsort(sq_dist[best])]
+        distances = np.sqrt(np.maximum(sq_dist[best], 0.0))
+        base = len(view.ids)
+        return [(int(view.ids[i] if i < base else view.extra_ids[i - base]), float(d))
+                for i, d in zip(best, distances)]
+
+    # ---- escrita ----
+
+    @contextmanager
+    def _exclusive(self):
+        """Lock de escrita entre threads e entre processos do host."""
+        with self._lock:
+            fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)  # libera o flock
+
+    def _publish(self, counter: mmap.mmap, generation: int) -> None:
+        _GEN.pack_into(counter, 0, generation)
+        self._view = self._read_file(generation)
+        self.loaded = True
+
+    def _write(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        """Grava um arquivo base novo, zera o log e publica (chamar com o lock exclusivo)."""
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(len(ids), self.dim)
+        sq_norms = np.einsum("ij,ij->i", matrix, matrix).astype(np.float32)
+        counter = self._generation_counter()
+        generation = _GEN.unpack_from(counter, 0)[0] + 1
+
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.dim, len(ids), generation, time.time()))
+            ids.tofile(f)
+            matrix.tofile(f)
+            sq_norms.tofile(f)
+        os.replace(tmp_path, self.path)
+        # Log zerado depois da base: quem ler a base nova com o log antigo reaplica o que ela já contém
+        tmp_delta = f"{self.delta_path}.tmp.{os.getpid()}"
+        open(tmp_delta, "wb").close()
+        os.replace(tmp_delta, self.delta_path)
+        self._publish(counter, generation)
+
+    def _append(self, upserts: Dict[int, np.ndarray], removals: np.ndarray) -> None:
+        """Acrescenta as alterações ao log e publica (chamar com o lock exclusivo)."""
+        records = np.zeros(len(upserts) + len(removals), dtype=self._record)
+        records["id"] = np.concatenate([np.fromiter(upserts, dtype=np.int64, count=len(upserts)), removals])
+        records["op"][:len(upserts)] = _UPSERT
+        records["ts"] = time.time()
+        if upserts:
+            records["embedding"][:len(upserts)] = np.stack(list(upserts.values()))
+        counter = self._generation_counter()
+        with open(self.delta_path, "ab") as f:
+            records.tofile(f)
+        self._publish(counter, _GEN.unpack_from(counter, 0)[0] + 1)
+
+    def _latest(self) -> _View:
+        if not self.exists:
+            empty = np.empty(0, dtype=np.int64)
+            return _View(0, 0.0, empty, np.empty((0, self.dim), dtype=np.float32), np.empty(0, dtype=np.float32))
+        return self._read_file()
+
+    def build_arrays(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        with self._exclusive():
+            self._write(ids, matrix)
+
+    def apply(self, upserts: Dict[int, object] = None, removals: Iterable[int] = ()) -> int:
+        """
+        Aplica cadastros e remoções: acrescenta ao log ou, se ele já passou de
+        ``delta_max`` registros (ou a base ainda não existe), compacta num
+        arquivo base novo. Retorna quantos usuários foram inseridos/atualizados/removidos.
+        """
+        upserts = {int(user_id): self._as_vector(e) for user_id, e in (upserts or {}).items()}
+        removals = np.fromiter((int(u) for u in removals if int(u) not in upserts), dtype=np.int64)
+        with self._exclusive():
+            view = self._latest()
+            removals = np.unique(removals[view.contains(removals)])
+            if not upserts and not len(removals):
+                return 0
+            if self.exists and view.delta_count + len(upserts) + len(removals) <= self.delta_max:
+                self._append(upserts, removals)
+            else:
+                ids, matrix = view.merged()
+                upsert_ids = np.fromiter(upserts, dtype=np.int64, count=len(upserts))
+                keep = ~np.isin(ids, np.concatenate([removals, upsert_ids]))
+                new_rows = np.stack(list(upserts.values())) if upserts else np.empty((0, self.dim), dtype=np.float32)
+                self._write(np.concatenate([ids[keep], upsert_ids]), np.concatenate([matrix[keep], new_rows]))
+        return len(upserts) + len(removals)
+
+    def upsert(self, user_id: int, embedding) -> None:
+        self.apply(upserts={user_id: embedding})
+
+    def upsert_many(self, items: Iterable[Tuple[int, object]]) -> None:
+        self.apply(upserts=dict(items))
+
+    def remove(self, user_id: int) -> bool:
+        return self.apply(removals=[user_id]) > 0
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        view = self._current()
+        if view is None:
+            return {"ids": np.empty(0, dtype=np.int64), "matrix": np.empty((0, self.dim), dtype=np.float32)}
+        ids, matrix = view.merged()
+        return {"ids": ids, "matrix": matrix}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray], **params) -> "MmapIndex":
+        matrix = state["matrix"]
+        index = cls(dim=matrix.shape[1], **params)
+        index.build_arrays(state["ids"], matrix)
+        return index
@@ -0,0 +1,213 @@
+"""
+Prova de vida (liveness) com uma rajada curta de frames da câmera.
+
+Roda inteira numa tarefa do pool biométrico (``analyze_burst``): os frames
+são processados em sequência, cada um com uma única detecção (na região do
+rosto do frame anterior, ver ``app.biometrics.tracking``) reaproveitada para
+os landmarks de 68 pontos (liveness) e para o encoding (identidade).
+
+Sinais, calculados de forma vetorizada sobre todos os frames analisados:
+
+- ``ear``: eye aspect ratio médio dos dois olhos; uma piscada aparece como
+  um frame com olhos fechados (``LIVENESS_EAR_CLOSED``) e variação de pelo
+  menos ``LIVENESS_EAR_DELTA`` na rajada
+- ``motion``: deslocamento não rígido dos landmarks (após alinhar escala,
+  rotação e translação ao primeiro frame), em distâncias interoculares. Uma
+  foto movida diante da câmera só tem movimento rígido
+- ``frame_diff``: diferença média da região do rosto normalizada entre
+  frames consecutivos; frames repetidos (replay) ficam perto de zero
+
+O rosto está vivo com piscada, ou com movimento >= ``LIVENESS_MOTION`` e
+diferença >= ``LIVENESS_MIN_DIFF``. A análise para assim que a decisão é
+certa: no primeiro frame que completa a prova de vida, ou já no primeiro
+rosto se a identidade não confere com os templates. Antes de aprovar, o
+rosto do último frame analisado é comparado ao do primeiro
+(``LIVENESS_SAME_PERSON``) para impedir a troca de rosto no meio da rajada.
+
+Frames rejeitados pelo filtro de qualidade (``app.biometrics.quality``) são
+pulados sem detecção; se por causa deles faltarem rostos, a decisão é
+``quality`` com o código do problema mais frequente.
+"""
+import os
+import time
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.biometrics import pipeline
+from app.biometrics.decode import to_array
+from app.biometrics.profiles import DetectionProfile, get_profile
+from app.biometrics.quality import assess
+from app.biometrics.templates import min_distance
+from app.biometrics.tracking import TRACKING_ROI_MARGIN, expand_box
+
+LIVENESS_EAR_CLOSED = float(os.getenv("LIVENESS_EAR_CLOSED", "0.21"))
+LIVENESS_EAR_DELTA = float(os.getenv("LIVENESS_EAR_DELTA", "0.05"))
+LIVENESS_MOTION = float(os.getenv("LIVENESS_MOTION", "0.05"))
+LIVENESS_MIN_DIFF = float(os.getenv("LIVENESS_MIN_DIFF", "0.05"))
+LIVENESS_SAME_PERSON = float(os.getenv("LIVENESS_SAME_PERSON", "0.6"))
+
+# Índices dos olhos no modelo de 68 pontos (p1..p6 de cada olho)
+_RIGHT_EYE = np.arange(36, 42)
+_LEFT_EYE = np.arange(42, 48)
+_EYES = np.stack([_RIGHT_EYE, _LEFT_EYE])
+
+# Lado da região do rosto usada na diferença entre frames
+_PATCH_SIDE = 32
+
+
+def eye_aspect_ratio(shapes: np.ndarray) -> np.ndarray:
+    """EAR médio dos dois olhos para landmarks ``(n, 68, 2)`` -> ``(n,)``."""
+    eyes = shapes[:, _EYES]  # (n, 2, 6, 2)
+    vertical = (np.linalg.norm(eyes[:, :, 1] - eyes[:, :, 5], axis=-1)
+                + np.linalg.norm(eyes[:, :, 2] - eyes[:, :, 4], axis=-1))
+    horizontal = np.linalg.norm(eyes[:, :, 0] - eyes[:, :, 3], axis=-1)
+    return (vertical / (2.0 * np.maximum(horizontal, 1e-6))).mean(axis=1)
+
+
+def nonrigid_motion(shapes: np.ndarray) -> np.ndarray:
+    """
+    Deslocamento médio dos landmarks de cada frame em relação ao primeiro,
+    depois de remover translação, escala e rotação (Procrustes), em
+    distâncias interoculares. ``(n, 68, 2)`` -> ``(n,)``.
+    """
+    centered = shapes - shapes.mean(axis=1, keepdims=True)
+    eyes = shapes[:, _EYES].mean(axis=2)  # centro de cada olho (n, 2, 2)
+    interocular = np.linalg.norm(eyes[:, 0] - eyes[:, 1], axis=-1)
+    normalized = centered / np.maximum(interocular, 1e-6)[:, None, None]
+    reference = normalized[0]
+    # Rotação ótima de cada frame para a referência (SVD em lote das matrizes 2x2)
+    u, _, vt = np.linalg.svd(np.einsum("nki,kj->nij", normalized, reference))
+    rotations = u @ vt
+    aligned = normalized @ rotations
+    return np.linalg.norm(aligned - reference, axis=-1).mean(axis=1)
+
+
+def face_patch(img: Image.Image, box: tuple) -> np.ndarray:
+    """Região do rosto em tons de cinza, reduzida e normalizada (média 0, desvio 1)."""
+    top, right, bottom, left = box
+    patch = np.asarray(img.crop((left, top, right, bottom)).convert("L").resize((_PATCH_SIDE, _PATCH_SIDE)),
+                       dtype=np.float32)
+    return (patch - patch.mean()) / max(float(patch.std()), 1e-6)
+
+
+def liveness_signals(shapes: np.ndarray, patches: np.ndarray) -> dict:
+    ear = eye_aspect_ratio(shapes)
+    motion = nonrigid_motion(shapes)
+    frame_diff = np.abs(np.diff(patches, axis=0)).mean(axis=(1, 2)) if len(patches) > 1 else np.zeros(0)
+    blink = bool(ear.min() < LIVENESS_EAR_CLOSED and ear.max() - ear.min() >= LIVENESS_EAR_DELTA)
+    max_motion = float(motion.max())
+    max_diff = float(frame_diff.max()) if frame_diff.size else 0.0
+    return {
+        "blink": blink,
+        "ear_min": round(float(ear.min()), 4),
+        "ear_max": round(float(ear.max()), 4),
+        "motion": round(max_motion, 4),
+        "frame_diff": round(max_diff, 4),
+        "live": blink or (max_motion >= LIVENESS_MOTION and max_diff >= LIVENESS_MIN_DIFF),
+    }
+
+
+def _landmarks(array: np.ndarray, box: tuple, api):
+    rect = api._css_to_rect(box)
+    shape = api.pose_predictor_68_point(array, rect)
+    points = np.array([(p.x, p.y) for p in shape.parts()], dtype=np.float32)
+    return rect, points
+
+
+def _encode(array: np.ndarray, rect, api) -> np.ndarray:
+    # Mesmo caminho de face_encodings (landmarks de 5 pontos), reaproveitando a detecção
+    return np.array(api.face_encoder.compute_face_descriptor(array, api.pose_predictor_5_point(array, rect), 1))
+
+
+def analyze_burst(frames: List[bytes], templates: np.ndarray, profile: Optional[DetectionProfile] = None,
+                  threshold: float = 0.6) -> dict:
+    """
+    Liveness + identidade numa rajada de frames (executada no worker).
+    ``decision``: ``live``, ``identity`` (não confere), ``no_face``, ``quality``
+    (frames rejeitados pelo filtro de qualidade) ou ``not_live``.
+    """
+    pipeline._models()
+    from face_recognition import api
+
+    profile = profile or get_profile()
+    timings = {"decode": 0.0, "quality": 0.0, "detect": 0.0, "landmarks": 0.0, "encode": 0.0}
+    shapes, patches = [], []
+    box = None
+    first_encoding = None
+    distance = None
+    signals = None
+    decision = None
+    analyzed = 0
+    quality_rejected = Counter()
+
+    for data in frames:
+        analyzed += 1
+        t0 = time.perf_counter()
+        img = pipeline.decode_rgb(data)
+        array = to_array(img)
+        tq = time.perf_counter()
+        quality = assess(array)
+        t1 = time.perf_counter()
+        timings["decode"] += tq - t0
+        timings["quality"] += t1 - tq
+        if quality is not None and quality["rejected"]:
+            # Frame ruim: a região do rosto anterior continua valendo para o próximo
+            quality_rejected[quality["error"]] += 1
+            continue
+        locations = []
+        if box is not None:
+            locations = pipeline.detect_faces_in_roi(img, expand_box(box, array.shape, TRACKING_ROI_MARGIN), profile)
+        if not locations:
+            locations = pipeline.detect_faces(img, profile)
+        t2 = time.perf_counter()
+        timings["detect"] += t2 - t1
+        if not locations:
+            # Frame sem rosto (desfoque, oclusão): segue para o próximo
+            box = None
+            continue
+
+        box = max(locations, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+        rect, points = _landmarks(array, box, api)
+        t3 = time.perf_counter()
+        timings["landmarks"] += t3 - t2
+        shapes.append(points)
+        patches.append(face_patch(img, box))
+
+        if first_encoding is None:
+            first_encoding = _encode(array, rect, api)
+            timings["encode"] += time.perf_counter() - t3
+            distance = min_distance(templates, first_encoding)
+            if distance > threshold:
+                decision = "identity"
+                break
+
+        if len(shapes) >= 2:
+            signals = liveness_signals(np.stack(shapes), np.stack(patches))
+            if signals["live"]:
+                t4 = time.perf_counter()
+                same_person = float(np.linalg.norm(_encode(array, rect, api) - first_encoding))
+                timings["encode"] += time.perf_counter() - t4
+                signals["same_person_distance"] = round(same_person, 4)
+                decision = "live" if same_person <= LIVENESS_SAME_PERSON else "identity"
+                break
+
+    if decision is None:
+        if len(shapes) >= 2:
+            decision = "not_live"
+        else:
+            decision = "quality" if quality_rejected else "no_face"
+    return {
+        "decision": decision,
+        "distance": distance,
+        "signals": signals,
+        "frames_total": len(frames),
+        "frames_analyzed": analyzed,
+        "faces_found": len(shapes),
+        "quality_rejected": dict(quality_rejected),
+        "quality_error": quality_rejected.most_common(1)[0][0] if quality_rejected else None,
+        "profile": profile.name,
+        "timings": timings,
+    }
@@ -0,0 +1,139 @@
+"""
+Funções de processamento facial executadas nos workers do pool biométrico.
+
+Tudo aqui roda fora do event loop (ver ``app.biometrics.executor``). O
+``face_recognition`` é importado apenas dentro dos workers: é a importação
+que carrega os modelos do dlib (detector HOG, shape predictor e ResNet).
+Os workers recebem os bytes da imagem e devolvem apenas resultados pequenos
+(caixas e encodings), evitando serializar a imagem decodificada.
+"""
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.biometrics.decode import decode_rgb, to_array
+from app.biometrics.profiles import DetectionProfile, get_profile
+from app.biometrics.quality import assess
+
+_face_recognition = None
+
+
+def _models():
+    global _face_recognition
+    if _face_recognition is None:
+        import face_recognition
+        _face_recognition = face_recognition
+    return _face_recognition
+
+
+def warm_up() -> bool:
+    """Carrega os modelos e executa uma inferência de aquecimento."""
+    face_recognition = _models()
+    blank = np.zeros((96, 96, 3), dtype=np.uint8)
+    face_recognition.face_locations(blank)
+    face_recognition.face_encodings(blank, [(8, 88, 88, 8)])
+    return True
+
+
+def _detection_scale(img: Image.Image, profile: DetectionProfile) -> float:
+    width, height = img.size
+    if profile.max_side and max(width, height) > profile.max_side:
+        return profile.max_side / max(width, height)
+    return 1.0
+
+
+def detect_faces(img: Image.Image, profile: DetectionProfile) -> list:
+    """
+    Detecta rostos numa cópia reduzida a ``profile.max_side`` e devolve as
+    caixas (top, right, bottom, left) nas coordenadas da imagem original.
+    """
+    return _detect_scaled(img, _detection_scale(img, profile), profile)
+
+
+def _detect_scaled(img: Image.Image, scale: float, profile: DetectionProfile) -> list:
+    face_recognition = _models()
+    width, height = img.size
+    detect_img = img
+    if scale != 1.0:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        detect_img = img.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+    locations = face_recognition.face_locations(
+        np.asarray(detect_img),
+        number_of_times_to_upsample=profile.upsample,
+        model=profile.model,
+    )
+    if scale == 1.0:
+        return locations
+    return [
+        (
+            max(0, int(top / scale)),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(left / scale)),
+        )
+        for top, right, bottom, left in locations
+    ]
+
+
+def detect_faces_in_roi(img: Image.Image, roi: tuple, profile: DetectionProfile) -> list:
+    """
+    Detecção só na região ``roi`` (top, right, bottom, left); caixas nas coordenadas da imagem.
+    A região é reduzida na mesma escala que a imagem inteira seria (mesmo tamanho mínimo de rosto).
+    """
+    top, right, bottom, left = roi
+    crop = img.crop((left, top, right, bottom))
+    locations = _detect_scaled(crop, _detection_scale(img, profile), profile)
+    return [(t + top, r + left, b + top, l + left) for t, r, b, l in locations]
+
+
+def extract_faces(image_bytes: bytes, profile: DetectionProfile = None, roi: tuple = None) -> dict:
+    """
+    Decodifica a imagem, detecta rostos e gera os encodings de 128 dimensões.
+    ``timings`` traz a duração (s) de cada etapa, medida no worker.
+
+    Com ``roi`` (região do rosto no frame anterior, ver ``app.biometrics.tracking``)
+    o detector roda só nela; sem rosto na região, refaz na imagem inteira.
+    ``detector`` indica o caminho: ``roi``, ``roi+full`` ou ``full``.
+
+    Antes da detecção a imagem passa pelo filtro de qualidade (``quality``,
+    ver ``app.biometrics.quality``); rejeitada, volta sem rostos e
+    ``detector`` = ``quality``.
+    """
+    face_recognition = _models()
+    profile = profile or get_profile()
+    t0 = time.perf_counter()
+    img = decode_rgb(image_bytes)
+    # Um único array dos pixels: filtro de qualidade e encodings
+    array = to_array(img)
+    tq = time.perf_counter()
+    quality = assess(array)
+    t1 = time.perf_counter()
+    result = {
+        "shape": (img.height, img.width, 3),
+        "locations": [],
+        "encodings": [],
+        "profile": profile.name,
+        "detector": "quality",
+        "quality": quality,
+        "timings": {"decode": tq - t0, "quality": t1 - tq},
+    }
+    if quality is not None and quality["rejected"]:
+        return result
+    detector = "full"
+    face_locations = []
+    if roi is not None:
+        face_locations = detect_faces_in_roi(img, roi, profile)
+        detector = "roi" if face_locations else "roi+full"
+    if not face_locations:
+        face_locations = detect_faces(img, profile)
+    t2 = time.perf_counter()
+    encodings = []
+    if face_locations:
+        # Landmarks e encodings na resolução original, apenas nas regiões detectadas
+        encodings = face_recognition.face_encodings(array, face_locations)
+    t3 = time.perf_counter()
+    result.update(locations=face_locations, encodings=encodings, detector=detector)
+    result["timings"].update(detect=t2 - t1, encode=t3 - t2)
+    return result
@@ -0,0 +1,45 @@
+"""
+Perfis de detecção facial.
+
+Um perfil define a resolução máxima usada pelo detector, o número de
+upsamples e o modelo (HOG na CPU ou CNN). A detecção roda na imagem
+reduzida; as caixas são reescaladas e os landmarks/encodings são calculados
+na região correspondente da imagem original, preservando a precisão.
+
+O perfil padrão vem de ``DETECTION_PROFILE`` e pode ser sobrescrito por
+endpoint com ``DETECTION_PROFILE_LOGIN``, ``DETECTION_PROFILE_IDENTIFY`` e
+``DETECTION_PROFILE_ENROLL``.
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class DetectionProfile:
+    name: str
+    max_side: int  # maior lado da imagem de detecção em pixels (0 = sem redução)
+    upsample: int  # número de upsamples do detector (encontra rostos menores)
+    model: str  # "hog" ou "cnn"
+
+
+DETECTION_PROFILES = {
+    "fast": DetectionProfile("fast", max_side=480, upsample=0, model="hog"),
+    "balanced": DetectionProfile("balanced", max_side=800, upsample=1, model="hog"),
+    "accurate": DetectionProfile("accurate", max_side=1600, upsample=1, model="cnn"),
+}
+
+DEFAULT_DETECTION_PROFILE = os.getenv("DETECTION_PROFILE", "balanced")
+
+
+def get_profile(name: Optional[str] = None) -> DetectionProfile:
+    """Resolve um perfil pelo nome (``None`` usa o padrão do ambiente)."""
+    name = (name or DEFAULT_DETECTION_PROFILE).lower()
+    if name not in DETECTION_PROFILES:
+        raise ValueError(f"Perfil de detecção desconhecido: {name} (opções: {', '.join(DETECTION_PROFILES)})")
+    return DETECTION_PROFILES[name]
+
+
+def endpoint_profile(endpoint: str) -> DetectionProfile:
+    """Perfil de um endpoint (``DETECTION_PROFILE_<ENDPOINT>`` ou o padrão)."""
+    return get_profile(os.getenv(f"DETECTION_PROFILE_{endpoint.upper()}"))
@@ -0,0 +1,63 @@
+"""
+Formato binário compacto para os embeddings faciais.
+
+Layout (little-endian):
+
+    offset 0  magic   2 bytes  b"BE"
+    offset 2  versão  uint8    1
+    offset 3  dtype   uint8    1 = float32, 2 = float16
+    offset 4  dim     uint16   número de componentes
+    offset 6  -       uint16   reservado
+    offset 8  dados   dim * itemsize
+
+Um encoding de 128 dimensões ocupa 520 bytes em float32 (264 em float16),
+contra ~2,5 KB como lista JSON. A leitura em float32 é zero-copy via
+``np.frombuffer``. ``EMBEDDING_STORAGE_DTYPE`` define o formato de escrita.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"BE"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<2sBBHH")
+
+_DTYPE_CODES = {"float32": 1, "float16": 2}
+_CODE_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32").lower()
+
+
+def pack_embedding(embedding, dtype: str = None) -> bytes:
+    """Serializa um embedding no formato binário versionado."""
+    dtype = (dtype or EMBEDDING_STORAGE_DTYPE).lower()
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"dtype de armazenamento inválido: {dtype} (opções: {', '.join(_DTYPE_CODES)})")
+    code = _DTYPE_CODES[dtype]
+    vector = np.asarray(embedding, dtype=_CODE_DTYPES[code]).ravel()
+    return HEADER.pack(MAGIC, FORMAT_VERSION, code, vector.size, 0) + vector.tobytes()
+
+
+def is_packed(value) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
+
+
+def unpack_embedding(value) -> np.ndarray:
+    """
+    Desserializa para um vetor float32. Em float32 o array é uma view
+    somente-leitura sobre o buffer (sem cópia). Aceita também o formato
+    legado em JSON (lista ou texto), para linhas ainda não migradas.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC:
+        magic, version, code, dim, _ = HEADER.unpack_from(value)
+        if version != FORMAT_VERSION or code not in _CODE_DTYPES:
+            raise ValueError(f"Formato de embedding não suportado (versão {version}, dtype {code})")
+        vector = np.frombuffer(value, dtype=_CODE_DTYPES[code], count=dim, offset=HEADER.size)
+        return vector if code == 1 else vector.astype(np.float32)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value).decode("utf-8")
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
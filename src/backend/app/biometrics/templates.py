@@ -0,0 +1,147 @@
+"""
+Gestão dos múltiplos templates faciais de um usuário.
+
+Cada usuário pode ter até ``MAX_TEMPLATES_PER_USER`` templates (capturas em
+condições diferentes de luz/pose). Ao exceder o limite, a política
+``TEMPLATE_REPLACEMENT_POLICY`` escolhe quais templates antigos descartar:
+
+- ``oldest``: descarta os mais antigos (padrão)
+- ``redundant``: descarta os mais parecidos com outro template, mantendo
+  a galeria do usuário o mais diversa possível
+
+O centróide (média dos templates) é pré-calculado e usado na identificação
+1:N; a verificação 1:1 compara o probe com todos os templates de uma vez.
+"""
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.biometrics.storage import pack_embedding, unpack_embedding
+from app.models.biometric_centroid import BiometricCentroid
+from app.models.biometric_template import BiometricTemplate
+
+MAX_TEMPLATES_PER_USER = int(os.getenv("MAX_TEMPLATES_PER_USER", "5"))
+TEMPLATE_REPLACEMENT_POLICY = os.getenv("TEMPLATE_REPLACEMENT_POLICY", "oldest").lower()
+
+
+def stack_embeddings(embeddings: Sequence[np.ndarray]) -> np.ndarray:
+    """Empilha os embeddings numa matriz float32 (n, dim)."""
+    return np.stack([np.asarray(e, dtype=np.float32) for e in embeddings])
+
+
+def compute_centroid(matrix: np.ndarray) -> np.ndarray:
+    return matrix.mean(axis=0, dtype=np.float32)
+
+
+def min_distance(matrix: np.ndarray, probe) -> float:
+    """Menor distância euclidiana do probe para qualquer linha da matriz."""
+    diff = matrix - np.asarray(probe, dtype=np.float32)
+    return float(np.sqrt(np.einsum("ij,ij->i", diff, diff).min()))
+
+
+def select_replacements(existing: np.ndarray, new_count: int,
+                        max_templates: int = MAX_TEMPLATES_PER_USER,
+                        policy: str = TEMPLATE_REPLACEMENT_POLICY) -> List[int]:
+    """
+    Índices (em ``existing``, ordenado do mais antigo para o mais novo) dos
+    templates a remover para que ``existing + new_count`` caiba no limite.
+    """
+    excess = len(existing) + min(new_count, max_templates) - max_templates
+    if excess <= 0:
+        return []
+    if excess >= len(existing):
+        return list(range(len(existing)))
+    if policy != "redundant":
+        return list(range(excess))
+
+    # Remove iterativamente o template com o vizinho mais próximo
+    sq_norms = np.einsum("ij,ij->i", existing, existing)
+    dist = sq_norms[:, None] + sq_norms[None, :] - 2.0 * (existing @ existing.T)
+    np.fill_diagonal(dist, np.inf)
+    removed = []
+    for _ in range(excess):
+        victim = int(np.argmin(dist.min(axis=1)))
+        removed.append(victim)
+        dist[victim, :] = np.inf
+        dist[:, victim] = np.inf
+    return sorted(removed)
+
+
+async def load_user_templates(db: AsyncSession, user_id: int) -> Optional[np.ndarray]:
+    """Todos os templates do usuário numa matriz (n, dim), ou ``None`` se não houver."""
+    blobs = (await db.execute(
+        select(BiometricTemplate.embedding).where(BiometricTemplate.user_id == user_id)
+    )).scalars().all()
+    if not blobs:
+        return None
+    return stack_embeddings([unpack_embedding(blob) for blob in blobs])
+
+
+async def add_user_templates(db: AsyncSession, user_id: int, embeddings: Sequence[np.ndarray]) -> Tuple[np.ndarray, int]:
+    """
+    Acrescenta templates ao usuário aplicando o limite e a política de
+    substituição, e recalcula o centróide. Não faz commit.
+    Retorna (centróide, quantidade final de templates).
+    """
+    return (await add_templates_bulk(db, {user_id: embeddings}))[user_id]
+
+
+async def add_templates_bulk(db: AsyncSession,
+                             embeddings_by_user: Dict[int, Sequence[np.ndarray]]) -> Dict[int, Tuple[np.ndarray, int]]:
+    """
+    Versão em lote de ``add_user_templates``: um SELECT dos templates e dos
+    centróides de todos os usuários, um DELETE e um INSERT multi-linha,
+    independente do número de usuários. Não faz commit.
+    Retorna {user_id: (centróide, quantidade final de templates)}.
+    """
+    embeddings_by_user = {
+        uid: list(embs)[-MAX_TEMPLATES_PER_USER:] for uid, embs in embeddings_by_user.items() if embs
+    }
+    if not embeddings_by_user:
+        return {}
+    user_ids = list(embeddings_by_user)
+
+    existing = defaultdict(list)
+    rows = await db.execute(
+        select(BiometricTemplate.id, BiometricTemplate.user_id, BiometricTemplate.embedding)
+        .where(BiometricTemplate.user_id.in_(user_ids))
+        .order_by(BiometricTemplate.user_id, BiometricTemplate.created_at, BiometricTemplate.id)
+    )
+    for template_id, user_id, blob in rows:
+        existing[user_id].append((template_id, unpack_embedding(blob)))
+    centroid_rows = {
+        row.user_id: row for row in (await db.execute(
+            select(BiometricCentroid).where(BiometricCentroid.user_id.in_(user_ids))
+        )).scalars()
+    }
+
+    removed_ids, new_rows, results = [], [], {}
+    for user_id, embeddings in embeddings_by_user.items():
+        current = existing.get(user_id, [])
+        existing_matrix = (
+            stack_embeddings([emb for _, emb in current])
+            if current else np.empty((0, len(embeddings[0])), dtype=np.float32)
+        )
+        removed = select_replacements(existing_matrix, len(embeddings))
+        removed_ids.extend(current[i][0] for i in removed)
+        kept = np.delete(existing_matrix, removed, axis=0)
+        new_rows.extend({"user_id": user_id, "embedding": pack_embedding(e)} for e in embeddings)
+
+        matrix = np.concatenate([kept, stack_embeddings(embeddings)])
+        centroid = compute_centroid(matrix)
+        row = centroid_rows.get(user_id)
+        if row is None:
+            db.add(BiometricCentroid(user_id=user_id, embedding=pack_embedding(centroid), template_count=len(matrix)))
+        else:
+            row.embedding = pack_embedding(centroid)
+            row.template_count = len(matrix)
+        results[user_id] = (centroid, len(matrix))
+
+    if removed_ids:
+        await db.execute(delete(BiometricTemplate).where(BiometricTemplate.id.in_(removed_ids)))
+    await db.execute(insert(BiometricTemplate), new_rows)
+    return results
@@ -0,0 +1,96 @@
+"""
+Rastreamento do rosto entre frames de uma mesma sessão (login por stream).
+
+Entre frames consecutivos da câmera o rosto quase não se move: em vez de
+rodar o detector na imagem inteira a cada frame, o ``FaceTracker`` guarda a
+última caixa e pede ao worker a detecção só numa região ao redor dela
+(caixa expandida por ``TRACKING_ROI_MARGIN`` do seu maior lado). A imagem
+inteira só é varrida:
+
+- no primeiro frame e depois de um frame sem rosto
+- quando o rosto não é encontrado na região (o worker refaz na imagem
+  inteira na mesma tarefa, sem outra ida ao pool)
+- a cada ``TRACKING_REDETECT_EVERY`` frames, para não perder um rosto que
+  entrou em cena fora da região
+
+O estado fica no event loop (os workers não guardam estado entre tarefas);
+o worker recebe só a região em coordenadas da imagem original.
+"""
+import os
+from typing import Optional, Tuple
+
+TRACKING_ENABLED = os.getenv("TRACKING_ENABLED", "true").lower() == "true"
+TRACKING_ROI_MARGIN = float(os.getenv("TRACKING_ROI_MARGIN", "0.5"))
+TRACKING_REDETECT_EVERY = int(os.getenv("TRACKING_REDETECT_EVERY", "10"))
+
+# (top, right, bottom, left), mesma convenção do face_recognition
+Box = Tuple[int, int, int, int]
+
+
+def expand_box(box: Box, shape: Tuple[int, ...], margin: float) -> Box:
+    """Caixa expandida por ``margin`` x o maior lado, limitada à imagem (altura, largura)."""
+    top, right, bottom, left = box
+    pad = int(round(max(bottom - top, right - left) * margin))
+    height, width = shape[0], shape[1]
+    return (max(0, top - pad), min(width, right + pad), min(height, bottom + pad), max(0, left - pad))
+
+
+class FaceTracker:
+    def __init__(self, margin: float = TRACKING_ROI_MARGIN, redetect_every: int = TRACKING_REDETECT_EVERY,
+                 enabled: bool = TRACKING_ENABLED):
+        self.margin = margin
+        self.redetect_every = max(1, redetect_every)
+        self.enabled = enabled
+        self.frames = 0
+        self.roi_hits = 0
+        self.roi_misses = 0
+        self.full_detections = 0
+        self.quality_rejected = 0
+        self._box: Optional[Box] = None
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._since_full = 0
+
+    def roi(self) -> Optional[Box]:
+        """Região para o próximo frame (``None`` = detecção na imagem inteira)."""
+        if not self.enabled or self._box is None or self._since_full + 1 >= self.redetect_every:
+            return None
+        return expand_box(self._box, self._shape, self.margin)
+
+    def update(self, faces: dict) -> None:
+        """Registra o resultado de ``extract_faces`` do frame analisado."""
+        self.frames += 1
+        detector = faces.get("detector", "full")
+        if detector == "quality":
+            # Frame rejeitado pelo filtro de qualidade: a região do rosto anterior continua valendo
+            self.quality_rejected += 1
+            return
+        if detector == "roi":
+            self.roi_hits += 1
+            self._since_full += 1
+        else:
+            if detector == "roi+full":
+                self.roi_misses += 1
+            self.full_detections += 1
+            self._since_full = 0
+        locations = faces.get("locations") or []
+        if locations:
+            # Rosto principal: o maior
+            self._box = max(locations, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+            self._shape = faces["shape"]
+        else:
+            self._box = None
+
+    @property
+    def saved_detections(self) -> int:
+        """Detecções na imagem inteira evitadas (frames resolvidos só na região)."""
+        return self.roi_hits
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "roi_hits": self.roi_hits,
+            "roi_misses": self.roi_misses,
+            "full_detections": self.full_detections,
+            "saved_detections": self.saved_detections,
+            "quality_rejected": self.quality_rejected,
+        }
@@ -1,36 +1,189 @@
 import os
+import threading
+import time
+from uuid import uuid4
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 
 # Aceita DATABASE_URL ou SUPABASE_DB_URL (mais flexível)
 DATABASE_URL = os.getenv("DATABASE_URL") or os.getenv("SUPABASE_DB_URL", "sqlite:///./bioaccess.db")
 
-# Configurações de pool para PostgreSQL (evita conexões expiradas)
-if DATABASE_URL.startswith("postgresql"):
-    engine = create_engine(
-        DATABASE_URL,
+# Modo do pool de conexões (PostgreSQL):
+# - queue: pool próprio (QueuePool) com pre-ping e reciclagem (padrão)
+# - pgbouncer: pool próprio atrás de um pooler em modo transação (PgBouncer/Supavisor);
+#   não envia parâmetros de sessão no startup nem usa prepared statements
+# - null: sem pool, uma conexão nova por requisição (comportamento antigo)
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # espera máxima por uma conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos até reabrir uma conexão
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+class PoolStats:
+    """Métricas de checkout do pool (tempo de espera por uma conexão)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            if timed_out:
+                self.timeouts += 1
+            self.wait_total_s += seconds
+            self.wait_max_s = max(self.wait_max_s, seconds)
+
+
+pool_stats = PoolStats()
+
+
+class _CheckoutTimingMixin:
+    """Mede o tempo de espera de cada checkout do pool."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            # Contadores atualizados juntos sob o lock (timeouts chegam em rajada com o pool saturado)
+            pool_stats.record_wait(time.perf_counter() - start, timed_out)
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_kwargs(mode: str, queue_pool=InstrumentedQueuePool) -> dict:
+    if mode == "null":
+        return {"poolclass": NullPool}
+    if mode not in ("queue", "pgbouncer"):
+        raise ValueError(f"DB_POOL_MODE inválido: {mode} (opções: queue, pgbouncer, null)")
+    return {
+        "poolclass": queue_pool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def build_engine(url: str = DATABASE_URL, mode: str = DB_POOL_MODE):
+    """Cria o engine síncrono com o modo de pool configurado."""
+    if url.startswith("postgresql"):
+        connect_args = {"connect_timeout": 10}
+        if mode != "pgbouncer":
+            # Poolers em modo transação rejeitam parâmetros de sessão no startup
+            connect_args["options"] = "-c timezone=utc"
+        return create_engine(url, echo=False, connect_args=connect_args, **_pool_kwargs(mode))
+
+    # SQLite
+    kwargs = {}
+    if ":memory:" not in url:
+        kwargs = _pool_kwargs(mode)
+    return create_engine(
+        url,
         echo=False,
-        poolclass=NullPool,  # Não mantém pool de conexões (ideal para Supabase pooler)
-        connect_args={
-            "connect_timeout": 10,
-            "options": "-c timezone=utc"
-        }
+        connect_args={"check_same_thread": False},
+        **kwargs
     )
-else:
-    # SQLite
-    engine = create_engine(
-        DATABASE_URL,
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """URL equivalente com driver assíncrono (asyncpg / aiosqlite)."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql":
+        query = dict(parsed.query)
+        # asyncpg usa "ssl" no lugar do "sslmode" da libpq
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    if parsed.get_backend_name() == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return url
+
+
+def build_async_engine(url: str = DATABASE_URL, mode: str = DB_POOL_MODE):
+    """Cria o engine assíncrono usado pelos routers."""
+    async_url = async_database_url(url)
+    if async_url.startswith("postgresql"):
+        connect_args = {"timeout": 10}
+        if mode == "pgbouncer":
+            # Poolers em modo transação não preservam prepared statements entre transações
+            connect_args.update({
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            })
+        else:
+            connect_args["server_settings"] = {"timezone": "utc"}
+        return create_async_engine(
+            async_url, echo=False, connect_args=connect_args,
+            **_pool_kwargs(mode, InstrumentedAsyncQueuePool)
+        )
+
+    kwargs = {}
+    if ":memory:" not in async_url:
+        kwargs = _pool_kwargs(mode, InstrumentedAsyncQueuePool)
+    return create_async_engine(
+        async_url,
         echo=False,
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False},
+        **kwargs
     )
 
+
+# Engine síncrono: scripts, migrações e criação do schema
+engine = build_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Engine assíncrono: requisições HTTP (não bloqueia o event loop)
+async_engine = build_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+
+def pool_status() -> dict:
+    """Estado atual do pool das requisições para monitoramento (/health/pool)."""
+    pool = async_engine.pool
+    status = {"mode": DB_POOL_MODE, "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+        })
+    checkouts = pool_stats.checkouts
+    status.update({
+        "checkouts": checkouts,
+        "timeouts": pool_stats.timeouts,
+        "wait_ms_avg": (pool_stats.wait_total_s / checkouts * 1000) if checkouts else 0.0,
+        "wait_ms_max": pool_stats.wait_max_s * 1000,
+    })
+    return status
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
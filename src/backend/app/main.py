@@ -1,8 +1,47 @@
 import os, json
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config import async_engine, pool_stats, pool_status
 from app.routers import auth, data, reports
+from app.biometrics import gallery
+from app.biometrics.executor import biometric_executor
+from app.services.audit import audit_log
+from app.services.hashing import password_hasher
+from app.services.metrics import CONTENT_TYPE, REQUEST_DURATION, REQUESTS, registry
+from app.services.profiler import request_profiler
+from app.services.rollups import rollups
+from app.services.upload_limit import UploadLimitMiddleware
+from app.services.startup import readiness, run_startup_tasks
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nada lento aqui: o uvicorn só abre a porta quando o startup termina
+    # Sobe os workers biométricos (cada um carrega os modelos do dlib no initializer)
+    biometric_executor.start()
+    # Calibra o custo do bcrypt em background no pool de hashing
+    password_hasher.start()
+    # Gravador da auditoria em lote (eventos ficam na fila até o schema existir)
+    audit_log.start()
+    # Schema, seed, galeria e aquecimento dos modelos em background (ver GET /ready)
+    startup_task = asyncio.create_task(run_startup_tasks())
+    yield
+    startup_task.cancel()
+    biometric_executor.shutdown()
+    password_hasher.shutdown()
+    # Persistir o índice biométrico para o próximo start não reconstruir do banco
+    gallery.save_snapshot()
+    # Grava os eventos de auditoria que ainda estão na fila
+    await audit_log.shutdown()
+    request_profiler.shutdown()
+    # Fecha as conexões do pool assíncrono (senão o driver segura o processo)
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="BioAccess API",
@@ -10,6 +49,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # ---- CORS ----
@@ -44,6 +84,31 @@ app.add_middleware(
     max_age=3600,
 )
 
+# ---- Limite de tamanho dos uploads (413 durante o recebimento do corpo) ----
+app.add_middleware(UploadLimitMiddleware)
+
+# ---- Latência por endpoint (GET /metrics e histogramas em app.services.rollups) ----
+# Também abre/fecha a sessão do profiler sob demanda (app.services.profiler) quando ligado
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    session = request_profiler.begin() if request_profiler.enabled else None
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        # Também quando a rota levanta exceção: senão o cProfile fica ligado e a sessão presa
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        if session is not None:
+            request_profiler.finish(session, f"{request.method} {route.path if route else 'unmatched'}", elapsed)
+    # Só rotas conhecidas (caminhos 404 não viram séries); respostas em streaming medem até os headers
+    if route is not None:
+        REQUEST_DURATION.observe(elapsed, request.method, route.path)
+        REQUESTS.inc(request.method, route.path, str(response.status_code))
+        if audit_log.enabled:
+            rollups.observe_latency(f"{request.method} {route.path}", elapsed * 1000, datetime.now(timezone.utc))
+    return response
+
 # ---- Routers ----
 app.include_router(auth.router)
 app.include_router(data.router)
@@ -63,6 +128,52 @@ def root():
 def health():
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready(response: Response):
+    """Readiness: 503 até banco, galeria e modelos biométricos estarem prontos."""
+    status = readiness.status()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+@app.get("/health/pool")
+def health_pool():
+    """Métricas do pool de conexões (espera no checkout, em uso, overflow)."""
+    return pool_status()
+
+# ---- Métricas Prometheus ----
+# Com METRICS_TOKEN definido, o scrape precisa de "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+registry.gauge("bioaccess_biometric_pending", "Tarefas no pool biométrico (em execução + na fila)",
+               lambda: biometric_executor.pending)
+registry.gauge("bioaccess_biometric_max_pending", "Limite da fila do pool biométrico",
+               lambda: biometric_executor.max_pending)
+registry.gauge("bioaccess_biometric_workers", "Processos do pool biométrico", lambda: biometric_executor.workers)
+registry.gauge("bioaccess_hashing_pending", "Operações bcrypt em execução + na fila", lambda: password_hasher.pending)
+registry.gauge("bioaccess_hashing_max_pending", "Limite da fila de hashing", lambda: password_hasher.max_pending)
+registry.gauge("bioaccess_db_pool_checked_out", "Conexões do pool em uso", lambda: pool_status().get("checked_out"))
+registry.gauge("bioaccess_db_pool_overflow", "Conexões de overflow abertas", lambda: pool_status().get("overflow"))
+registry.gauge("bioaccess_db_pool_checkouts_total", "Checkouts de conexão", lambda: pool_stats.checkouts, "counter")
+registry.gauge("bioaccess_db_pool_timeouts_total", "Checkouts que estouraram o timeout",
+               lambda: pool_stats.timeouts, "counter")
+registry.gauge("bioaccess_db_pool_wait_seconds_total", "Tempo total de espera por conexão",
+               lambda: pool_stats.wait_total_s, "counter")
+registry.gauge("bioaccess_audit_queue_depth", "Eventos de auditoria aguardando gravação", lambda: audit_log.pending)
+registry.gauge("bioaccess_audit_dropped_total", "Eventos de auditoria descartados (fila cheia)",
+               lambda: audit_log.dropped, "counter")
+registry.gauge("bioaccess_gallery_size", "Usuários na galeria 1:N", gallery.gallery_size)
+registry.gauge("bioaccess_profiles_written_total", "Perfis gravados pelo profiler sob demanda",
+               lambda: request_profiler.written, "counter")
+registry.gauge("bioaccess_ready", "1 quando banco, galeria e modelos estão prontos", lambda: int(readiness.ready))
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Métricas no formato texto do Prometheus."""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,9 @@
 from app.models.user import User
+from app.models.user_tombstone import UserTombstone
 from app.models.biometric_template import BiometricTemplate
+from app.models.biometric_centroid import BiometricCentroid
+from app.models.audit_event import AuditEvent
+from app.models.report_rollup import AuditHourly, DistanceHistogram, LatencyHistogram
 
-__all__ = ["User", "BiometricTemplate"]
+__all__ = ["User", "UserTombstone", "BiometricTemplate", "BiometricCentroid", "AuditEvent",
+           "AuditHourly", "DistanceHistogram", "LatencyHistogram"]
@@ -0,0 +1,25 @@
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, Index, Integer, String
+from app.config import Base
+
+class AuditEvent(Base):
+    __tablename__ = "audit_events"
+
+    # Só INSERT (append-only); BIGINT no PostgreSQL, INTEGER no SQLite (autoincremento)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    ts = Column(DateTime(timezone=True), nullable=False)  # Momento do evento (não da gravação do lote)
+    action = Column(String(32), nullable=False)  # login_password, login_camera, identify, enroll, ...
+    username = Column(String(64))  # Sem FK: o histórico sobrevive à exclusão do usuário
+    user_id = Column(Integer)
+    success = Column(Boolean, nullable=False)
+    level_requested = Column(Integer)
+    origin_ip = Column(String(45))
+    distance = Column(Float)
+    confidence = Column(Float)
+    detail = Column(String(255))
+
+    # Paginação por id decrescente (keyset) com filtro por usuário/ação; intervalo de datas por ts
+    __table_args__ = (
+        Index("ix_audit_events_username_id", "username", "id"),
+        Index("ix_audit_events_action_id", "action", "id"),
+        Index("ix_audit_events_ts", "ts"),
+    )
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, func, LargeBinary
+from app.config import Base
+
+class BiometricCentroid(Base):
+    __tablename__ = "biometric_centroids"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    embedding = Column(LargeBinary, nullable=False)  # Média dos templates do usuário (ver app.biometrics.storage)
+    template_count = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func, LargeBinary
 from sqlalchemy.orm import relationship
 from app.config import Base
 
@@ -6,8 +6,8 @@ class BiometricTemplate(Base):
     __tablename__ = "biometric_templates"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True)
-    embedding = Column(JSON, nullable=False)  # Armazena o array do embedding em JSON
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)  # Vários templates por usuário
+    embedding = Column(LargeBinary, nullable=False)  # Embedding em formato binário (ver app.biometrics.storage)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # Relationship
@@ -0,0 +1,32 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String
+from app.config import Base
+
+# Agregados por hora mantidos incrementalmente a cada gravação da auditoria
+# (ver app.services.rollups); os relatórios leem só estas tabelas.
+
+class AuditHourly(Base):
+    __tablename__ = "report_audit_hourly"
+
+    hour = Column(DateTime(timezone=True), primary_key=True)  # Início da hora (UTC)
+    action = Column(String(32), primary_key=True)
+    success = Column(Boolean, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DistanceHistogram(Base):
+    __tablename__ = "report_distance_hourly"
+
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    action = Column(String(32), primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # Índice da faixa de distância (ver DISTANCE_BUCKET_WIDTH)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class LatencyHistogram(Base):
+    __tablename__ = "report_latency_hourly"
+
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    endpoint = Column(String(128), primary_key=True)  # "POST /auth/login" (template da rota)
+    bucket = Column(Integer, primary_key=True)  # Índice em LATENCY_BUCKETS_MS
+    count = Column(Integer, nullable=False, default=0)
+    total_ms = Column(Float, nullable=False, default=0.0)
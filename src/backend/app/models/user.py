@@ -1,6 +1,9 @@
 from sqlalchemy import Column, Integer, String, DateTime, func
 from app.config import Base
 
+# Perfis aceitos no cadastro (API e import em massa)
+VALID_ROLES = ["public", "director", "minister"]
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -8,4 +11,5 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)  # bcrypt hash
     role = Column(String(32), default="public", nullable=False)  # public, director, minister
     clearance = Column(Integer, default=1, nullable=False)  # 1, 2, 3
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)  # Incrementado para revogar tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String, DateTime, func
+from app.config import Base
+
+class UserTombstone(Base):
+    """Última versão de token de um username excluído (um novo cadastro com o mesmo nome continua dela)."""
+    __tablename__ = "user_tombstones"
+    
+    username = Column(String(64), primary_key=True)
+    token_version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
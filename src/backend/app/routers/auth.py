@@ -1,105 +1,238 @@
-from fastapi import APIRouter, HTTPException, status, Depends, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, status, Depends, File, UploadFile, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import json
+import time
+import zipfile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import jwt
 from datetime import datetime, timedelta
-import io
-from PIL import Image
-import numpy as np
-import face_recognition
 
-from app.config import get_db, Base, engine
-from app.models.user import User
+from app.config import AsyncSessionLocal, get_db
+from app.models.user import User, VALID_ROLES
+from app.models.user_tombstone import UserTombstone
 from app.models.biometric_template import BiometricTemplate
+from app.models.biometric_centroid import BiometricCentroid
+from app.biometrics.batch import BATCH_MAX_ITEMS, iter_zip_items, run_batch, username_from_path
+from app.biometrics.gallery import get_gallery, gallery_upsert, gallery_remove
+from app.biometrics.liveness import analyze_burst
+from app.biometrics.executor import biometric_executor, BiometricBusyError, BiometricTimeoutError
+from app.biometrics.pipeline import extract_faces
+from app.biometrics.profiles import DetectionProfile, endpoint_profile
+from app.biometrics.quality import QUALITY_ERRORS
+from app.biometrics.tracking import FaceTracker
+from app.biometrics.templates import MAX_TEMPLATES_PER_USER, add_user_templates, load_user_templates, min_distance
+from app.services.audit import audit_log
+from app.services.hashing import password_hasher, HashingBusyError
+from app.services.metrics import FACE_TRACKING, QUALITY_GATE, STAGE_DURATION, observe_pipeline
+from app.services.user_cache import user_cache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# Ensure tables exist
-Base.metadata.create_all(bind=engine)
-
-# Create a demo user if DB is empty (only for first run / local tests)
-from sqlalchemy import select
-def _ensure_demo_user(db: Session):
-    try:
-        exists = db.execute(select(User).where(User.username == "ana.luiza")).scalar_one_or_none()
-        if not exists:
-            pwd_hash = pwd_context.hash("senha123")
-            db.add(User(username="ana.luiza", password_hash=pwd_hash, role="public", clearance=1))
-            db.commit()
-            print("✅ Usuário demo 'ana.luiza' criado")
-    except Exception as e:
-        print(f"⚠️ Erro ao criar usuário demo: {e}")
-        db.rollback()
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Schema e usuários padrão são criados no startup (app.services.startup)
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "change-me-in-prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+# Distância máxima aceita na identificação 1:N (tolerância padrão do face_recognition)
+IDENTIFY_THRESHOLD = float(os.getenv("IDENTIFY_THRESHOLD", "0.6"))
+
+# Threshold ajustado para distância euclidiana de encodings de 128 dimensões
+# Valores típicos: mesma pessoa = 0.4 a 15, pessoa diferente = 15+
+FACE_LOGIN_THRESHOLD = 20.0
+
+# Login por stream de frames (WebSocket /auth/login/stream)
+STREAM_LOGIN_DEADLINE = float(os.getenv("STREAM_LOGIN_DEADLINE", "10"))
+STREAM_FRAME_MAX_BYTES = int(os.getenv("STREAM_FRAME_MAX_BYTES", str(2 * 1024 * 1024)))
+
+# Frames por verificação com prova de vida (/auth/verify)
+LIVENESS_MAX_FRAMES = int(os.getenv("LIVENESS_MAX_FRAMES", "8"))
+
+# Perfis de detecção por endpoint (ver app.biometrics.profiles)
+LOGIN_PROFILE = endpoint_profile("login")
+IDENTIFY_PROFILE = endpoint_profile("identify")
+ENROLL_PROFILE = endpoint_profile("enroll")
+ENROLL_BATCH_PROFILE = endpoint_profile("enroll_batch")
+
 # Dependency para obter usuário atual do token JWT
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def create_access_token(user: User) -> str:
+    """
+    Gera o JWT com os claims de autorização (role, clearance e versão do
+    usuário), para que os endpoints não precisem consultar o banco.
+    """
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = {
+        "sub": user.username,
+        "uid": user.id,
+        "role": user.role,
+        "clearance": user.clearance,
+        "ver": user.token_version or 0,
+        "exp": expire,
+    }
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> dict:
     """
     Extrai e valida o token JWT, retornando os dados do usuário.
+    Role e clearance vêm do próprio token; a versão do token é conferida no
+    cache de usuários (o banco só é consultado quando o usuário não está no cache).
     """
     token = credentials.credentials
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token inválido"
-            )
-        
-        return {"username": username}
+        with STAGE_DURATION.time("token", "jwt_decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expirado"
         )
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Não foi possível validar as credenciais"
         )
+    
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido"
+        )
+    
+    if "ver" not in payload or "uid" not in payload or "clearance" not in payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token desatualizado. Faça login novamente."
+        )
+    
+    cached = user_cache.get(username)
+    if cached is None:
+        with STAGE_DURATION.time("token", "db_user"):
+            user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+        if user is None:
+            user_cache.mark_deleted(username, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Usuário não encontrado"
+            )
+        cached = user_cache.put(user)
+    
+    # O id distingue um usuário recriado com o mesmo username do que foi excluído
+    if cached.deleted or cached.id != payload["uid"] or cached.token_version != payload["ver"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revogado. Faça login novamente."
+        )
+    
+    return {
+        "username": username,
+        "user_id": payload.get("uid"),
+        "role": payload.get("role"),
+        "clearance": payload["clearance"]
+    }
+
+async def _extract_faces(image_bytes: bytes, profile: DetectionProfile, endpoint: str, roi: tuple = None) -> dict:
+    """
+    Detecção + encoding facial no pool biométrico (fora do event loop).
+    Traduz fila cheia e deadline estourado para respostas HTTP.
+    """
+    try:
+        start = time.perf_counter()
+        faces = await biometric_executor.run(extract_faces, image_bytes, profile, roi)
+        observe_pipeline(endpoint, faces, time.perf_counter() - start)
+        return faces
+    except BiometricBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado processando biometria. Tente novamente em instantes.",
+            headers={"Retry-After": "1"}
+        )
+    except BiometricTimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Tempo limite excedido no processamento facial"
+        )
+
+def _quality_rejection(faces: dict) -> Optional[str]:
+    """Código do problema se a imagem foi rejeitada pelo filtro de qualidade (antes da detecção)."""
+    quality = faces.get("quality")
+    return quality["error"] if quality and quality["rejected"] else None
+
+def _low_quality(code: str, status_code: int = status.HTTP_422_UNPROCESSABLE_ENTITY) -> HTTPException:
+    # O código (blurry, too_dark, ...) vai no header para o frontend orientar o usuário
+    return HTTPException(status_code=status_code, detail=QUALITY_ERRORS[code], headers={"X-Image-Quality": code})
+
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servidor ocupado. Tente novamente em instantes.",
+        headers={"Retry-After": "1"}
+    )
+
+async def _hash_password(password: str) -> str:
+    """bcrypt no executor dedicado de hashing (ver app.services.hashing)."""
+    try:
+        return await password_hasher.hash(password)
+    except HashingBusyError:
+        raise _hashing_busy()
 
 class LoginRequest(BaseModel):
     username: str
     password: str
 
 @router.post("/login")
-def login_user(body: LoginRequest, db: Session = Depends(get_db)):
+async def login_user(body: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
     """Authenticate user with JSON payload {username, password}. Returns JWT.
     This endpoint is JSON-based to match the current frontend implementation.
     """
     try:
         print(f"🔐 Tentativa de login: username={body.username}")
 
-        from sqlalchemy import select
-        user = db.execute(select(User).where(User.username == body.username)).scalar_one_or_none()
+        with STAGE_DURATION.time("login_password", "db_user"):
+            user = (await db.execute(select(User).where(User.username == body.username))).scalar_one_or_none()
         if not user:
             print(f"❌ Usuário não encontrado: {body.username}")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário não encontrado")
 
         print(f"✅ Usuário encontrado: {user.username}, verificando senha...")
-        if not pwd_context.verify(body.password, user.password_hash):
+        try:
+            with STAGE_DURATION.time("login_password", "password_verify"):
+                password_ok, new_hash = await password_hasher.verify(body.password, user.password_hash)
+        except HashingBusyError:
+            raise _hashing_busy()
+        if not password_ok:
             print(f"❌ Senha incorreta para: {body.username}")
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Senha incorreta")
 
+        if new_hash:
+            # Custo do bcrypt mudou desde o último hash: regravar com o custo atual
+            user.password_hash = new_hash
+            await db.commit()
+            print(f"🔑 Hash de senha atualizado para o custo atual: {user.username}")
+
         print(f"✅ Senha correta, gerando token...")
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        token = jwt.encode({"sub": user.username, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+        with STAGE_DURATION.time("login_password", "jwt_encode"):
+            token = create_access_token(user)
+        user_cache.put(user)
 
         print(f"✅ Login bem-sucedido: {user.username}")
+        audit_log.record("login_password", True, username=user.username, user_id=user.id,
+                         level_requested=user.clearance, request=request)
         return {
             "access_token": token,
             "token_type": "bearer",
@@ -107,10 +240,12 @@ def login_user(body: LoginRequest, db: Session = Depends(get_db)):
             "role": user.role,
             "clearance": user.clearance
         }
-    except HTTPException:
+    except HTTPException as e:
+        audit_log.record("login_password", False, username=body.username, request=request, detail=e.detail)
         raise
     except Exception as e:
         # Log server-side and return a clean message
+        audit_log.record("login_password", False, username=body.username, request=request, detail="Erro interno")
         print("❌ Erro interno no /auth/login:", repr(e))
         import traceback
         traceback.print_exc()
@@ -119,17 +254,26 @@ def login_user(body: LoginRequest, db: Session = Depends(get_db)):
 
 @router.post("/login/camera")
 async def login_by_camera(
+    request: Request,
     username: str = Form(...),
     image: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Login via reconhecimento facial usando câmera
     Usa face_recognition (dlib) para detecção e verificação facial
     """
+    return await _face_login(username, image, db, request, "login_camera")
+
+
+async def _face_login(username: str, image: UploadFile, db: AsyncSession, request: Request, action: str):
+    """Verificação 1:1 do rosto contra os templates do usuário (câmera e upload)."""
+    user = None
+    distance = None
     try:
         # Verificar se usuário existe
-        user = db.execute(select(User).where(User.username == username)).scalar_one_or_none()
+        with STAGE_DURATION.time(action, "db_user"):
+            user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -138,36 +282,33 @@ async def login_by_camera(
         
         print(f"🔍 Processando reconhecimento facial para usuário: {username}")
         
-        # Ler imagem e converter para RGB
-        image_bytes = await image.read()
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        # Converter para RGB se necessário
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-            print(f"🔄 Imagem convertida para RGB")
+        with STAGE_DURATION.time(action, "read_upload"):
+            image_bytes = await image.read()
         
-        img_array = np.array(img)
-        print(f"📐 Shape da imagem: {img_array.shape}")
+        # Carregar todos os templates do usuário (uma matriz n x 128)
+        with STAGE_DURATION.time(action, "db_templates"):
+            templates = await load_user_templates(db, user.id)
         
-        # Verificar se usuário tem biometria cadastrada
-        biometric = db.execute(
-            select(BiometricTemplate).where(BiometricTemplate.user_id == user.id)
-        ).scalar_one_or_none()
-        
-        if not biometric:
+        if templates is None:
             print(f"❌ Usuário {username} não possui biometria cadastrada")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Usuário não possui biometria cadastrada. Cadastre sua biometria primeiro."
             )
         
-        print(f"✅ Biometria encontrada para user_id={user.id}")
+        print(f"✅ {len(templates)} template(s) encontrado(s) para user_id={user.id}")
         
         # Usar face_recognition para detecção e comparação
         try:
-            # Detectar faces na imagem
-            face_locations = face_recognition.face_locations(img_array)
+            # Detectar faces e gerar encodings no pool biométrico
+            faces = await _extract_faces(image_bytes, LOGIN_PROFILE, action)
+            face_locations = faces["locations"]
+            print(f"📐 Shape da imagem: {faces['shape']} (perfil: {faces['profile']})")
+            
+            quality_error = _quality_rejection(faces)
+            if quality_error:
+                print(f"❌ Imagem rejeitada pelo filtro de qualidade: {quality_error}")
+                raise _low_quality(quality_error)
             
             if not face_locations or len(face_locations) == 0:
                 print(f"❌ Nenhuma face detectada na imagem")
@@ -178,8 +319,7 @@ async def login_by_camera(
             
             print(f"✅ {len(face_locations)} face(s) detectada(s)")
             
-            # Gerar encoding da face capturada
-            current_encodings = face_recognition.face_encodings(img_array, face_locations)
+            current_encodings = faces["encodings"]
             
             if not current_encodings or len(current_encodings) == 0:
                 raise HTTPException(
@@ -190,17 +330,13 @@ async def login_by_camera(
             current_encoding = current_encodings[0]
             print(f"🔐 Encoding gerado com sucesso! Tamanho: {len(current_encoding)}")
             
-            # Comparar com embedding salvo
-            saved_embedding = np.array(biometric.embedding)
-            
-            # Usar o método recomendado do face_recognition para comparação
+            # Comparar com todos os templates salvos de uma vez (menor distância)
             # face_recognition.compare_faces usa threshold interno de 0.6
             # Mas vamos calcular manualmente para ter mais controle
-            distance = np.linalg.norm(saved_embedding - current_encoding)
+            with STAGE_DURATION.time(action, "distance"):
+                distance = min_distance(templates, current_encoding)
             
-            # Threshold ajustado para distância euclidiana de encodings de 128 dimensões
-            # Valores típicos: mesma pessoa = 0.4 a 15, pessoa diferente = 15+
-            threshold = 20.0
+            threshold = FACE_LOGIN_THRESHOLD
             
             print(f"📊 Distância euclidiana: {distance:.4f} (threshold: {threshold})")
             
@@ -227,8 +363,11 @@ async def login_by_camera(
             )
         
         # Gerar token
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        token = jwt.encode({"sub": user.username, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+        with STAGE_DURATION.time(action, "jwt_encode"):
+            token = create_access_token(user)
+        user_cache.put(user)
+        audit_log.record(action, True, username=user.username, user_id=user.id, level_requested=user.clearance,
+                         request=request, distance=distance, confidence=confidence)
         
         return {
             "access_token": token,
@@ -241,9 +380,12 @@ async def login_by_camera(
             "faces_detected": faces_detected
         }
             
-    except HTTPException:
+    except HTTPException as e:
+        audit_log.record(action, False, username=username, user_id=user.id if user else None,
+                         request=request, distance=distance, detail=e.detail)
         raise
     except Exception as e:
+        audit_log.record(action, False, username=username, request=request, detail="Erro interno")
         print(f"❌ Erro no login por câmera: {e}")
         import traceback
         traceback.print_exc()
@@ -253,8 +395,234 @@ async def login_by_camera(
         )
 
 
+# ===============================================
+# LOGIN POR STREAM DE FRAMES (WEBSOCKET)
+# ===============================================
+
+class _LatestFrame:
+    """
+    Guarda só o frame mais recente: frames que chegam enquanto o anterior
+    ainda está no pool biométrico substituem o pendente (e são contados).
+    """
+
+    def __init__(self):
+        self.frame: Optional[bytes] = None
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def put(self, frame: bytes) -> None:
+        self.received += 1
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def take(self) -> Optional[bytes]:
+        """Próximo frame; ``None`` quando o cliente desconectou (e não há frame pendente)."""
+        if self.closed and self.frame is None:
+            # close() pode ter sinalizado junto com o último frame, já consumido
+            return None
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self.frame = self.frame, None
+        return frame
+
+
+def _decode_frame(message: dict) -> Optional[bytes]:
+    """Frame binário (JPEG/PNG) ou texto em base64 (aceita data URL)."""
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    text = message.get("text")
+    if not text:
+        return None
+    try:
+        return base64.b64decode(text.split(",")[-1], validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+async def _receive_frames(websocket: WebSocket, frames: _LatestFrame) -> None:
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            frame = _decode_frame(message)
+            if frame and len(frame) <= STREAM_FRAME_MAX_BYTES:
+                frames.put(frame)
+            else:
+                frames.dropped += 1
+    finally:
+        frames.close()
+
+
+@router.websocket("/login/stream")
+async def login_by_stream(websocket: WebSocket):
+    """
+    Login facial por stream de frames da câmera (uma sessão por conexão)
+
+    Protocolo:
+    1. cliente envia ``{"username": "..."}``; servidor responde ``{"type": "ready"}``
+       (ou ``{"type": "error"}``) depois de carregar os templates uma única vez
+    2. cliente envia frames (binário JPEG, ou base64/data URL em texto) no ritmo
+       da câmera; frames que chegam durante o processamento são descartados
+       e só o mais recente é analisado
+    3. a cada frame sem match o servidor envia ``{"type": "progress"}``; no primeiro
+       match envia ``{"type": "success", "access_token": ...}`` e fecha. Sem match até
+       ``STREAM_LOGIN_DEADLINE`` segundos envia ``{"type": "failure"}`` e fecha
+
+    Entre frames o rosto é rastreado (``FaceTracker``): o detector roda só na
+    região do rosto anterior; ``tracking`` na resposta traz as detecções evitadas.
+    """
+    action = "login_stream"
+    await websocket.accept()
+    username = None
+    user = None
+    best_distance = None
+    frames = _LatestFrame()
+    tracker = FaceTracker()
+    processed = 0
+    receiver = None
+
+    async def progress(reason: str, **extra):
+        if not frames.closed:
+            await websocket.send_json({"type": "progress", "frame": processed, "reason": reason, **extra})
+
+    try:
+        try:
+            hello = await asyncio.wait_for(websocket.receive_json(), timeout=STREAM_LOGIN_DEADLINE)
+            username = hello.get("username") if isinstance(hello, dict) else None
+        except (asyncio.TimeoutError, ValueError, KeyError):
+            username = None
+        if not username:
+            raise HTTPException(status_code=400, detail='Envie {"username": "..."} como primeira mensagem')
+
+        # Usuário e templates uma vez por sessão (conexão do pool devolvida antes dos frames)
+        async with AsyncSessionLocal() as db:
+            with STAGE_DURATION.time(action, "db_user"):
+                user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+            if not user:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário não encontrado")
+            with STAGE_DURATION.time(action, "db_templates"):
+                templates = await load_user_templates(db, user.id)
+        if templates is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Usuário não possui biometria cadastrada. Cadastre sua biometria primeiro."
+            )
+
+        print(f"🎥 Stream de login iniciado para {username} ({len(templates)} template(s))")
+        await websocket.send_json({"type": "ready", "templates": len(templates), "deadline_s": STREAM_LOGIN_DEADLINE})
+        receiver = asyncio.create_task(_receive_frames(websocket, frames))
+        deadline = time.monotonic() + STREAM_LOGIN_DEADLINE
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                frame = await asyncio.wait_for(frames.take(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if frame is None:
+                # Cliente desconectou
+                audit_log.record(action, False, username=username, user_id=user.id, request=websocket,
+                                 distance=best_distance,
+                                 detail=f"Cliente desconectou após {processed} frame(s)")
+                return
+
+            processed += 1
+            try:
+                faces = await _extract_faces(frame, LOGIN_PROFILE, action, roi=tracker.roi())
+            except HTTPException as e:
+                # Pool ocupado ou timeout: segue para o próximo frame
+                await progress("busy", detail=e.detail)
+                continue
+            tracker.update(faces)
+            FACE_TRACKING.inc(faces["detector"])
+
+            quality_error = _quality_rejection(faces)
+            if quality_error:
+                await progress("quality", code=quality_error, detail=QUALITY_ERRORS[quality_error])
+                continue
+            if not faces["encodings"]:
+                await progress("no_face", detector=faces["detector"])
+                continue
+
+            with STAGE_DURATION.time(action, "distance"):
+                distance = min_distance(templates, faces["encodings"][0])
+            best_distance = distance if best_distance is None else min(best_distance, distance)
+            if distance > FACE_LOGIN_THRESHOLD:
+                await progress("no_match", distance=round(distance, 4), detector=faces["detector"])
+                continue
+
+            confidence = max(0.0, 1.0 - (distance / FACE_LOGIN_THRESHOLD))
+            with STAGE_DURATION.time(action, "jwt_encode"):
+                token = create_access_token(user)
+            user_cache.put(user)
+            print(f"✅ Face reconhecida no frame {processed} (stream): {username}")
+            audit_log.record(action, True, username=user.username, user_id=user.id, level_requested=user.clearance,
+                             request=websocket, distance=distance, confidence=confidence,
+                             detail=f"frame {processed}, {frames.dropped} descartado(s)")
+            await websocket.send_json({
+                "type": "success",
+                "access_token": token,
+                "token_type": "bearer",
+                "username": user.username,
+                "role": user.role,
+                "clearance": user.clearance,
+                "confidence": confidence,
+                "method": "facial_recognition",
+                "faces_detected": len(faces["locations"]),
+                "frames_processed": processed,
+                "frames_dropped": frames.dropped,
+                "tracking": tracker.stats(),
+            })
+            await websocket.close()
+            return
+
+        detail = (f"Face não reconhecida em {STREAM_LOGIN_DEADLINE:.0f}s ({processed} frame(s) analisado(s), "
+                  f"{tracker.saved_detections} detecção(ões) na imagem inteira evitada(s))")
+        print(f"❌ {detail}: {username}")
+        audit_log.record(action, False, username=username, user_id=user.id, request=websocket,
+                         distance=best_distance, detail=detail)
+        if not frames.closed:
+            await websocket.send_json({"type": "failure", "detail": detail, "frames_processed": processed,
+                                       "frames_dropped": frames.dropped, "best_distance": best_distance,
+                                       "tracking": tracker.stats()})
+            await websocket.close()
+
+    except HTTPException as e:
+        audit_log.record(action, False, username=username, user_id=user.id if user else None,
+                         request=websocket, detail=e.detail)
+        await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+        await websocket.close()
+    except WebSocketDisconnect:
+        audit_log.record(action, False, username=username, user_id=user.id if user else None,
+                         request=websocket, distance=best_distance, detail="Cliente desconectou")
+    except Exception as e:
+        audit_log.record(action, False, username=username, request=websocket, detail="Erro interno")
+        print(f"❌ Erro no login por stream: {e}")
+        import traceback
+        traceback.print_exc()
+        try:
+            await websocket.send_json({"type": "error", "status": 500, "detail": f"Erro interno: {str(e)}"})
+            await websocket.close()
+        except Exception:
+            pass
+    finally:
+        if receiver is not None:
+            receiver.cancel()
+
+
 @router.post("/check-biometric")
-async def check_biometric(body: dict, db: Session = Depends(get_db)):
+async def check_biometric(body: dict, db: AsyncSession = Depends(get_db)):
     """
     Verifica se um usuário tem biometria cadastrada na tabela biometric_templates
     """
@@ -264,20 +632,21 @@ async def check_biometric(body: dict, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Username é obrigatório")
         
         from sqlalchemy import select
-        user = db.execute(select(User).where(User.username == username)).scalar_one_or_none()
+        user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
         
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
         
-        # Verificar se existe registro na tabela biometric_templates
-        biometric = db.execute(
-            select(BiometricTemplate).where(BiometricTemplate.user_id == user.id)
-        ).scalar_one_or_none()
+        # Verificar se existe centróide (ou seja, ao menos um template cadastrado)
+        template_count = (await db.execute(
+            select(BiometricCentroid.template_count).where(BiometricCentroid.user_id == user.id)
+        )).scalar_one_or_none()
         
-        has_biometric = biometric is not None
+        has_biometric = template_count is not None
         
         return {
             "has_biometric": has_biometric,
+            "templates": template_count or 0,
             "message": "Biometria cadastrada" if has_biometric else "Biometria não cadastrada"
         }
     except HTTPException:
@@ -289,35 +658,297 @@ async def check_biometric(body: dict, db: Session = Depends(get_db)):
 
 @router.post("/login/upload")
 async def login_by_upload(
+    request: Request,
     username: str = Form(...),
     image: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Login via upload de imagem facial
     Similar ao login/camera, mas para imagens enviadas
     """
     # Reutilizar a mesma lógica do login por câmera
-    return await login_by_camera(username, image, db)
+    return await _face_login(username, image, db, request, "login_upload")
+
+
+# ===============================================
+# VERIFICAÇÃO COM PROVA DE VIDA (LIVENESS)
+# ===============================================
+
+class VerifyRequest(BaseModel):
+    """
+    Rajada de frames em base64 (ou data URL). Aceita ``frames`` ou os
+    formatos do frontend: ``image_b64_a``/``image_b64_b`` (LivenessCapture) e
+    ``email``/``image`` (verify-biometric, o usuário é a parte antes do @).
+    """
+    username: Optional[str] = None
+    email: Optional[str] = None
+    frames: Optional[List[str]] = None
+    image_b64_a: Optional[str] = None
+    image_b64_b: Optional[str] = None
+    image_b64: Optional[str] = None
+    image: Optional[str] = None
+    image_format: Optional[str] = None
+
+    def frame_list(self) -> List[str]:
+        if self.frames:
+            return self.frames
+        return [f for f in (self.image_b64_a, self.image_b64_b, self.image_b64, self.image) if f]
+
+    def login(self) -> Optional[str]:
+        if self.username:
+            return self.username
+        return self.email.split("@")[0] if self.email else None
+
+
+LIVENESS_FAILURES = {
+    "identity": "Face não reconhecida. Identidade não corresponde ao usuário.",
+    "no_face": "Rosto não encontrado em frames suficientes para a prova de vida.",
+    "not_live": "Prova de vida falhou: pisque ou mova levemente o rosto durante a captura.",
+}
+
+
+@router.post("/verify")
+@router.post("/verify-biometric")
+async def verify_with_liveness(body: VerifyRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Login facial com prova de vida: 2 a ``LIVENESS_MAX_FRAMES`` frames da câmera
+    Uma tarefa no pool biométrico analisa os frames em sequência e para assim que a
+    decisão é certa (ver app.biometrics.liveness)
+    """
+    action = "verify_liveness"
+    username = body.login()
+    user = None
+    distance = None
+    try:
+        if not username:
+            raise HTTPException(status_code=400, detail="Username é obrigatório")
+        encoded = body.frame_list()
+        if len(encoded) < 2:
+            raise HTTPException(status_code=400, detail="Envie ao menos 2 frames para a prova de vida")
+        if len(encoded) > LIVENESS_MAX_FRAMES:
+            raise HTTPException(status_code=400, detail=f"Máximo de {LIVENESS_MAX_FRAMES} frames por verificação")
+        try:
+            frames = [base64.b64decode(f.split(",")[-1], validate=True) for f in encoded]
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=400, detail="Frame em base64 inválido")
+
+        with STAGE_DURATION.time(action, "db_user"):
+            user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário não encontrado")
+        with STAGE_DURATION.time(action, "db_templates"):
+            templates = await load_user_templates(db, user.id)
+        if templates is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Usuário não possui biometria cadastrada. Cadastre sua biometria primeiro."
+            )
+
+        try:
+            start = time.perf_counter()
+            result = await biometric_executor.run(analyze_burst, frames, templates, LOGIN_PROFILE, FACE_LOGIN_THRESHOLD)
+            observe_pipeline(action, result, time.perf_counter() - start)
+        except BiometricBusyError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado processando biometria. Tente novamente em instantes.",
+                headers={"Retry-After": "1"}
+            )
+        except BiometricTimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Tempo limite excedido no processamento facial"
+            )
+
+        for code, count in result["quality_rejected"].items():
+            QUALITY_GATE.inc(action, code, "true", amount=count)
+        distance = result["distance"]
+        liveness = {key: result[key] for key in ("decision", "signals", "frames_total", "frames_analyzed", "faces_found",
+                                                 "quality_rejected")}
+        print(f"🧬 Prova de vida de {username}: {result['decision']} "
+              f"({result['frames_analyzed']}/{result['frames_total']} frame(s)) {result['signals']}")
+        if result["decision"] == "quality":
+            raise _low_quality(result["quality_error"])
+        if result["decision"] != "live":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=LIVENESS_FAILURES[result["decision"]])
+
+        confidence = max(0.0, 1.0 - (distance / FACE_LOGIN_THRESHOLD))
+        with STAGE_DURATION.time(action, "jwt_encode"):
+            token = create_access_token(user)
+        user_cache.put(user)
+        audit_log.record(action, True, username=user.username, user_id=user.id, level_requested=user.clearance,
+                         request=request, distance=distance, confidence=confidence,
+                         detail=f"{result['frames_analyzed']}/{result['frames_total']} frame(s)")
+        return {
+            "access_token": token,
+            "token_type": "bearer",
+            "username": user.username,
+            "role": user.role,
+            "clearance": user.clearance,
+            "confidence": confidence,
+            "method": "facial_recognition_liveness",
+            "liveness": liveness,
+        }
+
+    except HTTPException as e:
+        audit_log.record(action, False, username=username, user_id=user.id if user else None,
+                         request=request, distance=distance, detail=e.detail)
+        raise
+    except Exception as e:
+        audit_log.record(action, False, username=username, request=request, detail="Erro interno")
+        print(f"❌ Erro na verificação com prova de vida: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@router.post("/identify")
+async def identify_by_camera(
+    request: Request,
+    image: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Identificação 1:N via reconhecimento facial (sem username)
+    Compara o rosto capturado com todos os templates da galeria em memória
+    """
+    distance = None
+    try:
+        with STAGE_DURATION.time("identify", "read_upload"):
+            image_bytes = await image.read()
+        faces = await _extract_faces(image_bytes, IDENTIFY_PROFILE, "identify")
+        
+        quality_error = _quality_rejection(faces)
+        if quality_error:
+            raise _low_quality(quality_error)
+        
+        face_locations = faces["locations"]
+        if not face_locations:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Nenhuma face detectada na imagem. Use uma foto clara com seu rosto visível."
+            )
+        
+        current_encodings = faces["encodings"]
+        if not current_encodings:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Não foi possível processar a face detectada"
+            )
+        
+        with STAGE_DURATION.time("identify", "gallery_search"):
+            matches = (await get_gallery(db)).search(current_encodings[0], k=1)
+        if not matches:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Nenhuma biometria cadastrada"
+            )
+        
+        user_id, distance = matches[0]
+        print(f"📊 Identificação 1:N: user_id={user_id}, distância={distance:.4f} (threshold: {IDENTIFY_THRESHOLD})")
+        
+        if distance > IDENTIFY_THRESHOLD:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Face não reconhecida"
+            )
+        
+        with STAGE_DURATION.time("identify", "db_user"):
+            user = await db.get(User, user_id)
+        if not user:
+            # Template órfão: usuário removido por outro processo
+            await gallery_remove(user_id)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Face não reconhecida"
+            )
+        
+        token = create_access_token(user)
+        user_cache.put(user)
+        
+        print(f"✅ Usuário identificado: {user.username}")
+        confidence = max(0.0, 1.0 - (distance / IDENTIFY_THRESHOLD))
+        audit_log.record("identify", True, username=user.username, user_id=user.id, level_requested=user.clearance,
+                         request=request, distance=distance, confidence=confidence)
+        return {
+            "access_token": token,
+            "token_type": "bearer",
+            "username": user.username,
+            "role": user.role,
+            "clearance": user.clearance,
+            "confidence": confidence,
+            "distance": distance,
+            "method": "facial_identification",
+            "faces_detected": len(face_locations)
+        }
+    
+    except HTTPException as e:
+        audit_log.record("identify", False, request=request, distance=distance, detail=e.detail)
+        raise
+    except Exception as e:
+        audit_log.record("identify", False, request=request, detail="Erro interno")
+        print(f"❌ Erro na identificação facial: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro interno: {str(e)}"
+        )
+
+
+def _single_face_encoding(faces: dict):
+    """Valida que a imagem tem exatamente um rosto e devolve o seu encoding."""
+    quality_error = _quality_rejection(faces)
+    if quality_error:
+        raise _low_quality(quality_error, status_code=400)
+    
+    if not faces["locations"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Nenhum rosto detectado na imagem. Use uma foto clara com seu rosto visível."
+        )
+    
+    if len(faces["locations"]) > 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Múltiplos rostos detectados. Use uma foto com apenas um rosto."
+        )
+    
+    if not faces["encodings"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Não foi possível processar a face detectada. Tente outra foto."
+        )
+    
+    return faces["encodings"][0]
 
 
 @router.post("/enroll-upload")
 async def enroll_biometric(
+    request: Request,
     username: str = Form(...),
-    image: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    image: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Cadastro de biometria facial via upload de imagem
+    Aceita várias imagens (campo "image" repetido); cada rosto vira um template
     Usa face_recognition (dlib) para encoding facial
     """
     print(f"🔍 Recebendo requisição de cadastro para: {username}")
-    print(f"📁 Arquivo: {image.filename}, Content-Type: {image.content_type}")
+    print(f"📁 Arquivo(s): {[(f.filename, f.content_type) for f in image]}")
+    
+    if len(image) > MAX_TEMPLATES_PER_USER:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Envie no máximo {MAX_TEMPLATES_PER_USER} imagens por cadastro"
+        )
     
     try:
         # Verificar se usuário existe
-        from sqlalchemy import select
-        user = db.execute(select(User).where(User.username == username)).scalar_one_or_none()
+        with STAGE_DURATION.time("enroll", "db_user"):
+            user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
         
         if not user:
             print(f"❌ Usuário {username} não encontrado no banco")
@@ -325,86 +956,55 @@ async def enroll_biometric(
         
         print(f"✅ Usuário {username} encontrado (ID: {user.id})")
         
-        # Ler e validar imagem
-        contents = await image.read()
-        print(f"📦 Tamanho da imagem: {len(contents)} bytes")
-        
-        img = Image.open(io.BytesIO(contents))
-        print(f"🖼️ Imagem carregada: {img.size}, modo: {img.mode}")
-        
-        # Converter para RGB se necessário
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-            print(f"🔄 Imagem convertida para RGB")
-        
-        # Converter para numpy array
-        img_array = np.array(img)
-        print(f"📐 Array shape: {img_array.shape}")
+        # Ler imagens
+        with STAGE_DURATION.time("enroll", "read_upload"):
+            frames = [await f.read() for f in image]
+        print(f"📦 Tamanho da(s) imagem(ns): {[len(c) for c in frames]} bytes")
         
         print(f"🔐 Processando cadastro de biometria para {username}...")
         
-        # Detectar faces usando face_recognition
-        print(f"🔍 Detectando faces...")
-        face_locations = face_recognition.face_locations(img_array)
-        print(f"📍 {len(face_locations)} face(s) detectada(s)")
+        # Detectar faces e gerar encodings no pool biométrico (frames em paralelo)
+        results = await asyncio.gather(*(_extract_faces(c, ENROLL_PROFILE, "enroll") for c in frames))
         
-        if not face_locations or len(face_locations) == 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Nenhum rosto detectado na imagem. Use uma foto clara com seu rosto visível."
-            )
+        embeddings, rejected = [], []
+        for i, faces in enumerate(results, 1):
+            print(f"📍 Imagem {i}: {len(faces['locations'])} face(s) detectada(s) (perfil: {faces['profile']})")
+            try:
+                embeddings.append(_single_face_encoding(faces))
+            except HTTPException as e:
+                rejected.append({"image": i, "detail": e.detail, "quality": _quality_rejection(faces)})
         
-        if len(face_locations) > 1:
-            raise HTTPException(
-                status_code=400,
-                detail="Múltiplos rostos detectados. Use uma foto com apenas um rosto."
-            )
-        
-        print(f"✅ Face detectada! Gerando encoding...")
-        
-        # Gerar encoding da face
-        face_encodings = face_recognition.face_encodings(img_array, face_locations)
-        
-        if not face_encodings or len(face_encodings) == 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Não foi possível processar a face detectada. Tente outra foto."
-            )
+        if not embeddings:
+            # Nenhuma imagem válida: devolve o motivo da primeira
+            if rejected[0]["quality"]:
+                raise _low_quality(rejected[0]["quality"], status_code=400)
+            raise HTTPException(status_code=400, detail=rejected[0]["detail"])
         
-        embedding = face_encodings[0].tolist()  # Converter para lista para salvar no banco
-        print(f"✅ Encoding gerado! Tamanho: {len(embedding)}")
+        with STAGE_DURATION.time("enroll", "db_write"):
+            centroid, template_count = await add_user_templates(db, user.id, embeddings)
+            await db.commit()
+        print(f"✅ Biometria cadastrada para {username}: {len(embeddings)} novo(s), {template_count} template(s) no total")
         
-        # Verificar se já existe biometria cadastrada
-        from sqlalchemy import select
-        existing_biometric = db.execute(
-            select(BiometricTemplate).where(BiometricTemplate.user_id == user.id)
-        ).scalar_one_or_none()
-        
-        if existing_biometric:
-            # Atualizar embedding existente
-            existing_biometric.embedding = embedding
-            print(f"🔄 Biometria atualizada para {username}")
-        else:
-            # Criar novo registro
-            new_biometric = BiometricTemplate(
-                user_id=user.id,
-                embedding=embedding
-            )
-            db.add(new_biometric)
-            print(f"✅ Biometria cadastrada para {username}")
-        
-        db.commit()
+        # Manter a galeria 1:N sincronizada (se ainda não carregada, lerá do banco)
+        await gallery_upsert(user.id, centroid)
+        audit_log.record("enroll", True, username=username, user_id=user.id, request=request,
+                         detail=f"{len(embeddings)} template(s) novo(s), {len(rejected)} imagem(ns) rejeitada(s)")
         
         return {
             "success": True,
             "message": "Biometria cadastrada com sucesso!",
             "username": username,
-            "face_detected": True
+            "face_detected": True,
+            "templates_added": len(embeddings),
+            "templates_total": template_count,
+            "rejected_images": rejected
         }
             
-    except HTTPException:
+    except HTTPException as e:
+        audit_log.record("enroll", False, username=username, request=request, detail=e.detail)
         raise
     except Exception as e:
+        audit_log.record("enroll", False, username=username, request=request, detail="Erro interno")
         print(f"❌ Erro no cadastro de biometria para {username}: {e}")
         import traceback
         traceback.print_exc()
@@ -414,10 +1014,68 @@ async def enroll_biometric(
         )
 
 
+@router.post("/enroll-batch")
+async def enroll_batch(
+    request: Request,
+    archive: Optional[UploadFile] = File(None),
+    images: List[UploadFile] = File(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Cadastro de biometria em lote
+    Aceita um zip (campo "archive") ou várias imagens (campo "images"); o
+    username vem do nome do arquivo (``<username>.jpg``) ou da pasta
+    (``<username>/foto.jpg``). Responde em NDJSON, uma linha por imagem
+    assim que é processada e uma linha final com o resumo.
+    Requer autenticação
+    """
+    if archive is not None:
+        try:
+            items = iter_zip_items(zipfile.ZipFile(archive.file))
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Arquivo zip inválido")
+    elif images:
+        items = [
+            (username_from_path(f.filename or ""), f.filename, f.file.read)
+            for f in images
+        ]
+        items = [item for item in items if item[0]]
+    else:
+        raise HTTPException(status_code=400, detail="Envie um zip (archive) ou imagens (images)")
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="Nenhuma imagem encontrada no lote")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Lote excede o limite de {BATCH_MAX_ITEMS} imagens"
+        )
+    
+    print(f"📦 Cadastro em lote de {len(items)} imagem(ns) por {current_user['username']}")
+    
+    async def ndjson():
+        async for result in run_batch(items, ENROLL_BATCH_PROFILE):
+            if "summary" in result:
+                summary = result["summary"]
+                audit_log.record("enroll_batch", summary["error"] == 0, username=current_user["username"],
+                                 user_id=current_user["user_id"], request=request,
+                                 detail=f"{summary['enrolled']}/{summary['total']} cadastrada(s), "
+                                        f"{summary['rejected']} rejeitada(s), {summary['error']} erro(s)")
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 # ===============================================
 # ENDPOINTS DE CADASTRO DE USUÁRIOS
 # ===============================================
 
+
+def _audit_admin(action: str, current_user: dict, request: Request, success: bool, detail: str) -> None:
+    """Auditoria das ações administrativas: o usuário do evento é quem executou a ação."""
+    audit_log.record(action, success, username=current_user["username"], user_id=current_user["user_id"],
+                     request=request, detail=detail)
+
 class RegisterUserRequest(BaseModel):
     username: str
     password: str
@@ -425,9 +1083,10 @@ class RegisterUserRequest(BaseModel):
     clearance: int = 1  # 1, 2, ou 3
 
 @router.post("/register")
-def register_user(
+async def register_user(
     body: RegisterUserRequest,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -438,9 +1097,9 @@ def register_user(
         print(f"👤 Cadastro de novo usuário: {body.username} por {current_user['username']}")
         
         # Verificar se usuário já existe
-        existing_user = db.execute(
+        existing_user = (await db.execute(
             select(User).where(User.username == body.username)
-        ).scalar_one_or_none()
+        )).scalar_one_or_none()
         
         if existing_user:
             raise HTTPException(
@@ -456,29 +1115,36 @@ def register_user(
             )
         
         # Validar role
-        valid_roles = ["public", "director", "minister"]
-        if body.role not in valid_roles:
+        if body.role not in VALID_ROLES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Role deve ser um de: {', '.join(valid_roles)}"
+                detail=f"Role deve ser um de: {', '.join(VALID_ROLES)}"
             )
         
         # Criar hash da senha
-        password_hash = pwd_context.hash(body.password)
+        password_hash = await _hash_password(body.password)
+        
+        # Username já excluído antes: continua da versão registrada na exclusão,
+        # para que nenhum token do usuário antigo volte a valer
+        tombstone = await db.get(UserTombstone, body.username)
         
         # Criar novo usuário
         new_user = User(
             username=body.username,
             password_hash=password_hash,
             role=body.role,
-            clearance=body.clearance
+            clearance=body.clearance,
+            token_version=tombstone.token_version if tombstone else 0
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+        user_cache.put(new_user)
         
         print(f"✅ Usuário '{body.username}' criado com sucesso!")
+        _audit_admin("register_user", current_user, request, True,
+                     f"{body.username} (role={body.role}, clearance={body.clearance})")
         
         return {
             "message": "Usuário cadastrado com sucesso",
@@ -490,11 +1156,13 @@ def register_user(
             }
         }
         
-    except HTTPException:
+    except HTTPException as e:
+        _audit_admin("register_user", current_user, request, False, f"{body.username}: {e.detail}")
         raise
     except Exception as e:
+        _audit_admin("register_user", current_user, request, False, f"{body.username}: Erro interno")
         print(f"❌ Erro ao cadastrar usuário: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao cadastrar usuário: {str(e)}"
@@ -502,8 +1170,8 @@ def register_user(
 
 
 @router.get("/users")
-def list_users(
-    db: Session = Depends(get_db),
+async def list_users(
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -511,7 +1179,7 @@ def list_users(
     Requer autenticação
     """
     try:
-        users = db.execute(select(User)).scalars().all()
+        users = (await db.execute(select(User))).scalars().all()
         
         return {
             "total": len(users),
@@ -534,9 +1202,10 @@ def list_users(
 
 
 @router.delete("/users/{username}")
-def delete_user(
+async def delete_user(
     username: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -553,9 +1222,9 @@ def delete_user(
             )
         
         # Buscar usuário
-        user = db.execute(
+        user = (await db.execute(
             select(User).where(User.username == username)
-        ).scalar_one_or_none()
+        )).scalar_one_or_none()
         
         if not user:
             raise HTTPException(
@@ -564,28 +1233,39 @@ def delete_user(
             )
         
         # Deletar biometrias associadas
-        biometrics = db.execute(
+        biometrics = (await db.execute(
             select(BiometricTemplate).where(BiometricTemplate.user_id == user.id)
-        ).scalars().all()
+        )).scalars().all()
         
         for bio in biometrics:
-            db.delete(bio)
+            await db.delete(bio)
+        
+        centroid = await db.get(BiometricCentroid, user.id)
+        if centroid:
+            await db.delete(centroid)
         
-        # Deletar usuário
-        db.delete(user)
-        db.commit()
+        # Deletar usuário, guardando a próxima versão do username (nunca reutilizada)
+        await db.merge(UserTombstone(username=username, token_version=(user.token_version or 0) + 1))
+        await db.delete(user)
+        await db.commit()
+        await gallery_remove(user.id)
+        # Revoga imediatamente os tokens do usuário neste processo
+        user_cache.mark_deleted(username, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
         
         print(f"✅ Usuário '{username}' deletado com sucesso!")
+        _audit_admin("delete_user", current_user, request, True, username)
         
         return {
             "message": f"Usuário '{username}' deletado com sucesso"
         }
         
-    except HTTPException:
+    except HTTPException as e:
+        _audit_admin("delete_user", current_user, request, False, f"{username}: {e.detail}")
         raise
     except Exception as e:
+        _audit_admin("delete_user", current_user, request, False, f"{username}: Erro interno")
         print(f"❌ Erro ao deletar usuário: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao deletar usuário: {str(e)}"
@@ -597,10 +1277,11 @@ class ResetPasswordRequest(BaseModel):
 
 
 @router.put("/users/{username}/reset-password")
-def reset_user_password(
+async def reset_user_password(
     username: str,
     body: ResetPasswordRequest,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -609,9 +1290,9 @@ def reset_user_password(
     """
     try:
         # Buscar usuário
-        user = db.execute(
+        user = (await db.execute(
             select(User).where(User.username == username)
-        ).scalar_one_or_none()
+        )).scalar_one_or_none()
         
         if not user:
             raise HTTPException(
@@ -620,25 +1301,101 @@ def reset_user_password(
             )
         
         # Criar hash da nova senha
-        new_password_hash = pwd_context.hash(body.new_password)
+        new_password_hash = await _hash_password(body.new_password)
         
-        # Atualizar senha
+        # Atualizar senha e revogar os tokens emitidos antes do reset
         user.password_hash = new_password_hash
-        db.commit()
+        user.token_version = (user.token_version or 0) + 1
+        await db.commit()
+        user_cache.put(user)
         
         print(f"✅ Senha do usuário '{username}' resetada com sucesso!")
+        _audit_admin("reset_password", current_user, request, True, username)
         
         return {
             "message": f"Senha do usuário '{username}' resetada com sucesso",
             "username": username
         }
         
-    except HTTPException:
+    except HTTPException as e:
+        _audit_admin("reset_password", current_user, request, False, f"{username}: {e.detail}")
         raise
     except Exception as e:
+        _audit_admin("reset_password", current_user, request, False, f"{username}: Erro interno")
         print(f"❌ Erro ao deletar usuário: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao deletar usuário: {str(e)}"
         )
+
+
+
+class UpdateAccessRequest(BaseModel):
+    role: str
+    clearance: int
+
+
+@router.put("/users/{username}/access")
+async def update_user_access(
+    username: str,
+    body: UpdateAccessRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Alterar role/clearance de um usuário
+    Requer autenticação; tokens emitidos antes da alteração são revogados
+    """
+    try:
+        if body.clearance not in [1, 2, 3]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Clearance deve ser 1, 2 ou 3"
+            )
+        
+        if body.role not in VALID_ROLES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Role deve ser um de: {', '.join(VALID_ROLES)}"
+            )
+        
+        user = (await db.execute(
+            select(User).where(User.username == username)
+        )).scalar_one_or_none()
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Usuário '{username}' não encontrado"
+            )
+        
+        user.role = body.role
+        user.clearance = body.clearance
+        user.token_version = (user.token_version or 0) + 1
+        await db.commit()
+        user_cache.put(user)
+        
+        print(f"✅ Acesso do usuário '{username}' alterado: role={body.role}, clearance={body.clearance}")
+        _audit_admin("update_access", current_user, request, True,
+                     f"{username} (role={body.role}, clearance={body.clearance})")
+        
+        return {
+            "message": f"Acesso do usuário '{username}' atualizado com sucesso",
+            "username": username,
+            "role": user.role,
+            "clearance": user.clearance
+        }
+        
+    except HTTPException as e:
+        _audit_admin("update_access", current_user, request, False, f"{username}: {e.detail}")
+        raise
+    except Exception as e:
+        _audit_admin("update_access", current_user, request, False, f"{username}: Erro interno")
+        print(f"❌ Erro ao alterar acesso do usuário: {e}")
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao alterar acesso do usuário: {str(e)}"
+        )
@@ -1,8 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.config import get_db
-from app.models.user import User
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from app.routers.auth import get_current_user
+from app.services.audit import audit_log
 
 router = APIRouter(prefix="/data", tags=["data"])
 
@@ -13,22 +11,20 @@ def ping():
 @router.get("/level/{level}")
 async def get_level_data(
     level: int,
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Retorna dados do nível de acesso especificado.
     Usuário precisa ter clearance >= level para acessar.
     """
-    # Buscar usuário no banco para obter clearance
-    from sqlalchemy import select
-    user = db.execute(select(User).where(User.username == current_user["username"])).scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    # Clearance vem do token (sem consulta ao banco)
+    clearance = current_user["clearance"]
     
     # Verificar permissão
-    if user.clearance < level:
+    if clearance < level:
+        audit_log.record("data_access", False, username=current_user["username"], user_id=current_user["user_id"],
+                         level_requested=level, request=request, detail="Clearance insuficiente")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Acesso negado. Você precisa de clearance nível {level} ou superior."
@@ -71,9 +67,12 @@ async def get_level_data(
     if level not in data_by_level:
         raise HTTPException(status_code=404, detail="Nível não encontrado")
     
+    audit_log.record("data_access", True, username=current_user["username"], user_id=current_user["user_id"],
+                     level_requested=level, request=request)
+    
     return {
         "success": True,
-        "user_clearance": user.clearance,
+        "user_clearance": clearance,
         "requested_level": level,
         "data": data_by_level[level]
     }
@@ -1,7 +1,300 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+
+from app.config import get_db
+from app.models.audit_event import AuditEvent
+from app.models.report_rollup import AuditHourly, DistanceHistogram, LatencyHistogram
+from app.routers.auth import get_current_user
+from app.services.audit import audit_log
+from app.services.profiler import PROFILE_MODES, request_profiler
+from app.services.rollups import distance_bucket_range, histogram_percentile
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+AUDIT_MAX_LIMIT = 500
+# Janela máxima dos relatórios agregados (horas)
+ROLLUP_MAX_HOURS = 24 * 90
+
+LOGIN_ACTIONS = ("login_password", "login_camera", "login_upload", "identify")
+
 @router.get("/status")
-def status():
-    return {"ok": True}
+def status_check():
+    return {"ok": True, "audit": audit_log.stats()}
+
+
+def _parse_date(value: str, end: bool = False) -> datetime:
+    """Data ISO (``2024-05-01`` ou com horário); ``end`` torna uma data sem horário inclusiva."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Data inválida: {value}")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _require_clearance3(current_user: dict) -> None:
+    if current_user["clearance"] < 3:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Relatórios exigem clearance nível 3."
+        )
+
+
+def _window_start(hours: int) -> datetime:
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return now - timedelta(hours=hours - 1)
+
+
+@router.get("/audit")
+async def list_audit_events(
+    limit: int = Query(50, ge=1, le=AUDIT_MAX_LIMIT),
+    cursor: Optional[int] = Query(None, description="next_cursor da página anterior"),
+    page: int = Query(1, ge=1, description="Paginação por offset (ignorada quando há cursor)"),
+    include_total: Optional[bool] = Query(None, description="Conta o total (padrão: só sem cursor)"),
+    user: Optional[str] = None,
+    action: Optional[str] = None,
+    success: Optional[bool] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Trilha de auditoria (apenas clearance 3), do evento mais recente para o mais antigo
+    Paginação keyset: passe o ``next_cursor`` da resposta em ``cursor`` para a próxima página
+    ``total`` é contado só sem ``cursor`` (ou com ``include_total=true``); nas páginas
+    seguintes vem ``null``, porque o COUNT varre a trilha inteira
+    """
+    _require_clearance3(current_user)
+
+    filters = []
+    if user:
+        filters.append(AuditEvent.username == user)
+    if action:
+        filters.append(AuditEvent.action == action)
+    if success is not None:
+        filters.append(AuditEvent.success == success)
+    if start_date:
+        filters.append(AuditEvent.ts >= _parse_date(start_date))
+    if end_date:
+        filters.append(AuditEvent.ts < _parse_date(end_date, end=True))
+
+    try:
+        query = select(AuditEvent).where(*filters).order_by(AuditEvent.id.desc()).limit(limit + 1)
+        if cursor is not None:
+            # Keyset: custo constante em qualquer página (usa os índices (username|action, id))
+            query = query.where(AuditEvent.id < cursor)
+        elif page > 1:
+            query = query.offset((page - 1) * limit)
+        events = (await db.execute(query)).scalars().all()
+        total = None
+        if include_total if include_total is not None else cursor is None:
+            total = (await db.execute(select(func.count(AuditEvent.id)).where(*filters))).scalar_one()
+
+        has_more = len(events) > limit
+        events = events[:limit]
+        return {
+            "logs": [
+                {
+                    "id": event.id,
+                    "user": event.username or "-",
+                    "action": event.action,
+                    "level_requested": event.level_requested or 0,
+                    "success": event.success,
+                    "origin_ip": event.origin_ip,
+                    "ts": event.ts.isoformat(),
+                    "distance": event.distance,
+                    "confidence": event.confidence,
+                    "detail": event.detail,
+                }
+                for event in events
+            ],
+            "total": total,
+            "next_cursor": events[-1].id if has_more else None,
+        }
+    except Exception as e:
+        print(f"❌ Erro ao listar auditoria: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao listar auditoria")
+
+
+# ===============================================
+# RELATÓRIOS AGREGADOS (app.services.rollups)
+# ===============================================
+
+@router.get("/logins")
+async def login_report(
+    hours: int = Query(24, ge=1, le=ROLLUP_MAX_HOURS),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Logins por hora e taxa de sucesso por método na janela das últimas ``hours`` horas
+    Lido dos agregados por hora: não varre a trilha de auditoria
+    """
+    _require_clearance3(current_user)
+    try:
+        rows = (await db.execute(
+            select(AuditHourly.hour, AuditHourly.action, AuditHourly.success, AuditHourly.count)
+            .where(AuditHourly.hour >= _window_start(hours), AuditHourly.action.in_(LOGIN_ACTIONS))
+            .order_by(AuditHourly.hour)
+        )).all()
+
+        by_hour, by_method = {}, {action: {"success": 0, "failure": 0} for action in LOGIN_ACTIONS}
+        for hour, action, success, count in rows:
+            key = "success" if success else "failure"
+            bucket = by_hour.setdefault(hour.isoformat(), {"hour": hour.isoformat(), "success": 0, "failure": 0})
+            bucket[key] += count
+            by_method[action][key] += count
+
+        methods = []
+        for action, counts in by_method.items():
+            total = counts["success"] + counts["failure"]
+            methods.append({
+                "method": action,
+                **counts,
+                "total": total,
+                "success_rate": round(counts["success"] / total, 4) if total else None,
+            })
+        return {
+            "hours": hours,
+            "by_hour": [{**b, "total": b["success"] + b["failure"]} for b in by_hour.values()],
+            "by_method": methods,
+        }
+    except Exception as e:
+        print(f"❌ Erro no relatório de logins: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao gerar relatório de logins")
+
+
+@router.get("/distances")
+async def distance_report(
+    hours: int = Query(24, ge=1, le=ROLLUP_MAX_HOURS),
+    action: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Histograma das distâncias biométricas (login facial e identificação) na janela"""
+    _require_clearance3(current_user)
+    try:
+        query = (
+            select(DistanceHistogram.bucket, func.sum(DistanceHistogram.count))
+            .where(DistanceHistogram.hour >= _window_start(hours))
+            .group_by(DistanceHistogram.bucket)
+            .order_by(DistanceHistogram.bucket)
+        )
+        if action:
+            query = query.where(DistanceHistogram.action == action)
+        buckets = []
+        for bucket, count in (await db.execute(query)).all():
+            lower, upper = distance_bucket_range(bucket)
+            buckets.append({"min": lower, "max": upper, "count": int(count)})
+        return {"hours": hours, "action": action, "total": sum(b["count"] for b in buckets), "buckets": buckets}
+    except Exception as e:
+        print(f"❌ Erro no relatório de distâncias: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao gerar relatório de distâncias")
+
+
+@router.get("/latency")
+async def latency_report(
+    hours: int = Query(24, ge=1, le=ROLLUP_MAX_HOURS),
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Latência por endpoint (p50/p95 estimados do histograma) na janela"""
+    _require_clearance3(current_user)
+    try:
+        rows = (await db.execute(
+            select(
+                LatencyHistogram.endpoint,
+                LatencyHistogram.bucket,
+                func.sum(LatencyHistogram.count),
+                func.sum(LatencyHistogram.total_ms),
+            )
+            .where(LatencyHistogram.hour >= _window_start(hours))
+            .group_by(LatencyHistogram.endpoint, LatencyHistogram.bucket)
+        )).all()
+
+        endpoints = {}
+        for endpoint, bucket, count, total_ms in rows:
+            entry = endpoints.setdefault(endpoint, {"counts": {}, "total_ms": 0.0})
+            entry["counts"][bucket] = int(count)
+            entry["total_ms"] += float(total_ms)
+
+        report = []
+        for endpoint, entry in endpoints.items():
+            count = sum(entry["counts"].values())
+            report.append({
+                "endpoint": endpoint,
+                "count": count,
+                "mean_ms": round(entry["total_ms"] / count, 2),
+                "p50_ms": round(histogram_percentile(entry["counts"], 0.50), 2),
+                "p95_ms": round(histogram_percentile(entry["counts"], 0.95), 2),
+            })
+        report.sort(key=lambda e: e["count"], reverse=True)
+        return {"hours": hours, "endpoints": report}
+    except Exception as e:
+        print(f"❌ Erro no relatório de latência: {e}")
+        raise HTTPException(status_code=500, detail="Erro ao gerar relatório de latência")
+
+
+# ===============================================
+# PROFILER SOB DEMANDA (app.services.profiler)
+# ===============================================
+
+class ProfilerConfigRequest(BaseModel):
+    enabled: Optional[bool] = None
+    mode: Optional[str] = None  # stack, cprofile
+    sample_rate: Optional[float] = None  # 0.0 a 1.0
+    slow_ms: Optional[float] = None  # 0 desliga o gatilho por latência
+
+
+@router.get("/profiler")
+def profiler_status(current_user: dict = Depends(get_current_user)):
+    """Configuração do profiler e perfis gravados (mais recentes primeiro)"""
+    _require_clearance3(current_user)
+    return {**request_profiler.stats(), "files": request_profiler.list_files()}
+
+
+@router.put("/profiler")
+def configure_profiler(
+    body: ProfilerConfigRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Liga/desliga o profiler e ajusta amostragem e limiar de latência
+    Vale só para este processo (no modo multi-worker use PROFILE_* no ambiente)
+    """
+    _require_clearance3(current_user)
+    if body.mode is not None and body.mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo deve ser um de: {', '.join(PROFILE_MODES)}")
+    if body.sample_rate is not None and not 0.0 <= body.sample_rate <= 1.0:
+        raise HTTPException(status_code=400, detail="sample_rate deve estar entre 0 e 1")
+    if body.slow_ms is not None and body.slow_ms < 0:
+        raise HTTPException(status_code=400, detail="slow_ms não pode ser negativo")
+
+    config = request_profiler.configure(enabled=body.enabled, mode=body.mode,
+                                        sample_rate=body.sample_rate, slow_ms=body.slow_ms)
+    print(f"🔬 Profiler configurado por {current_user['username']}: {config}")
+    audit_log.record("profiler_config", True, username=current_user["username"],
+                     user_id=current_user["user_id"], request=request,
+                     detail=f"enabled={config['enabled']} mode={config['mode']} "
+                            f"sample_rate={config['sample_rate']} slow_ms={config['slow_ms']}")
+    return config
+
+
+@router.get("/profiler/files/{endpoint}/{name}")
+def download_profile(endpoint: str, name: str, current_user: dict = Depends(get_current_user)):
+    """Baixa um perfil (.collapsed para flamegraph/speedscope, .pstats para pstats/snakeviz)"""
+    _require_clearance3(current_user)
+    path = request_profiler.file_path(endpoint, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(path, filename=name, media_type="application/octet-stream")
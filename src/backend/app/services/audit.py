@@ -0,0 +1,170 @@
+"""
+Trilha de auditoria com gravação assíncrona em lote.
+
+Logins (senha, câmera, upload, identificação 1:N), cadastros biométricos,
+acessos a dados por nível e ações administrativas chamam ``audit_log.record``,
+que só monta um dict e o coloca numa fila em memória (``deque``): nenhum I/O
+no caminho da requisição. Uma task em background grava a fila na tabela
+``audit_events`` em ``INSERT`` em lote (``executemany``) a cada
+``AUDIT_FLUSH_INTERVAL`` segundos, ou antes disso quando acumula
+``AUDIT_BATCH_SIZE`` eventos. Na mesma transação são atualizados os
+agregados dos relatórios (ver ``app.services.rollups``).
+
+Se o banco estiver indisponível (por exemplo durante o startup) o lote volta
+para a fila e é regravado no próximo ciclo. A fila é limitada a
+``AUDIT_MAX_QUEUE`` eventos: acima disso os mais antigos são descartados
+(contados em ``dropped``) para a auditoria nunca derrubar o processo.
+
+Configuração:
+- ``AUDIT_ENABLED``: liga/desliga a auditoria (padrão: true)
+- ``AUDIT_FLUSH_INTERVAL``: segundos entre gravações (padrão: 1.0)
+- ``AUDIT_BATCH_SIZE``: eventos por INSERT (padrão: 500)
+- ``AUDIT_MAX_QUEUE``: eventos em memória antes de descartar (padrão: 100000)
+"""
+import asyncio
+import os
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import insert
+
+from app.config import async_engine
+from app.models.audit_event import AuditEvent
+from app.services.rollups import rollups
+
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "true").lower() == "true"
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_MAX_QUEUE = int(os.getenv("AUDIT_MAX_QUEUE", "100000"))
+
+DETAIL_MAX_LEN = 255
+
+
+def client_ip(request: Optional[Request]) -> Optional[str]:
+    """IP de origem (com proxy, configure ``--forwarded-allow-ips`` no uvicorn)."""
+    if request is None or request.client is None:
+        return None
+    return request.client.host
+
+
+class AuditLog:
+    """Fila em memória de eventos de auditoria e o gravador em lote."""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int, enabled: bool = True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.written = 0
+        self.dropped = 0
+        self._queue: deque = deque(maxlen=max_queue)
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(
+        self,
+        action: str,
+        success: bool,
+        username: Optional[str] = None,
+        user_id: Optional[int] = None,
+        level_requested: Optional[int] = None,
+        request: Optional[Request] = None,
+        distance: Optional[float] = None,
+        confidence: Optional[float] = None,
+        detail: Optional[str] = None,
+    ) -> None:
+        """Enfileira um evento (sem I/O; seguro para o caminho de login)."""
+        if not self.enabled:
+            return
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append({
+            "ts": datetime.now(timezone.utc),
+            "action": action,
+            "username": username,
+            "user_id": user_id,
+            "success": success,
+            "level_requested": level_requested,
+            "origin_ip": client_ip(request),
+            "distance": None if distance is None else float(distance),
+            "confidence": None if confidence is None else float(confidence),
+            "detail": None if detail is None else str(detail)[:DETAIL_MAX_LEN],
+        })
+        if self._wake is not None and len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def _take(self) -> List[dict]:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    async def _write(self, conn, batch: List[dict], latency: dict) -> None:
+        if batch:
+            await conn.execute(insert(AuditEvent), batch)
+        await rollups.write(conn, batch, latency)
+
+    async def flush(self) -> int:
+        """Grava tudo o que está na fila; devolve quantos eventos foram gravados."""
+        total = 0
+        while self._queue or rollups.pending:
+            batch = self._take()
+            latency = rollups.drain_latency()
+            try:
+                async with async_engine.begin() as conn:
+                    await self._write(conn, batch, latency)
+            except BaseException as e:
+                # Devolve o lote para a frente da fila (mantendo a ordem) e tenta no próximo ciclo
+                self._queue.extendleft(reversed(batch))
+                rollups.restore_latency(latency)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                print(f"⚠️ Erro ao gravar {len(batch)} evento(s) de auditoria: {e}")
+                break
+            total += len(batch)
+        self.written += total
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Inicia o gravador em background (chamado no lifespan)."""
+        if self.enabled and self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        """Para o gravador e grava o que restou na fila."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+        if self._queue or rollups.pending:
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "pending": self.pending, "written": self.written, "dropped": self.dropped}
+
+
+audit_log = AuditLog(
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL,
+    max_queue=AUDIT_MAX_QUEUE,
+    enabled=AUDIT_ENABLED,
+)
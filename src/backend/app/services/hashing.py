@@ -0,0 +1,158 @@
+"""
+Executor dedicado para hashing de senhas (bcrypt).
+
+O bcrypt é propositalmente lento (dezenas a centenas de ms por operação).
+Rodando no threadpool padrão do Starlette, uma rajada de logins por senha
+ocupa todas as threads e atrasa os demais endpoints síncronos. Aqui o
+hashing tem um pool próprio e limitado; quando a fila enche, as chamadas
+são rejeitadas imediatamente (``HashingBusyError``) em vez de acumular
+latência.
+
+O custo (rounds) é calibrado no startup para que uma verificação leve
+aproximadamente ``BCRYPT_TARGET_MS``, nunca abaixo de ``DEFAULT_ROUNDS``:
+a mediana de várias medidas, depois de um aquecimento. Hashes com custo
+menor que o atual são refeitos de forma transparente no próximo login
+bem-sucedido (o custo de um hash nunca diminui).
+
+No modo multi-worker do ``start.py`` a calibração roda uma única vez no
+master, antes do fork e da carga dos modelos; todos os workers herdam o
+mesmo custo. ``BCRYPT_ROUNDS`` fixa o custo e dispensa a calibração.
+
+Configuração:
+- ``HASH_WORKERS``: threads do pool (o bcrypt libera o GIL; padrão: 2)
+- ``HASH_MAX_PENDING``: operações em andamento + na fila antes de rejeitar
+- ``BCRYPT_TARGET_MS``: tempo alvo por verificação (padrão: 250)
+- ``BCRYPT_ROUNDS``: custo fixo (desativa a calibração)
+"""
+import asyncio
+import math
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 16)))
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+
+# Custo medido na calibração e limites do custo escolhido
+PROBE_ROUNDS = 10
+MAX_ROUNDS = 16
+DEFAULT_ROUNDS = 12
+# Medidas da calibração (a mediana descarta picos de CPU do startup)
+CALIBRATION_SAMPLES = 5
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class HashingBusyError(Exception):
+    """Fila de hashing cheia."""
+
+
+def bcrypt_rounds(password_hash: str) -> Optional[int]:
+    """Custo de um hash bcrypt (``$2b$12$...`` -> 12)."""
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Pool limitado de hashing/verificação bcrypt com custo calibrado."""
+
+    def __init__(self, workers: int, max_pending: int, rounds: int = DEFAULT_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.calibrated = False
+        self.pending = 0
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    def hash_sync(self, password: str) -> str:
+        return bcrypt.using(rounds=self.rounds).hash(password)
+
+    def verify_sync(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Verifica a senha; se o custo do hash for menor que o atual, devolve o novo hash."""
+        if not pwd_context.verify(password, password_hash):
+            return False, None
+        current = bcrypt_rounds(password_hash)
+        if current is None or current < self.rounds:
+            return True, self.hash_sync(password)
+        return True, None
+
+    def calibrate(self, target_ms: float = BCRYPT_TARGET_MS) -> int:
+        """Escolhe o custo cuja verificação leva aproximadamente ``target_ms`` (mínimo ``DEFAULT_ROUNDS``)."""
+        probe = bcrypt.using(rounds=PROBE_ROUNDS).hash("calibration")
+        # Aquecimento: a primeira verificação paga a carga do backend do bcrypt
+        bcrypt.verify("calibration", probe)
+        samples = []
+        for _ in range(CALIBRATION_SAMPLES):
+            start = time.perf_counter()
+            bcrypt.verify("calibration", probe)
+            samples.append((time.perf_counter() - start) * 1000)
+        elapsed_ms = statistics.median(samples)
+        # Cada round adicional dobra o custo
+        rounds = PROBE_ROUNDS + round(math.log2(max(target_ms, 1.0) / max(elapsed_ms, 0.01)))
+        self.rounds = max(DEFAULT_ROUNDS, min(MAX_ROUNDS, rounds))
+        self.calibrated = True
+        print(f"🔑 bcrypt calibrado: {self.rounds} rounds (alvo {target_ms:.0f} ms, "
+              f"{PROBE_ROUNDS} rounds = {elapsed_ms:.1f} ms, mediana de {CALIBRATION_SAMPLES})")
+        return self.rounds
+
+    def _release(self) -> None:
+        self.pending -= 1
+
+    async def _run(self, fn, *args):
+        """
+        Executa ``fn(*args)`` no pool. A vaga em ``pending`` só é liberada quando
+        o bcrypt termina de fato: se a requisição for cancelada (cliente saiu,
+        timeout), a thread continua ocupada com ele.
+        """
+        if self.pending >= self.max_pending:
+            raise HashingBusyError()
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            task = self.pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+
+        def done(_):
+            # Thread do pool: o contador só é alterado no event loop
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # loop já encerrado (shutdown)
+
+        task.add_done_callback(done)
+        return await asyncio.wrap_future(task)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.hash_sync, password)
+
+    async def verify(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(self.verify_sync, password, password_hash)
+
+    def configure(self) -> bool:
+        """Aplica ``BCRYPT_ROUNDS`` se definido; ``True`` se ainda falta calibrar."""
+        if BCRYPT_ROUNDS:
+            self.rounds = int(BCRYPT_ROUNDS)
+            self.calibrated = True
+        return not self.calibrated
+
+    def start(self) -> None:
+        """Dispara a calibração em background (a menos que fixada ou já feita no master)."""
+        if self.configure():
+            self.pool.submit(self.calibrate)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING)
@@ -0,0 +1,211 @@
+"""
+Métricas em formato texto do Prometheus (``GET /metrics``).
+
+Implementação mínima sem dependências: histogramas com faixas fixas e
+labels, contadores e gauges calculados na hora da coleta. Cada observação
+é um ``bisect`` e duas somas sob um lock (~1 µs), seguro para o caminho
+das requisições.
+
+Métricas principais:
+- ``bioaccess_request_duration_seconds{method,route}``: latência por endpoint
+- ``bioaccess_stage_duration_seconds{endpoint,stage}``: etapas de cada
+  endpoint (leitura do upload, fila do pool biométrico, decodificação,
+  detecção, encoding, distância, consultas ao banco, bcrypt, JWT)
+- gauges das filas: pool biométrico, pool de hashing, pool de conexões,
+  fila da auditoria
+- ``bioaccess_quality_*``: resultado do filtro de qualidade e distribuição
+  das medidas (nitidez, brilho, contraste) por desfecho, para calibrar os
+  limites ``QUALITY_*``
+
+Com vários workers cada processo tem o seu registro (o scrape vê o worker
+que atendeu a requisição).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Faixas (segundos) de latência de requisições e etapas
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# O Starlette acrescenta "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [contagens por faixa (+Inf no fim), soma]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *label_values: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for label_values, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = _format_labels(self.labels, label_values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{plain} {_format_value(total)}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge (ou contador mantido por outro módulo) lido na hora da coleta."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Optional[float]], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def collect(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Optional[float]], kind: str = "gauge") -> None:
+        self.register(CallbackMetric(name, help, fn, kind))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    "bioaccess_request_duration_seconds", "Latência das requisições por endpoint", ("method", "route"),
+))
+REQUESTS = registry.register(Counter(
+    "bioaccess_requests_total", "Requisições por endpoint e status", ("method", "route", "status"),
+))
+STAGE_DURATION = registry.register(Histogram(
+    "bioaccess_stage_duration_seconds", "Latência de cada etapa dos endpoints", ("endpoint", "stage"),
+))
+
+
+FACE_TRACKING = registry.register(Counter(
+    "bioaccess_face_tracking_total", "Frames do login por stream por caminho de detecção (roi, roi+full, full, quality)",
+    ("detector",),
+))
+
+
+QUALITY_GATE = registry.register(Counter(
+    "bioaccess_quality_gate_total", "Imagens pelo filtro de qualidade por resultado (pass ou código do problema)",
+    ("endpoint", "result", "enforced"),
+))
+# Desfecho: rejected (filtro), face (rosto encontrado) ou no_face (detector não achou rosto)
+QUALITY_SHARPNESS = registry.register(Histogram(
+    "bioaccess_quality_sharpness", "Variância do Laplaciano da miniatura por desfecho", ("endpoint", "outcome"),
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 250, 500, 1000, 2500),
+))
+QUALITY_BRIGHTNESS = registry.register(Histogram(
+    "bioaccess_quality_brightness", "Brilho médio (0-255) da miniatura por desfecho", ("endpoint", "outcome"),
+    buckets=(20, 40, 60, 80, 100, 120, 140, 160, 180, 200, 215, 235),
+))
+QUALITY_CONTRAST = registry.register(Histogram(
+    "bioaccess_quality_contrast", "Desvio padrão dos níveis de cinza da miniatura por desfecho", ("endpoint", "outcome"),
+    buckets=(5, 10, 15, 20, 30, 40, 50, 60, 80, 100),
+))
+
+
+def observe_quality(endpoint: str, faces: dict) -> None:
+    """Resultado do filtro de qualidade (medido no worker) de uma imagem."""
+    quality = faces.get("quality")
+    if not quality:
+        return
+    QUALITY_GATE.inc(endpoint, quality["error"] or "pass", "true" if quality["rejected"] else "false")
+    outcome = "rejected" if quality["rejected"] else ("face" if faces.get("locations") else "no_face")
+    QUALITY_SHARPNESS.observe(quality["sharpness"], endpoint, outcome)
+    QUALITY_BRIGHTNESS.observe(quality["brightness"], endpoint, outcome)
+    QUALITY_CONTRAST.observe(quality["contrast"], endpoint, outcome)
+
+
+def observe_pipeline(endpoint: str, faces: dict, total_s: float) -> None:
+    """Etapas medidas dentro do worker biométrico; o restante do tempo é fila + IPC."""
+    timings = faces.get("timings") or {}
+    for stage, seconds in timings.items():
+        STAGE_DURATION.observe(seconds, endpoint, stage)
+    STAGE_DURATION.observe(max(total_s - sum(timings.values()), 0.0), endpoint, "executor_queue")
+    observe_quality(endpoint, faces)
@@ -0,0 +1,280 @@
+"""
+Profiler sob demanda das requisições (para investigar outliers em produção).
+
+Desligado por padrão: o middleware de latência só lê ``request_profiler.enabled``.
+Ligado (``PROFILE_ENABLED=true`` ou ``PUT /reports/profiler``), perfila:
+
+- uma fração aleatória das requisições (``PROFILE_SAMPLE_RATE``), e/ou
+- as requisições mais lentas que ``PROFILE_SLOW_MS``: como só se sabe no fim
+  se a requisição foi lenta, todas são amostradas e só as lentas são gravadas
+
+Modos (``PROFILE_MODE``):
+- ``stack`` (padrão): uma thread amostra a pilha de todas as threads do
+  processo a cada ``PROFILE_INTERVAL_MS`` enquanto há requisições perfiladas
+  e grava pilhas colapsadas (``.collapsed``, formato do flamegraph.pl /
+  speedscope). Vê o event loop e as threads (bcrypt, endpoints síncronos).
+- ``cprofile``: ``cProfile`` na thread do event loop, uma requisição por vez,
+  gravado em ``.pstats``. Só vale para a amostragem aleatória (perfilar toda
+  requisição com cProfile custa caro demais).
+
+Com requisições concorrentes as amostras incluem o trabalho das outras
+requisições do mesmo processo. O pipeline biométrico roda nos workers do
+pool e aparece como espera no future; o tempo de cada etapa dele está em
+``bioaccess_stage_duration_seconds`` (``GET /metrics``).
+
+Os perfis ficam em ``PROFILE_DIR/<método>_<rota>/`` com no máximo
+``PROFILE_MAX_FILES`` arquivos por endpoint (os mais antigos são apagados).
+A configuração alterada pela API vale só para o processo que atendeu a
+requisição (no modo multi-worker, use as variáveis de ambiente).
+"""
+import asyncio
+import cProfile
+import linecache
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_MODE = os.getenv("PROFILE_MODE", "stack")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+PROFILE_MODES = ("stack", "cprofile")
+
+# Threads ociosas (esperando em lock/fila) são ruído nas pilhas: o frame do
+# topo está num desses arquivos ou parado num ``fila.get()``
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+_IDLE_CALL = re.compile(r"\.get\((block=True)?\)\s*$")
+
+
+def endpoint_slug(endpoint: str) -> str:
+    """``POST /auth/login/camera`` -> ``POST_auth_login_camera`` (nome do diretório)."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_") or "root"
+
+
+class _Session:
+    __slots__ = ("sampled", "samples", "profile")
+
+    def __init__(self, sampled: bool):
+        self.sampled = sampled
+        self.samples: Optional[Counter] = None
+        self.profile: Optional[cProfile.Profile] = None
+
+
+class StackSampler:
+    """Thread que agrega as pilhas de todas as threads nas sessões ativas."""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self._sessions: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._names: Dict[object, str] = {}
+        self._idle_lines: Dict[tuple, bool] = {}
+
+    def add(self, session: _Session) -> None:
+        session.samples = Counter()
+        with self._lock:
+            self._sessions[id(session)] = session.samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._active.set()
+
+    def remove(self, session: _Session) -> None:
+        with self._lock:
+            self._sessions.pop(id(session), None)
+            if not self._sessions:
+                self._active.clear()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._active.set()
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            filename = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+            name = self._names[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        return name
+
+    def _is_idle(self, frame) -> bool:
+        filename = frame.f_code.co_filename
+        if filename.endswith(_IDLE_FILES):
+            return True
+        key = (filename, frame.f_lineno)
+        idle = self._idle_lines.get(key)
+        if idle is None:
+            idle = self._idle_lines[key] = bool(_IDLE_CALL.search(linecache.getline(filename, frame.f_lineno)))
+        return idle
+
+    def _collapse(self, frame) -> List[str]:
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stopped:
+            self._active.wait()
+            time.sleep(self.interval_s)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = names.get(ident, str(ident))
+                if name != "MainThread" and self._is_idle(frame):
+                    continue
+                stacks.append(";".join([name, *self._collapse(frame)]))
+            with self._lock:
+                for samples in self._sessions.values():
+                    samples.update(stacks)
+
+
+class RequestProfiler:
+    def __init__(self, enabled: bool, mode: str, sample_rate: float, slow_ms: float,
+                 interval_ms: float, directory: str, max_files: int):
+        self.enabled = False
+        self.mode = "stack"
+        self.sample_rate = 0.0
+        self.slow_ms = 0.0
+        self.directory = directory
+        self.max_files = max_files
+        self.profiled = 0
+        self.written = 0
+        self._sampler = StackSampler(interval_ms / 1000)
+        self._cprofile_busy = threading.Lock()
+        self.configure(enabled=enabled, mode=mode, sample_rate=sample_rate, slow_ms=slow_ms)
+
+    def configure(self, enabled: Optional[bool] = None, mode: Optional[str] = None,
+                  sample_rate: Optional[float] = None, slow_ms: Optional[float] = None) -> dict:
+        if mode is not None:
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"Modo de profiling inválido: {mode} (use {', '.join(PROFILE_MODES)})")
+            self.mode = mode
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if slow_ms is not None:
+            self.slow_ms = max(slow_ms, 0.0)
+        if enabled is not None:
+            self.enabled = enabled
+        return self.stats()
+
+    def begin(self) -> Optional[_Session]:
+        """Início da requisição: decide se ela é perfilada (``None`` = não)."""
+        sampled = random.random() < self.sample_rate
+        if self.mode == "cprofile":
+            if not sampled or not self._cprofile_busy.acquire(blocking=False):
+                return None
+            session = _Session(sampled)
+            session.profile = cProfile.Profile()
+            session.profile.enable()
+            return session
+        if not sampled and self.slow_ms <= 0:
+            return None
+        session = _Session(sampled)
+        self._sampler.add(session)
+        return session
+
+    def finish(self, session: _Session, endpoint: str, elapsed_s: float) -> None:
+        """Fim da requisição: para a coleta e grava o perfil (em thread) se for o caso."""
+        if session.profile is not None:
+            session.profile.disable()
+            self._cprofile_busy.release()
+        else:
+            self._sampler.remove(session)
+        elapsed_ms = elapsed_s * 1000
+        if not (session.sampled or (self.slow_ms and elapsed_ms >= self.slow_ms)):
+            return
+        if session.samples is not None and not session.samples:
+            # Requisição mais curta que o intervalo de amostragem: nada a gravar
+            return
+        self.profiled += 1
+        asyncio.get_running_loop().run_in_executor(None, self._write, session, endpoint, elapsed_ms)
+
+    def _write(self, session: _Session, endpoint: str, elapsed_ms: float) -> None:
+        directory = os.path.join(self.directory, endpoint_slug(endpoint))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            base = os.path.join(directory, f"{time.time_ns()}_{os.getpid()}_{elapsed_ms:.0f}ms")
+            if session.profile is not None:
+                session.profile.dump_stats(base + ".pstats")
+            else:
+                with open(base + ".collapsed", "w", encoding="utf-8") as f:
+                    for stack, count in session.samples.most_common():
+                        f.write(f"{stack} {count}\n")
+            self.written += 1
+            self._trim(directory)
+        except OSError as e:
+            print(f"⚠️ Falha ao gravar perfil de {endpoint}: {e}")
+
+    def _trim(self, directory: str) -> None:
+        """Anel: mantém só os ``max_files`` perfis mais recentes do endpoint."""
+        files = sorted(os.listdir(directory))
+        for name in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def list_files(self) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for slug in sorted(os.listdir(self.directory)):
+            directory = os.path.join(self.directory, slug)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory), reverse=True):
+                files.append({"endpoint": slug, "file": name,
+                              "bytes": os.path.getsize(os.path.join(directory, name))})
+        return files
+
+    def file_path(self, endpoint: str, name: str) -> Optional[str]:
+        """Caminho de um perfil listado (``None`` para nomes fora do diretório)."""
+        directory = os.path.join(self.directory, endpoint)
+        if not os.path.isdir(directory) or endpoint not in os.listdir(self.directory):
+            return None
+        if name not in os.listdir(directory):
+            return None
+        return os.path.join(directory, name)
+
+    def shutdown(self) -> None:
+        self._sampler.stop()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "directory": self.directory,
+            "max_files": self.max_files,
+            "profiled": self.profiled,
+            "written": self.written,
+        }
+
+
+request_profiler = RequestProfiler(
+    enabled=PROFILE_ENABLED,
+    mode=PROFILE_MODE,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    slow_ms=PROFILE_SLOW_MS,
+    interval_ms=PROFILE_INTERVAL_MS,
+    directory=PROFILE_DIR,
+    max_files=PROFILE_MAX_FILES,
+)
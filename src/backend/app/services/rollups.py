@@ -0,0 +1,166 @@
+"""
+Agregados (rollups) dos relatórios, mantidos incrementalmente.
+
+Cada lote gravado pelo ``audit_log`` também atualiza, na mesma transação,
+contadores por hora com ``INSERT ... ON CONFLICT DO UPDATE SET count =
+count + excluded.count``:
+
+- ``report_audit_hourly``: eventos por hora, ação e resultado
+- ``report_distance_hourly``: histograma das distâncias biométricas
+- ``report_latency_hourly``: histograma da latência por endpoint, alimentado
+  pelo middleware HTTP (``observe_latency``) e acumulado em memória entre
+  as gravações
+
+Os relatórios (``/reports/logins``, ``/reports/distances``,
+``/reports/latency``) leem só esses agregados: o custo depende da janela
+pedida e do número de faixas, não do número de eventos na auditoria.
+Vários workers podem gravar ao mesmo tempo (o upsert soma no banco).
+"""
+import bisect
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from app.models.report_rollup import AuditHourly, DistanceHistogram, LatencyHistogram
+
+# Faixas do histograma de distância: [0, 0.05), [0.05, 0.10), ... ; a última acumula o resto
+DISTANCE_BUCKET_WIDTH = 0.05
+DISTANCE_BUCKETS = 30
+
+# Limites superiores (ms) das faixas de latência; a última faixa é "acima de 10 s"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def distance_bucket(distance: float) -> int:
+    return min(int(distance / DISTANCE_BUCKET_WIDTH), DISTANCE_BUCKETS - 1)
+
+
+def distance_bucket_range(bucket: int) -> Tuple[float, Optional[float]]:
+    lower = round(bucket * DISTANCE_BUCKET_WIDTH, 4)
+    upper = None if bucket == DISTANCE_BUCKETS - 1 else round((bucket + 1) * DISTANCE_BUCKET_WIDTH, 4)
+    return lower, upper
+
+
+def latency_bucket(ms: float) -> int:
+    return bisect.bisect_left(LATENCY_BUCKETS_MS, ms)
+
+
+def histogram_percentile(counts: Dict[int, int], q: float) -> Optional[float]:
+    """Percentil estimado (interpolação linear dentro da faixa) de um histograma de latência."""
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bucket in sorted(counts):
+        count = counts[bucket]
+        if seen + count >= rank:
+            lower = LATENCY_BUCKETS_MS[bucket - 1] if bucket > 0 else 0.0
+            if bucket >= len(LATENCY_BUCKETS_MS):
+                return float(lower)
+            upper = LATENCY_BUCKETS_MS[bucket]
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+def _upsert_statement(dialect: str, model, increments: Iterable[str]):
+    """INSERT que soma os contadores em conflito (PostgreSQL/SQLite)."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    stmt = insert(model)
+    return stmt.on_conflict_do_update(
+        index_elements=[column.name for column in model.__table__.primary_key.columns],
+        set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in increments},
+    )
+
+
+class Rollups:
+    """Converte eventos em incrementos dos agregados e os grava."""
+
+    def __init__(self):
+        # (hora, endpoint, faixa) -> [contagem, soma em ms]; o middleware roda em várias threads/tasks
+        self._latency: Dict[tuple, list] = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    def observe_latency(self, endpoint: str, ms: float, ts: datetime) -> None:
+        key = (hour_of(ts), endpoint, latency_bucket(ms))
+        with self._lock:
+            entry = self._latency[key]
+            entry[0] += 1
+            entry[1] += ms
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._latency)
+
+    def drain_latency(self) -> Dict[tuple, list]:
+        with self._lock:
+            drained, self._latency = self._latency, defaultdict(lambda: [0, 0.0])
+        return drained
+
+    def restore_latency(self, drained: Dict[tuple, list]) -> None:
+        """Devolve incrementos cuja gravação falhou."""
+        with self._lock:
+            for key, (count, total_ms) in drained.items():
+                entry = self._latency[key]
+                entry[0] += count
+                entry[1] += total_ms
+
+    @staticmethod
+    def event_increments(events: List[dict]) -> Tuple[List[dict], List[dict]]:
+        hourly: Dict[tuple, int] = defaultdict(int)
+        distances: Dict[tuple, int] = defaultdict(int)
+        for event in events:
+            hour = hour_of(event["ts"])
+            hourly[(hour, event["action"], event["success"])] += 1
+            if event.get("distance") is not None:
+                distances[(hour, event["action"], distance_bucket(event["distance"]))] += 1
+        return (
+            [{"hour": h, "action": a, "success": s, "count": n} for (h, a, s), n in hourly.items()],
+            [{"hour": h, "action": a, "bucket": b, "count": n} for (h, a, b), n in distances.items()],
+        )
+
+    async def write(self, conn, events: List[dict], latency: Dict[tuple, list]) -> None:
+        """Aplica os incrementos na transação ``conn`` (a mesma do INSERT da auditoria)."""
+        hourly, distances = self.event_increments(events)
+        latency_rows = [
+            {"hour": h, "endpoint": e, "bucket": b, "count": count, "total_ms": total_ms}
+            for (h, e, b), (count, total_ms) in latency.items()
+        ]
+        for model, rows, increments in (
+            (AuditHourly, hourly, ("count",)),
+            (DistanceHistogram, distances, ("count",)),
+            (LatencyHistogram, latency_rows, ("count", "total_ms")),
+        ):
+            if rows:
+                await self._upsert(conn, model, rows, increments)
+
+    async def _upsert(self, conn, model, rows: List[dict], increments) -> None:
+        stmt = _upsert_statement(conn.dialect.name, model, increments)
+        if stmt is not None:
+            await conn.execute(stmt, rows)
+            return
+        # Outros dialetos: UPDATE e, se a linha não existir, INSERT
+        keys = [column.name for column in model.__table__.primary_key.columns]
+        for row in rows:
+            where = [getattr(model, key) == row[key] for key in keys]
+            result = await conn.execute(
+                update(model).where(*where).values({name: getattr(model, name) + row[name] for name in increments})
+            )
+            if result.rowcount == 0:
+                await conn.execute(model.__table__.insert(), [row])
+
+
+rollups = Rollups()
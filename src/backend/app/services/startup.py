@@ -0,0 +1,153 @@
+"""
+Inicialização em background e estado de prontidão (readiness).
+
+O uvicorn só abre a porta quando o ``lifespan`` termina o startup; por isso
+nada lento roda ali. O schema, o seed dos usuários padrão, o aquecimento
+dos modelos do dlib e o carregamento da galeria 1:N rodam numa task em
+background, e cada etapa marca um componente em ``readiness``:
+
+- ``database``: schema criado (uma vez, por este processo) e seed feito
+- ``gallery``: índice 1:N carregado (depende de ``database``)
+- ``models``: modelos carregados em todos os workers biométricos
+
+``GET /health`` é a liveness (o processo responde); ``GET /ready`` devolve
+503 até todos os componentes estarem prontos.
+
+No modo multi-worker do ``start.py``, ``prepare_master`` roda tudo isso uma
+única vez no processo master antes do fork; os workers herdam os modelos,
+a galeria e o estado de ``readiness`` (páginas compartilhadas copy-on-write).
+
+Configuração:
+- ``SEED_DEFAULT_USERS``: cria os usuários padrão num banco vazio (padrão: true)
+"""
+import asyncio
+import gc
+import os
+import time
+from typing import Dict
+
+from sqlalchemy import func, select
+
+from app.biometrics import gallery, pipeline
+from app.biometrics.executor import biometric_executor
+from app.config import AsyncSessionLocal, Base, async_engine
+from app.models import User
+from app.services.hashing import password_hasher
+from app.services.user_import import bulk_insert_users, hash_chunk
+
+SEED_DEFAULT_USERS = os.getenv("SEED_DEFAULT_USERS", "true").lower() == "true"
+
+DEFAULT_USERS = [
+    ("ana.luiza", "senha123", "public", 1),
+    ("teste1", "teste123", "public", 1),
+    ("demo", "demo123", "director", 2),
+    ("admin", "admin123", "minister", 3),
+]
+
+
+class Readiness:
+    """Componentes já inicializados e erros da inicialização."""
+
+    def __init__(self, components):
+        self.started_at = time.monotonic()
+        self.components: Dict[str, bool] = {name: False for name in components}
+        self.errors: Dict[str, str] = {}
+
+    def mark(self, name: str) -> None:
+        self.components[name] = True
+        self.errors.pop(name, None)
+
+    def fail(self, name: str, error: Exception) -> None:
+        self.errors[name] = str(error)
+
+    @property
+    def ready(self) -> bool:
+        return all(self.components.values())
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "components": dict(self.components),
+            "errors": dict(self.errors),
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+        }
+
+
+readiness = Readiness(["database", "gallery", "models"])
+
+
+async def init_database() -> None:
+    """Cria o schema e, num banco vazio, os usuários padrão (INSERT único)."""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        user_count = (await conn.execute(select(func.count(User.id)))).scalar_one()
+        print(f"✅ Conexão OK - {user_count} usuários")
+        if user_count == 0 and SEED_DEFAULT_USERS:
+            # Threads do loop (e não o pool do hasher): no master pré-fork nenhuma thread pode sobreviver
+            hashes = [h for (h,) in await asyncio.gather(*(
+                asyncio.to_thread(hash_chunk, [password], password_hasher.rounds)
+                for _, password, _, _ in DEFAULT_USERS
+            ))]
+            created = await conn.run_sync(bulk_insert_users, [
+                {"username": username, "password_hash": password_hash, "role": role, "clearance": clearance}
+                for (username, _, role, clearance), password_hash in zip(DEFAULT_USERS, hashes)
+            ])
+            print(f"✅ {created} usuários padrão criados!")
+
+
+async def load_gallery() -> None:
+    async with AsyncSessionLocal() as db:
+        await gallery.get_gallery(db)
+
+
+async def _step(name: str, fn) -> bool:
+    if readiness.components[name]:
+        # Já feito no master antes do fork
+        return True
+    start = time.perf_counter()
+    try:
+        await fn()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"❌ Inicialização '{name}' falhou: {e}")
+        readiness.fail(name, e)
+        return False
+    readiness.mark(name)
+    print(f"✅ Inicialização '{name}' concluída em {time.perf_counter() - start:.1f}s")
+    return True
+
+
+async def _database_and_gallery() -> None:
+    if await _step("database", init_database):
+        await _step("gallery", load_gallery)
+
+
+async def _prepare_master() -> None:
+    await _database_and_gallery()
+    # Conexões abertas não podem ser herdadas pelos workers
+    await async_engine.dispose()
+
+
+def prepare_master() -> None:
+    """
+    Modo pré-fork: calibra o bcrypt, carrega os modelos do dlib, cria o
+    schema e a galeria no master e congela os objetos (``gc.freeze``) para o
+    coletor não sujar as páginas compartilhadas com os workers.
+    """
+    # Primeiro, com a CPU livre: todos os workers herdam o mesmo custo
+    if password_hasher.configure():
+        password_hasher.calibrate()
+    start = time.perf_counter()
+    pipeline.warm_up()
+    print(f"🧠 Modelos faciais carregados no master em {time.perf_counter() - start:.1f}s")
+    asyncio.run(_prepare_master())
+    gc.collect()
+    gc.freeze()
+
+
+async def run_startup_tasks() -> None:
+    """Banco/galeria e modelos em paralelo; chamado em background pelo lifespan."""
+    await asyncio.gather(_database_and_gallery(), _step("models", biometric_executor.warm_up))
+    if readiness.ready:
+        print(f"🚀 Pronto em {time.monotonic() - readiness.started_at:.1f}s")
@@ -0,0 +1,63 @@
+"""
+Limite de tamanho do corpo das requisições, aplicado durante o recebimento.
+
+Middleware ASGI que conta os bytes do corpo à medida que chegam: passou do
+limite, a leitura é interrompida com 413 antes de o parser de multipart
+acumular o resto em memória/disco. Um ``Content-Length`` acima do limite é
+recusado antes de ler qualquer byte.
+
+Limites:
+- ``UPLOAD_MAX_BYTES``: padrão para todas as rotas (padrão: 10 MB)
+- ``BATCH_UPLOAD_MAX_BYTES``: ``/auth/enroll-batch`` (zip com muitas fotos;
+  padrão: 1 GB)
+"""
+import os
+
+from fastapi import HTTPException
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+PATH_LIMITS = {
+    "/auth/enroll-batch": BATCH_UPLOAD_MAX_BYTES,
+}
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Arquivo muito grande. Tamanho máximo: {limit // (1024 * 1024)} MB"
+    )
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app, default_limit: int = UPLOAD_MAX_BYTES, path_limits: dict = None):
+        self.app = app
+        self.default_limit = default_limit
+        self.path_limits = PATH_LIMITS if path_limits is None else path_limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.path_limits.get(scope["path"], self.default_limit)
+        content_length = None
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                content_length = int(value) if value.isdigit() else None
+                break
+        received = 0
+
+        async def limited_receive():
+            # O HTTPException sobe pelo parser do corpo e vira a resposta 413 do FastAPI
+            nonlocal received
+            if content_length is not None and content_length > limit:
+                raise _too_large(limit)
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
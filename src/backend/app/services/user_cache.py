@@ -0,0 +1,85 @@
+"""
+Cache em processo (TTL + LRU) dos dados de autorização dos usuários.
+
+O token JWT já carrega ``role``, ``clearance`` e a versão do usuário
+(``token_version``); este cache só serve para confirmar que a versão do
+token ainda é a atual sem consultar o banco a cada requisição. Exclusão,
+reset de senha e mudança de perfil incrementam a versão no banco e
+atualizam o cache, revogando os tokens antigos imediatamente neste
+processo e, nos demais, em até ``USER_CACHE_TTL`` segundos.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: int
+    username: str
+    role: str
+    clearance: int
+    token_version: int
+    deleted: bool = False
+
+
+class UserCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # username -> (expira_em, CachedUser)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, username: str) -> Optional[CachedUser]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def _store(self, cached: CachedUser, ttl: float) -> None:
+        with self._lock:
+            self._entries[cached.username] = (time.monotonic() + ttl, cached)
+            self._entries.move_to_end(cached.username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put(self, user) -> CachedUser:
+        """Armazena (ou atualiza) um usuário a partir do modelo ORM."""
+        cached = CachedUser(
+            id=user.id,
+            username=user.username,
+            role=user.role,
+            clearance=user.clearance,
+            token_version=user.token_version or 0,
+        )
+        self._store(cached, self.ttl)
+        return cached
+
+    def mark_deleted(self, username: str, ttl: float) -> None:
+        """Registra a exclusão; tokens do usuário são recusados enquanto a marca existir."""
+        self._store(CachedUser(id=0, username=username, role="", clearance=0, token_version=-1, deleted=True), ttl)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+
+user_cache = UserCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
@@ -0,0 +1,81 @@
+"""
+Inserção de usuários em massa (import CLI e seed do start.py).
+
+O bcrypt é o gargalo: cada hash leva centenas de ms e uma única thread
+Python não passa de poucos usuários por segundo. ``hash_chunk`` é uma
+função de módulo para poder rodar num ``ProcessPoolExecutor`` (um bloco de
+senhas por tarefa), e ``bulk_insert_users`` grava um bloco inteiro num
+único ``executemany`` com ``ON CONFLICT`` do dialeto (PostgreSQL/SQLite).
+"""
+from typing import Dict, Iterable, List, Sequence
+
+from passlib.hash import bcrypt
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from app.models.user import User
+from app.models.user_tombstone import UserTombstone
+
+USER_COLUMNS = ("username", "password_hash", "role", "clearance")
+
+
+def hash_chunk(passwords: Sequence[str], rounds: int) -> List[str]:
+    """Hash bcrypt de um bloco de senhas (executado num worker)."""
+    hasher = bcrypt.using(rounds=rounds)
+    return [hasher.hash(password) for password in passwords]
+
+
+def _upsert_statement(dialect: str, update: bool):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    stmt = insert(User)
+    if update:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.username],
+            set_={
+                "password_hash": stmt.excluded.password_hash,
+                "role": stmt.excluded.role,
+                "clearance": stmt.excluded.clearance,
+                # Credenciais mudaram: revoga os tokens emitidos antes do import
+                "token_version": User.token_version + 1,
+            },
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[User.username])
+    return stmt.returning(User.username)
+
+
+def bulk_insert_users(conn: Connection, rows: Iterable[Dict], update: bool = False) -> int:
+    """
+    Insere um bloco de usuários (dicts com ``USER_COLUMNS``) num único
+    ``executemany``. Usernames já existentes são ignorados, ou atualizados
+    com ``update=True``; usernames excluídos antes (``UserTombstone``)
+    recomeçam da última versão de token. Retorna quantas linhas foram gravadas.
+    """
+    # Um mesmo username duas vezes no bloco quebraria o ON CONFLICT: vale o último
+    rows = list({row["username"]: {column: row[column] for column in USER_COLUMNS} for row in rows}.values())
+    if not rows:
+        return 0
+    # Usernames excluídos antes continuam da versão registrada na exclusão
+    tombstones = dict(conn.execute(
+        select(UserTombstone.username, UserTombstone.token_version)
+        .where(UserTombstone.username.in_([row["username"] for row in rows]))
+    ).all())
+    for row in rows:
+        row["token_version"] = tombstones.get(row["username"], 0)
+    stmt = _upsert_statement(conn.dialect.name, update)
+    if stmt is not None:
+        return len(conn.execute(stmt, rows).all())
+
+    # Outros dialetos: filtra os existentes e faz INSERT simples
+    existing = set(conn.execute(
+        select(User.username).where(User.username.in_([row["username"] for row in rows]))
+    ).scalars())
+    rows = [row for row in rows if row["username"] not in existing]
+    if rows:
+        conn.execute(User.__table__.insert(), rows)
+    return len(rows)
@@ -0,0 +1,89 @@
+"""
+Utilitários compartilhados pelos benchmarks (estatísticas, imagens de teste
+e saída JSON).
+"""
+import io
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, Iterable, List
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def latency_summary(samples_s: Iterable[float]) -> Dict[str, float]:
+    """Resumo de latências (entrada em segundos, saída em milissegundos)."""
+    samples = np.asarray(list(samples_s), dtype=np.float64) * 1000.0
+    if samples.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(samples.max()),
+    }
+
+
+def time_calls(fn: Callable[[], object], repeat: int, warmup: int = 1) -> List[float]:
+    """Duração (s) de ``repeat`` chamadas de ``fn`` após ``warmup`` chamadas descartadas."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def synthetic_jpeg(width: int, height: int, seed: int = 0, quality: int = 90) -> bytes:
+    """JPEG sintético (gradiente + ruído, comprimível como uma foto; sem rosto)."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // max(width, 1), y * 255 // max(height, 1), (x + y) * 255 // max(width + height, 1)], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, size=base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def load_images(directory: str) -> List[bytes]:
+    """Bytes das imagens (.jpg/.png) de um diretório, em ordem alfabética."""
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise SystemExit(f"Nenhuma imagem em {directory}")
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def write_report(report: dict, output: str = None) -> None:
+    """Imprime o relatório JSON e, se pedido, grava em arquivo."""
+    report = {"environment": environment(), **report}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
@@ -0,0 +1,85 @@
+"""
+Benchmark de recall x latência dos índices biométricos.
+
+Gera embeddings sintéticos de 128 dimensões agrupados (como encodings do
+face_recognition: várias amostras ruidosas por identidade), usa o índice
+exato como verdade e mede recall@k e latência do IVF para vários ``nprobe``.
+
+Uso (a partir de src/backend):
+    python -m benchmarks.index_recall --size 100000 --nlist 1024 --nprobe 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.biometrics.index import BruteForceIndex, IVFIndex
+from benchmarks.common import latency_summary, write_report
+
+
+def synthetic_embeddings(n: int, dim: int = 128, seed: int = 0):
+    """Identidades em torno de centros aleatórios + probes ruidosos de parte delas."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0.0, 0.09, size=(max(n // 50, 1), dim)).astype(np.float32)
+    gallery = centers[rng.integers(0, len(centers), size=n)] + rng.normal(0.0, 0.05, size=(n, dim)).astype(np.float32)
+    return gallery.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed + 1)
+    data = synthetic_embeddings(args.size, seed=args.seed)
+    ids = np.arange(args.size, dtype=np.int64)
+    picks = rng.integers(0, args.size, size=args.queries)
+    queries = data[picks] + rng.normal(0.0, 0.03, size=(args.queries, data.shape[1])).astype(np.float32)
+
+    exact = BruteForceIndex(initial_capacity=args.size)
+    exact.build_arrays(ids, data)
+    truth, exact_times = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        truth.append([user_id for user_id, _ in exact.search(q, args.k)])
+        exact_times.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    ivf = IVFIndex(nlist=args.nlist, train_min=min(args.size, args.nlist * 39))
+    ivf.build_arrays(ids, data)
+    build_s = time.perf_counter() - t0
+
+    results = []
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        hits_at_1 = hits_at_k = 0
+        times = []
+        for q, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            found = [user_id for user_id, _ in ivf.search(q, args.k)]
+            times.append(time.perf_counter() - t0)
+            hits_at_1 += bool(found) and found[0] == expected[0]
+            hits_at_k += len(set(found) & set(expected))
+        results.append({
+            "nprobe": nprobe,
+            "recall_at_1": hits_at_1 / len(queries),
+            f"recall_at_{args.k}": hits_at_k / (len(queries) * args.k),
+            "latency": latency_summary(times),
+        })
+
+    write_report({
+        "benchmark": "index_recall",
+        "params": vars(args),
+        "exact": {"latency": latency_summary(exact_times)},
+        "ivf": {"build_s": build_s, "results": results},
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
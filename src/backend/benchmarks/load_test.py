@@ -0,0 +1,252 @@
+"""
+Teste de carga ponta a ponta da API de autenticação.
+
+Sobe o servidor (uvicorn) num SQLite temporário, espera o ``GET /ready`` e
+dispara requisições concorrentes em cada cenário:
+
+- ``login``: ``POST /auth/login`` (bcrypt no pool de hashing)
+- ``login_camera``: ``POST /auth/login/camera`` com uma imagem de rosto
+- ``enroll_upload``: ``POST /auth/enroll-upload``
+- ``data_level``: ``GET /data/level/{n}`` com token (n = 1, 2, 3)
+
+Para cada cenário o relatório traz throughput, contagem por status HTTP e
+latência (p50/p95/p99). Com ``--images`` (diretório com fotos de rosto) o
+primeiro rosto é cadastrado e os logins por câmera exercitam encoding e
+comparação; se nenhum login por câmera ou cadastro responder 200, o teste
+termina com código 1 (as fotos não servem para medir o caminho de sucesso).
+
+Sem ``--images`` são usados JPEGs sintéticos sem rosto e, no servidor local,
+um template aleatório é gravado direto no banco para o usuário de teste: a
+detecção roda por inteiro, mas ``login_camera`` e ``enroll_upload`` só medem
+a rejeição (401/400), sem encoding nem comparação. Esses cenários saem com
+``"path": "rejection_only"`` no relatório (``"success"`` quando houve 200) e
+a comparação com ``--baseline`` ignora cenários cujo caminho mudou.
+
+``--baseline`` compara com um relatório anterior e termina com código 1 se
+o p95 subir ou o throughput cair mais que ``--max-regression``.
+
+Uso (a partir de src/backend):
+    python -m benchmarks.load_test --output carga.json
+    python -m benchmarks.load_test --images fotos/ --concurrency 16 --requests 500
+    python -m benchmarks.load_test --baseline carga.json --max-regression 0.2
+    python -m benchmarks.load_test --url http://localhost:8000   # servidor já rodando
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from itertools import count
+
+import httpx
+import numpy as np
+
+from app.biometrics.storage import pack_embedding
+from benchmarks.common import latency_summary, load_images, synthetic_jpeg, write_report
+
+SCENARIOS = ("login", "login_camera", "enroll_upload", "data_level")
+# Cenários que só passam por encoding + comparação com uma foto de rosto de verdade
+FACE_SCENARIOS = ("login_camera", "enroll_upload")
+ADMIN = {"username": "admin", "password": "admin123"}
+FACE_USER = {"username": "load.face", "password": "load123", "role": "public", "clearance": 1}
+
+
+def start_server(port: int, workdir: str, bcrypt_rounds: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        "BIOMETRIC_INDEX_PATH": "",
+        "BIOMETRIC_GALLERY_PATH": os.path.join(workdir, "gallery.bin"),
+        "SEED_DEFAULT_USERS": "true",
+        "BCRYPT_ROUNDS": str(bcrypt_rounds),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=open(os.path.join(workdir, "server.log"), "wb"),
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit(f"Servidor não ficou pronto em {timeout:.0f}s")
+
+
+def seed_random_template(db_path: str, username: str) -> None:
+    """Template aleatório para o login por câmera passar da checagem de biometria cadastrada."""
+    embedding = pack_embedding(np.random.default_rng(0).normal(0.0, 0.1, 128).astype(np.float32))
+    with sqlite3.connect(db_path) as conn:
+        (user_id,) = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        conn.execute("INSERT INTO biometric_templates (user_id, embedding) VALUES (?, ?)", (user_id, embedding))
+        conn.execute(
+            "INSERT OR REPLACE INTO biometric_centroids (user_id, embedding, template_count) VALUES (?, ?, 1)",
+            (user_id, embedding),
+        )
+
+
+async def setup(client: httpx.AsyncClient, images) -> dict:
+    """Token do admin e usuário com o primeiro rosto cadastrado."""
+    response = await client.post("/auth/login", json=ADMIN)
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    await client.post("/auth/register", json=FACE_USER, headers=headers)
+    enroll = await client.post(
+        "/auth/enroll-upload",
+        data={"username": FACE_USER["username"]},
+        files={"image": ("face.jpg", images[0], "image/jpeg")},
+    )
+    return {"headers": headers, "face_enrolled": enroll.status_code == 200}
+
+
+def build_request(scenario: str, i: int, ctx: dict, images) -> dict:
+    image = images[i % len(images)]
+    if scenario == "login":
+        return {"method": "POST", "url": "/auth/login", "json": ADMIN}
+    if scenario == "login_camera":
+        return {"method": "POST", "url": "/auth/login/camera", "data": {"username": FACE_USER["username"]},
+                "files": {"image": ("frame.jpg", image, "image/jpeg")}}
+    if scenario == "enroll_upload":
+        return {"method": "POST", "url": "/auth/enroll-upload", "data": {"username": FACE_USER["username"]},
+                "files": {"image": ("face.jpg", image, "image/jpeg")}}
+    return {"method": "GET", "url": f"/data/level/{i % 3 + 1}", "headers": ctx["headers"]}
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, requests: int, concurrency: int,
+                       ctx: dict, images) -> dict:
+    counter = count()
+    samples, statuses = [], Counter()
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.request(**build_request(scenario, i, ctx, images))
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            samples.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = {
+        "scenario": scenario,
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "status_counts": dict(statuses),
+        "latency": latency_summary(samples),
+    }
+    if scenario in FACE_SCENARIOS:
+        result["path"] = "success" if statuses.get("200") else "rejection_only"
+    return result
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    """Cenários cujo p95 subiu ou throughput caiu mais que ``max_regression`` (fração)."""
+    previous = {s["scenario"]: s for s in baseline.get("scenarios", [])}
+    regressions = []
+    for current in report["scenarios"]:
+        before = previous.get(current["scenario"])
+        if not before or before.get("path") != current.get("path"):
+            # Rejeição e sucesso não são comparáveis
+            continue
+        p95_change = current["latency"]["p95_ms"] / before["latency"]["p95_ms"] - 1
+        rps_change = current["throughput_rps"] / before["throughput_rps"] - 1
+        current["vs_baseline"] = {"p95_change": round(p95_change, 4), "throughput_change": round(rps_change, 4)}
+        if p95_change > max_regression or rps_change < -max_regression:
+            regressions.append(current["scenario"])
+    return regressions
+
+
+async def run(args) -> dict:
+    images = load_images(args.images) if args.images else [synthetic_jpeg(640, 480, seed=i) for i in range(4)]
+    if not args.images:
+        print(f"⚠️ Sem --images: {', '.join(FACE_SCENARIOS)} usam JPEGs sem rosto e medem só a rejeição "
+              f"(sem encoding nem comparação)", file=sys.stderr)
+    workdir = tempfile.mkdtemp(prefix="bioaccess-load-")
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = start_server(args.port, workdir, args.bcrypt_rounds)
+        base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client, args.ready_timeout)
+            ctx = await setup(client, images)
+            if server is not None and not ctx["face_enrolled"]:
+                seed_random_template(os.path.join(workdir, "load.db"), FACE_USER["username"])
+            scenarios = []
+            for scenario in args.scenarios:
+                result = await run_scenario(client, scenario, args.requests, args.concurrency, ctx, images)
+                path = f" [{result['path']}]" if "path" in result else ""
+                print(f"⏱️ {scenario}{path}: {result['throughput_rps']} req/s, "
+                      f"p95 {result['latency'].get('p95_ms', 0):.1f} ms, status {result['status_counts']}",
+                      file=sys.stderr)
+                scenarios.append(result)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+    return {
+        "benchmark": "load_test",
+        "params": {**vars(args), "images": args.images or "synthetic (sem rosto)"},
+        "face_enrolled": ctx["face_enrolled"],
+        "scenarios": scenarios,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="servidor já rodando (padrão: sobe um local com SQLite temporário)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--images", help="diretório com fotos de rosto (.jpg/.png)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10, help="custo do bcrypt no servidor local")
+    parser.add_argument("--timeout", type=float, default=60.0, help="timeout por requisição (s)")
+    parser.add_argument("--ready-timeout", type=float, default=180.0)
+    parser.add_argument("--baseline", help="relatório anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    unmatched = [s["scenario"] for s in report["scenarios"] if s.get("path") == "rejection_only"]
+    if args.images and unmatched:
+        write_report(report, args.output)
+        print(f"❌ Nenhuma resposta 200 em {', '.join(unmatched)} com as fotos de --images: "
+              f"o caminho de encoding/comparação não foi medido", file=sys.stderr)
+        sys.exit(1)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        report["regressions"] = regressions
+    write_report(report, args.output)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
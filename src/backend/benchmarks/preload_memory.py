@@ -0,0 +1,123 @@
+"""
+Memória e throughput de N workers biométricos: pré-carga + fork vs. N
+processos independentes.
+
+- ``independent``: cada worker é um processo novo (spawn) que importa o
+  ``face_recognition`` e carrega os modelos do dlib por conta própria
+- ``preload``: o processo pai carrega e aquece os modelos, congela os
+  objetos (``gc.freeze``) e faz fork dos workers (modo multi-worker do
+  ``start.py``); as páginas dos modelos ficam compartilhadas
+
+Cada worker aquece o detector, executa ``--iterations`` detecções +
+encodings numa imagem sintética e fica vivo enquanto o PSS (memória
+proporcional: páginas compartilhadas divididas entre os processos) de todos
+é medido em ``/proc/<pid>/smaps_rollup`` (apenas Linux).
+
+Uso (a partir de src/backend):
+    python -m benchmarks.preload_memory --workers 4 --output preload.json
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import write_report
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower() + "_kb"] = int(rest.split()[0])
+    return values
+
+
+def _worker(results, done, iterations: int, size: int) -> None:
+    from app.biometrics import pipeline
+    started = time.perf_counter()
+    pipeline.warm_up()
+    warm_s = time.perf_counter() - started
+
+    face_recognition = pipeline._models()
+    image = np.random.RandomState(0).randint(0, 256, (size, size, 3), dtype=np.uint8)
+    box = (size // 8, size * 7 // 8, size * 7 // 8, size // 8)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        face_recognition.face_locations(image)
+        face_recognition.face_encodings(image, [box])
+    results.put({"pid": os.getpid(), "warm_s": warm_s, "run_s": time.perf_counter() - started})
+    # Fica vivo até o pai medir a memória
+    done.wait()
+
+
+def run_mode(mode: str, workers: int, iterations: int, size: int) -> dict:
+    master_load_s = 0.0
+    if mode == "preload":
+        from app.biometrics import pipeline
+        started = time.perf_counter()
+        pipeline.warm_up()
+        master_load_s = time.perf_counter() - started
+        gc.collect()
+        gc.freeze()
+        ctx = multiprocessing.get_context("fork")
+    else:
+        ctx = multiprocessing.get_context("spawn")
+
+    results, done = ctx.Queue(), ctx.Event()
+    started = time.perf_counter()
+    procs = [ctx.Process(target=_worker, args=(results, done, iterations, size)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    stats: List[dict] = [results.get() for _ in procs]
+    all_ready_s = time.perf_counter() - started
+
+    memory = [_memory_kb(p.pid) for p in procs]
+    if mode == "preload":
+        memory.append(_memory_kb(os.getpid()))
+    done.set()
+    for p in procs:
+        p.join()
+    if mode == "preload":
+        gc.unfreeze()
+
+    slowest = max(s["run_s"] for s in stats)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "master_load_s": round(master_load_s, 3),
+        "worker_warm_s_max": round(max(s["warm_s"] for s in stats), 3),
+        "time_to_all_ready_s": round(all_ready_s, 3),
+        "throughput_images_per_s": round(workers * iterations / slowest, 2),
+        "pss_total_mb": round(sum(m["pss_kb"] for m in memory) / 1024, 1),
+        "rss_total_mb": round(sum(m["rss_kb"] for m in memory) / 1024, 1),
+        "pss_per_worker_mb": round(sum(m["pss_kb"] for m in memory[:workers]) / workers / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--size", type=int, default=320, help="lado da imagem sintética (px)")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    # independent primeiro: o processo pai ainda não carregou os modelos
+    modes = [run_mode(mode, args.workers, args.iterations, args.size) for mode in ("independent", "preload")]
+    independent, preload = modes
+    write_report({
+        "benchmark": "preload_memory",
+        "params": vars(args),
+        "modes": modes,
+        "pss_saved_mb": round(independent["pss_total_mb"] - preload["pss_total_mb"], 1),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Micro-benchmarks de cada etapa da autenticação.
+
+- ``decode``: ``decode_rgb`` (JPEG -> RGB, com redução no decodificador acima
+  de ``DECODE_MAX_SIDE``) em vários tamanhos de imagem
+- ``quality``: filtro de qualidade (miniatura + histograma + Laplaciano)
+  na imagem decodificada, com as medidas de cada imagem
+- ``detect``: ``detect_faces`` em cada perfil de detecção, na imagem inteira
+  e só na região do rosto (caminho do rastreamento entre frames)
+- ``encode``: ``face_encodings`` (landmarks + ResNet) de um rosto
+- ``compare``: distância contra os templates de um usuário (1:1,
+  ``min_distance``) e busca exata na galeria 1:N (``BruteForceIndex``)
+  para galerias de 1 a 1M embeddings
+- ``bcrypt``: verificação de senha em cada custo
+- ``jwt``: emissão e validação do token de acesso
+
+Sem ``--image`` as etapas de imagem usam JPEGs sintéticos (sem rosto): a
+detecção mede a varredura completa e o encoding usa uma caixa fixa no
+centro da imagem. Com uma foto de rosto (``--image``) os números refletem
+o caminho real do login.
+
+Uso (a partir de src/backend):
+    python -m benchmarks.stages --output stages.json
+    python -m benchmarks.stages --only compare --gallery-sizes 1 1000 1000000
+    python -m benchmarks.stages --image rosto.jpg --profiles fast balanced accurate
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import numpy as np
+from passlib.hash import bcrypt
+
+from app.biometrics import pipeline
+from app.biometrics.decode import to_array
+from app.biometrics.index import BruteForceIndex, EMBEDDING_DIM
+from app.biometrics.profiles import DETECTION_PROFILES
+from app.biometrics.quality import assess
+from app.biometrics.tracking import TRACKING_ROI_MARGIN, expand_box
+from app.biometrics.templates import min_distance
+from benchmarks.common import latency_summary, synthetic_jpeg, time_calls, write_report
+
+STAGES = ("decode", "quality", "detect", "encode", "compare", "bcrypt", "jwt")
+
+
+def bench_decode(images: dict, repeat: int) -> list:
+    # ``load()`` força a decodificação dos pixels (o PIL abre a imagem de forma preguiçosa)
+    return [
+        {"image": name, "bytes": len(data),
+         **latency_summary(time_calls(lambda: pipeline.decode_rgb(data).load(), repeat))}
+        for name, data in images.items()
+    ]
+
+
+def bench_quality(images: dict, repeat: int) -> list:
+    results = []
+    for name, data in images.items():
+        array = to_array(pipeline.decode_rgb(data))
+        quality = assess(array, "observe")
+        samples = time_calls(lambda: assess(array, "observe"), repeat)
+        results.append({"image": name, "size": f"{array.shape[1]}x{array.shape[0]}", "quality": quality,
+                        **latency_summary(samples)})
+    return results
+
+
+def bench_detect(images: dict, profiles, repeat: int) -> list:
+    results = []
+    for name, data in images.items():
+        img = pipeline.decode_rgb(data)
+        for profile_name in profiles:
+            profile = DETECTION_PROFILES[profile_name]
+            boxes = pipeline.detect_faces(img, profile)
+            samples = time_calls(lambda: pipeline.detect_faces(img, profile), repeat)
+            # Região de rastreamento: rosto detectado ou um quadrado central de 1/3 do menor lado
+            w, h = img.size
+            side = min(w, h) // 3
+            box = boxes[0] if boxes else ((h - side) // 2, (w + side) // 2, (h + side) // 2, (w - side) // 2)
+            roi = expand_box(box, (h, w), TRACKING_ROI_MARGIN)
+            roi_samples = time_calls(lambda: pipeline.detect_faces_in_roi(img, roi, profile), repeat)
+            results.append({"image": name, "profile": profile_name, "faces": len(boxes),
+                            **latency_summary(samples), "roi": latency_summary(roi_samples)})
+    return results
+
+
+def bench_encode(images: dict, repeat: int) -> list:
+    face_recognition = pipeline._models()
+    results = []
+    for name, data in images.items():
+        img = pipeline.decode_rgb(data)
+        boxes = pipeline.detect_faces(img, DETECTION_PROFILES["balanced"])[:1]
+        if not boxes:
+            # Sem rosto detectado: caixa fixa no centro (mesmo custo de landmarks + ResNet)
+            w, h = img.size
+            side = min(w, h) // 2
+            top, left = (h - side) // 2, (w - side) // 2
+            boxes = [(top, left + side, top + side, left)]
+        array = np.asarray(img)
+        samples = time_calls(lambda: face_recognition.face_encodings(array, boxes), repeat)
+        results.append({"image": name, **latency_summary(samples)})
+    return results
+
+
+def bench_compare(sizes, repeat: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    probe = rng.normal(0.0, 0.1, EMBEDDING_DIM).astype(np.float32)
+    results = []
+    for size in sizes:
+        matrix = rng.normal(0.0, 0.1, (size, EMBEDDING_DIM)).astype(np.float32)
+        one_to_one = time_calls(lambda: min_distance(matrix, probe), repeat)
+        index = BruteForceIndex()
+        index.build_arrays(np.arange(size, dtype=np.int64), matrix)
+        one_to_n = time_calls(lambda: index.search(probe, k=1), repeat)
+        results.append({
+            "gallery_size": size,
+            "min_distance": latency_summary(one_to_one),
+            "index_search": latency_summary(one_to_n),
+        })
+        del matrix, index
+    return results
+
+
+def bench_bcrypt(rounds_list, repeat: int) -> list:
+    results = []
+    for rounds in rounds_list:
+        password_hash = bcrypt.using(rounds=rounds).hash("benchmark-password")
+        samples = time_calls(lambda: bcrypt.verify("benchmark-password", password_hash), repeat)
+        results.append({"rounds": rounds, **latency_summary(samples)})
+    return results
+
+
+def bench_jwt(repeat: int) -> dict:
+    secret = "benchmark-secret"
+    claims = {"sub": "bench.user", "uid": 1, "role": "public", "clearance": 1, "ver": 0,
+              "exp": datetime.now(timezone.utc) + timedelta(minutes=60)}
+    token = jwt.encode(claims, secret, algorithm="HS256")
+    return {
+        "encode": latency_summary(time_calls(lambda: jwt.encode(claims, secret, algorithm="HS256"), repeat)),
+        "decode": latency_summary(time_calls(lambda: jwt.decode(token, secret, algorithms=["HS256"]), repeat)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=STAGES, help="etapas a medir (padrão: todas)")
+    parser.add_argument("--image", action="append", default=[], help="foto de rosto (pode repetir)")
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1280x720", "1920x1080", "4032x3024"],
+                        help="tamanhos das imagens sintéticas (LxA)")
+    parser.add_argument("--profiles", nargs="+", default=["fast", "balanced"], choices=list(DETECTION_PROFILES),
+                        help="perfis de detecção (accurate usa a CNN: lento sem GPU)")
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[1, 10, 100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--repeat", type=int, default=20, help="repetições por medida")
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    args = parser.parse_args()
+
+    stages = args.only or STAGES
+    images = {}
+    for path in args.image:
+        with open(path, "rb") as f:
+            images[path] = f.read()
+    if not images:
+        for i, size in enumerate(args.sizes):
+            width, height = (int(v) for v in size.lower().split("x"))
+            images[f"synthetic_{size}"] = synthetic_jpeg(width, height, seed=i)
+
+    # Etapas de imagem são lentas: menos repetições
+    image_repeat = max(1, args.repeat // 4)
+    results = {}
+    if "decode" in stages:
+        results["decode"] = bench_decode(images, args.repeat)
+    if "quality" in stages:
+        results["quality"] = bench_quality(images, args.repeat)
+    if "detect" in stages:
+        pipeline.warm_up()
+        results["detect"] = bench_detect(images, args.profiles, image_repeat)
+    if "encode" in stages:
+        pipeline.warm_up()
+        results["encode"] = bench_encode(images, image_repeat)
+    if "compare" in stages:
+        results["compare"] = bench_compare(args.gallery_sizes, args.repeat)
+    if "bcrypt" in stages:
+        results["bcrypt"] = bench_bcrypt(args.rounds, max(1, args.repeat // 4))
+    if "jwt" in stages:
+        results["jwt"] = bench_jwt(args.repeat * 50)
+
+    write_report({"benchmark": "stages", "params": vars(args), "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
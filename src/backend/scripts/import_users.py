@@ -0,0 +1,152 @@
+"""
+Importa usuários em massa a partir de CSV ou JSONL.
+
+Uso (a partir de src/backend):
+    python -m scripts.import_users usuarios.csv
+    python -m scripts.import_users usuarios.jsonl --workers 8 --batch-size 2000
+    cat usuarios.jsonl | python -m scripts.import_users - --format jsonl
+
+Cada registro tem ``username`` e ``password`` (ou ``password_hash`` bcrypt já
+pronto), e opcionalmente ``role`` e ``clearance`` (padrão: public / 1).
+
+O arquivo é lido em streaming; as senhas de cada bloco são hasheadas num
+pool de processos (um núcleo por worker) enquanto os blocos anteriores são
+gravados com ``INSERT ... ON CONFLICT`` em ``executemany``. Usernames já
+existentes são ignorados, ou atualizados com ``--update`` (o que revoga os
+tokens do usuário).
+
+O custo do bcrypt vem de ``--rounds`` (padrão: ``BCRYPT_ROUNDS`` ou 12);
+hashes com custo diferente do calibrado no servidor são refeitos no
+primeiro login.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from app.config import engine
+from app.models.user import VALID_ROLES
+from app.services.hashing import BCRYPT_ROUNDS, DEFAULT_ROUNDS
+from app.services.user_import import bulk_insert_users, hash_chunk
+
+
+def read_records(stream, fmt: str) -> Iterator[Dict]:
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def normalize(record: Dict, default_role: str, default_clearance: int) -> Tuple[Dict, str]:
+    """Valida o registro; devolve (linha, senha em texto) ou levanta ValueError."""
+    username = (record.get("username") or "").strip()
+    if not username:
+        raise ValueError("username vazio")
+    role = (record.get("role") or default_role).strip()
+    if role not in VALID_ROLES:
+        raise ValueError(f"role inválido: {role}")
+    clearance = int(record.get("clearance") or default_clearance)
+    if clearance not in (1, 2, 3):
+        raise ValueError(f"clearance inválido: {clearance}")
+    password_hash = (record.get("password_hash") or "").strip()
+    password = record.get("password") or ""
+    if not password_hash and not password:
+        raise ValueError("sem password nem password_hash")
+    row = {"username": username, "password_hash": password_hash or None, "role": role, "clearance": clearance}
+    return row, password
+
+
+def batches(records: Iterator[Dict], size: int, args) -> Iterator[Tuple[List[Dict], List[str], int]]:
+    """Agrupa os registros válidos em blocos; conta os inválidos de cada bloco."""
+    rows, passwords, invalid = [], [], 0
+    for line_no, record in enumerate(records, 1):
+        try:
+            row, password = normalize(record, args.default_role, args.default_clearance)
+        except (ValueError, TypeError) as e:
+            invalid += 1
+            print(f"⚠️ Registro {line_no} ignorado: {e}", file=sys.stderr)
+            continue
+        rows.append(row)
+        passwords.append(password)
+        if len(rows) >= size:
+            yield rows, passwords, invalid
+            rows, passwords, invalid = [], [], 0
+    if rows or invalid:
+        yield rows, passwords, invalid
+
+
+def _hash_missing(rows: List[Dict], passwords: List[str], rounds: int) -> List[Dict]:
+    # Executado no worker: só hasheia quem não trouxe password_hash
+    todo = [i for i, row in enumerate(rows) if row["password_hash"] is None]
+    for i, password_hash in zip(todo, hash_chunk([passwords[i] for i in todo], rounds)):
+        rows[i]["password_hash"] = password_hash
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa usuários de CSV/JSONL")
+    parser.add_argument("input", help="arquivo .csv/.jsonl ou - para stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="padrão: pela extensão do arquivo")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=1000, help="usuários por INSERT")
+    parser.add_argument("--rounds", type=int, default=int(BCRYPT_ROUNDS or DEFAULT_ROUNDS))
+    parser.add_argument("--update", action="store_true", help="atualiza usuários já existentes")
+    parser.add_argument("--default-role", default="public")
+    parser.add_argument("--default-clearance", type=int, default=1)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    stream = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+
+    # Tamanho do bloco por tarefa: divide o INSERT entre os workers
+    chunk = max(1, args.batch_size // args.workers)
+    print(f"📥 Importando {args.input} ({fmt}) com {args.workers} worker(s), "
+          f"blocos de {args.batch_size}, bcrypt {args.rounds} rounds")
+
+    start = time.perf_counter()
+    read = processed = written = invalid = 0
+    in_flight = deque()
+
+    def drain(pool_futures) -> None:
+        nonlocal processed, written
+        rows = [row for future in pool_futures for row in future.result()]
+        with engine.begin() as conn:
+            written += bulk_insert_users(conn, rows, update=args.update)
+        processed += len(rows)
+        elapsed = time.perf_counter() - start
+        print(f"   {processed} processado(s), {written} gravado(s), {invalid} inválido(s) — {processed / elapsed:.0f} usuários/s")
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for rows, passwords, bad in batches(read_records(stream, fmt), args.batch_size, args):
+                invalid += bad
+                read += len(rows) + bad
+                in_flight.append([
+                    pool.submit(_hash_missing, rows[i:i + chunk], passwords[i:i + chunk], args.rounds)
+                    for i in range(0, len(rows), chunk)
+                ])
+                # Limita a memória: no máximo dois blocos hasheando além do que está sendo gravado
+                while len(in_flight) > 2:
+                    drain(in_flight.popleft())
+            while in_flight:
+                drain(in_flight.popleft())
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Import concluído: {read} registro(s) em {elapsed:.1f}s "
+          f"({read / elapsed if elapsed else 0:.0f} usuários/s) — {written} gravado(s), "
+          f"{read - written - invalid} já existente(s), {invalid} inválido(s)")
+
+
+if __name__ == "__main__":
+    main()
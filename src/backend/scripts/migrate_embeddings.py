@@ -0,0 +1,97 @@
+"""
+Migra ``biometric_templates.embedding`` de JSON para o formato binário
+(ver ``app.biometrics.storage``). Funciona em SQLite (3.35+) e PostgreSQL.
+
+Uso (a partir de src/backend):
+    python -m scripts.migrate_embeddings [--dtype float16] [--batch-size 1000] [--dry-run]
+
+Passos (idempotente; pode ser reexecutado após uma interrupção):
+1. adiciona a coluna temporária ``embedding_bin`` (BLOB/BYTEA)
+2. converte as linhas em lotes, cada lote na sua própria transação
+3. remove a coluna JSON antiga e renomeia ``embedding_bin`` para ``embedding``
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.types import LargeBinary
+
+from app.config import engine
+from app.biometrics.storage import EMBEDDING_STORAGE_DTYPE, pack_embedding, unpack_embedding
+
+TABLE = "biometric_templates"
+
+
+def _columns(conn) -> dict:
+    return {column["name"]: column for column in inspect(conn).get_columns(TABLE)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dtype", default=EMBEDDING_STORAGE_DTYPE, choices=["float32", "float16"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="apenas mostra o que seria feito")
+    args = parser.parse_args()
+
+    dialect = engine.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        sys.exit(f"❌ Dialeto não suportado: {dialect}")
+    if dialect == "sqlite" and sqlite3.sqlite_version_info < (3, 35, 0):
+        sys.exit(f"❌ SQLite {sqlite3.sqlite_version} não suporta DROP COLUMN (requer 3.35+)")
+    binary_type = "BYTEA" if dialect == "postgresql" else "BLOB"
+
+    with engine.begin() as conn:
+        if not inspect(conn).has_table(TABLE):
+            print(f"ℹ️ Tabela {TABLE} não existe; nada a migrar")
+            return
+        columns = _columns(conn)
+        pending = conn.execute(text(f"SELECT COUNT(*) FROM {TABLE}")).scalar_one()
+        if "embedding_bin" not in columns:
+            if isinstance(columns["embedding"]["type"], LargeBinary):
+                print("✅ Coluna embedding já está em formato binário")
+                return
+            print(f"🗄️ {dialect}: {pending} template(s) em JSON serão convertidos para {args.dtype}")
+            if args.dry_run:
+                return
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN embedding_bin {binary_type}"))
+        elif args.dry_run:
+            print("ℹ️ Migração em andamento (coluna embedding_bin existe); seria retomada")
+            return
+
+    start = time.perf_counter()
+    converted = json_bytes = binary_bytes = 0
+    select_batch = text(
+        f"SELECT id, embedding FROM {TABLE} WHERE embedding_bin IS NULL ORDER BY id LIMIT :limit"
+    )
+    update = text(f"UPDATE {TABLE} SET embedding_bin = :blob WHERE id = :id")
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(select_batch, {"limit": args.batch_size}).all()
+            if not rows:
+                break
+            params = []
+            for row_id, value in rows:
+                blob = pack_embedding(unpack_embedding(value), args.dtype)
+                json_bytes += len(value) if isinstance(value, (str, bytes)) else len(str(value))
+                binary_bytes += len(blob)
+                params.append({"id": row_id, "blob": blob})
+            conn.execute(update, params)
+        converted += len(rows)
+        print(f"🔄 {converted} template(s) convertidos...")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {TABLE} DROP COLUMN embedding"))
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME COLUMN embedding_bin TO embedding"))
+        if dialect == "postgresql":
+            conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN embedding SET NOT NULL"))
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Migração concluída: {converted} template(s) em {elapsed:.1f}s")
+    if converted:
+        print(f"📦 Tamanho médio: {json_bytes / converted:.0f} bytes (JSON) -> {binary_bytes / converted:.0f} bytes ({args.dtype})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Prepara bancos existentes para vários templates por usuário.
+
+Uso (a partir de src/backend):
+    python -m scripts.migrate_multi_templates
+
+Passos (idempotente):
+1. remove a restrição UNIQUE de ``biometric_templates.user_id``
+   (PostgreSQL: DROP CONSTRAINT; SQLite: recria a tabela)
+2. cria o índice ``ix_biometric_templates_user_id``
+3. cria a tabela ``biometric_centroids`` e calcula o centróide de cada
+   usuário que ainda não tem um
+
+Execute depois de ``scripts.migrate_embeddings``.
+"""
+from collections import defaultdict
+
+from sqlalchemy import inspect, select, text
+
+from app.config import Base, SessionLocal, engine
+from app.models import BiometricCentroid, BiometricTemplate
+from app.biometrics.storage import pack_embedding, unpack_embedding
+from app.biometrics.templates import compute_centroid, stack_embeddings
+
+TABLE = BiometricTemplate.__tablename__
+
+
+def _drop_unique_postgresql(conn) -> bool:
+    dropped = False
+    for constraint in inspect(conn).get_unique_constraints(TABLE):
+        if constraint["column_names"] == ["user_id"]:
+            conn.execute(text(f'ALTER TABLE {TABLE} DROP CONSTRAINT "{constraint["name"]}"'))
+            dropped = True
+    return dropped
+
+
+def _drop_unique_sqlite(conn) -> bool:
+    # SQLite não remove restrições: recria a tabela com o schema atual do modelo
+    unique_indexes = [
+        row for row in conn.execute(text(f"PRAGMA index_list({TABLE})")).mappings()
+        if row["unique"] and row["origin"] == "u"
+    ]
+    if not unique_indexes:
+        return False
+    for index in inspect(conn).get_indexes(TABLE):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_old"))
+    BiometricTemplate.__table__.create(conn)
+    conn.execute(text(
+        f"INSERT INTO {TABLE} (id, user_id, embedding, created_at) "
+        f"SELECT id, user_id, embedding, created_at FROM {TABLE}_old"
+    ))
+    conn.execute(text(f"DROP TABLE {TABLE}_old"))
+    return True
+
+
+def main():
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if not inspect(conn).has_table(TABLE):
+            print(f"ℹ️ Tabela {TABLE} não existe; create_all criará o schema novo")
+            return
+        if dialect == "postgresql":
+            dropped = _drop_unique_postgresql(conn)
+        elif dialect == "sqlite":
+            dropped = _drop_unique_sqlite(conn)
+        else:
+            raise SystemExit(f"❌ Dialeto não suportado: {dialect}")
+        print("✅ Restrição UNIQUE(user_id) removida" if dropped else "ℹ️ user_id já aceita vários templates")
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_user_id ON {TABLE} (user_id)"))
+
+    Base.metadata.create_all(bind=engine, tables=[BiometricCentroid.__table__])
+
+    db = SessionLocal()
+    try:
+        has_centroid = select(BiometricCentroid.user_id)
+        rows = db.execute(
+            select(BiometricTemplate.user_id, BiometricTemplate.embedding)
+            .where(BiometricTemplate.user_id.not_in(has_centroid))
+        ).all()
+        by_user = defaultdict(list)
+        for user_id, blob in rows:
+            by_user[user_id].append(unpack_embedding(blob))
+        for user_id, embeddings in by_user.items():
+            centroid = compute_centroid(stack_embeddings(embeddings))
+            db.add(BiometricCentroid(user_id=user_id, embedding=pack_embedding(centroid), template_count=len(embeddings)))
+        db.commit()
+        print(f"✅ {len(by_user)} centróide(s) calculado(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Adiciona ``users.token_version`` (versão usada para revogar JWTs) em bancos
+criados antes da coluna existir. Idempotente; SQLite e PostgreSQL.
+
+Uso (a partir de src/backend):
+    python -m scripts.migrate_token_version
+"""
+from sqlalchemy import inspect, text
+
+from app.config import engine
+
+
+def main():
+    with engine.begin() as conn:
+        if not inspect(conn).has_table("users"):
+            print("ℹ️ Tabela users não existe; create_all criará o schema novo")
+            return
+        columns = {column["name"] for column in inspect(conn).get_columns("users")}
+        if "token_version" in columns:
+            print("✅ users.token_version já existe")
+            return
+        conn.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"))
+        print("✅ Coluna users.token_version adicionada")
+
+
+if __name__ == "__main__":
+    main()
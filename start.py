@@ -1,7 +1,118 @@
 import os
 import sys
+import time
 from pathlib import Path
 
+# Workers uvicorn. Com mais de um, o master pré-carrega os modelos do dlib e faz
+# fork dos workers, que compartilham essa memória (copy-on-write)
+WEB_WORKERS_ENV = "WEB_CONCURRENCY"
+# Reinícios mais rápidos que isso contam como crash em loop (espera antes de refazer)
+RESTART_BACKOFF_S = 1.0
+MIN_UPTIME_S = 5.0
+
+
+def run_single(host: str, port: int):
+    import uvicorn
+    uvicorn.run(
+        "app.main:app",
+        host=host,
+        port=port,
+        reload=False,
+        log_level="info",
+        workers=1,
+    )
+
+
+def run_preforked(host: str, port: int, workers: int):
+    """
+    Master pré-fork: abre o socket, carrega modelos/schema/galeria uma vez
+    (app.services.startup.prepare_master) e faz fork de ``workers`` servidores
+    uvicorn no mesmo socket. Workers que morrem são recriados; SIGTERM/SIGINT
+    no master encerram todos.
+    
+    Exige ``BIOMETRIC_INDEX=mmap``: com ``brute``/``ivf`` cada worker ficaria
+    com sua própria cópia da galeria, e cadastros e remoções feitos num
+    worker nunca chegariam aos outros.
+    """
+    import signal
+    import socket
+    
+    from app.biometrics.index import BIOMETRIC_INDEX
+    if BIOMETRIC_INDEX != "mmap":
+        raise RuntimeError(
+            f"{WEB_WORKERS_ENV}={workers} exige BIOMETRIC_INDEX=mmap (galeria compartilhada entre os workers); "
+            f"com BIOMETRIC_INDEX={BIOMETRIC_INDEX} use {WEB_WORKERS_ENV}=1"
+        )
+    
+    # Pools biométricos dos workers também via fork, herdando os modelos do master
+    os.environ.setdefault("BIOMETRIC_START_METHOD", "fork")
+    
+    # Socket aberto antes do carregamento: conexões ficam na fila do kernel
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    
+    import uvicorn
+    from app.main import app
+    from app.services.startup import prepare_master
+    prepare_master()
+    
+    children = {}  # pid -> (slot, início)
+    stopping = False
+    
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+                server.run(sockets=[sock])
+            except BaseException as e:
+                print(f"❌ Worker {slot}: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+        print(f"👷 Worker {slot} iniciado (pid {pid})")
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    for slot in range(workers):
+        spawn(slot)
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in children:
+            continue
+        slot, started = children.pop(pid)
+        if stopping:
+            continue
+        print(f"⚠️ Worker {slot} (pid {pid}) saiu com código {os.waitstatus_to_exitcode(status)}; reiniciando")
+        if time.monotonic() - started < MIN_UPTIME_S:
+            time.sleep(RESTART_BACKOFF_S)
+        spawn(slot)
+    
+    sock.close()
+    print("👋 Todos os workers encerrados")
+
+
 def main():
     print("🚀 Starting BioAccess on Railway")
     
@@ -41,62 +152,24 @@ def main():
     os.environ.setdefault("HOST", "0.0.0.0")
     os.environ.setdefault("PORT", str(os.getenv("PORT", "8000")))
     
-    # Inicializar banco de dados
-    try:
-        print("🗄️  Inicializando banco de dados...")
-        from app.config import Base, engine, SessionLocal
-        from app.models.user import User
-        from app.routers.auth import pwd_context
-        
-        # Criar tabelas
-        print("📋 Criando tabelas...")
-        Base.metadata.create_all(bind=engine)
-        print("✅ Tabelas criadas!")
-        
-        # Verificar e criar usuários padrão
-        db = SessionLocal()
-        try:
-            user_count = db.query(User).count()
-            print(f"✅ Conexão OK - {user_count} usuários")
-            
-            if user_count == 0:
-                print("👤 Criando usuários padrão...")
-                default_users = [
-                    User(username="ana.luiza", password_hash=pwd_context.hash("senha123"), role="public", clearance=1),
-                    User(username="teste1", password_hash=pwd_context.hash("teste123"), role="public", clearance=1),
-                    User(username="demo", password_hash=pwd_context.hash("demo123"), role="director", clearance=2),
-                    User(username="admin", password_hash=pwd_context.hash("admin123"), role="minister", clearance=3),
-                ]
-                for user in default_users:
-                    db.add(user)
-                db.commit()
-                print(f"✅ {len(default_users)} usuários criados!")
-        except Exception as e:
-            print(f"❌ Erro DB: {e}")
-            db.rollback()
-            raise
-        finally:
-            db.close()
-            
-        print("✅ Banco inicializado!")
-    except Exception as e:
-        print(f"❌ ERRO FATAL: {e}")
-        sys.exit(1)
+    # Schema, usuários padrão e modelos biométricos são inicializados pela
+    # própria aplicação em background (app.services.startup), depois que a
+    # porta já está aberta: o health check (/health) responde de imediato e
+    # /ready indica quando tudo está carregado.
     
     # Executar servidor
     try:
-        import uvicorn
-        print("🌟 Starting uvicorn server...")
+        workers = int(os.getenv(WEB_WORKERS_ENV, "1"))
+        host = os.getenv("HOST", "0.0.0.0")
+        port = int(os.getenv("PORT", 8000))
         
         # Configurações para Railway (com face_recognition/dlib)
-        uvicorn.run(
-            "app.main:app",
-            host="0.0.0.0",
-            port=int(os.getenv("PORT", 8000)),
-            reload=False,
-            log_level="info",
-            workers=1,
-        )
+        if workers > 1:
+            print(f"🌟 Starting {workers} uvicorn workers (preload + fork)...")
+            run_preforked(host, port, workers)
+        else:
+            print("🌟 Starting uvicorn server...")
+            run_single(host, port)
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)